@@ -0,0 +1,91 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compares the vectorized temporal aggregation with the per-feature loop.
+
+Usage: python -m benchmarks.aggregate_temporal [ROW_COUNT ...]
+"""
+
+import datetime
+import sys
+import timeit
+
+import numpy as np
+import pytz
+
+from xcube_geodb_openeo.backend.processes import Mean
+from xcube_geodb_openeo.core.operations import TemporalAggregation
+
+GEOMETRY_COUNT = 100
+PROPERTY_COUNT = 5
+
+
+def make_features(row_count: int):
+    rng = np.random.default_rng(42)
+    start = datetime.datetime(2000, 1, 1, tzinfo=pytz.UTC)
+    # spread the features over the year 2000
+    step = datetime.timedelta(days=365) / row_count
+    features = []
+    for i in range(row_count):
+        g = i % GEOMETRY_COUNT
+        properties = {
+            "id": i,
+            "date": (start + i * step).isoformat(),
+            "name": f"region {g}",
+        }
+        for p in range(PROPERTY_COUNT):
+            properties[f"value_{p}"] = float(rng.random())
+        features.append(
+            {
+                "type": "Feature",
+                "id": str(i),
+                "geometry": {"type": "Point", "coordinates": [g, g]},
+                "properties": properties,
+            }
+        )
+    return features
+
+
+def main(row_counts):
+    utc = pytz.UTC
+    # a year of monthly intervals
+    months = [datetime.datetime(2000, m, 1, tzinfo=utc) for m in range(1, 13)]
+    months.append(datetime.datetime(2001, 1, 1, tzinfo=utc))
+    args = (list(zip(months[:-1], months[1:])), "date")
+    loop = TemporalAggregation(np.mean, *args)
+    mean = Mean({"id": "mean"})
+    vectorized = TemporalAggregation(None, *args, reduce_grouped=mean.reduce_grouped)
+    print(f"{'rows':>10} {'loop [s]':>10} {'vectorized [s]':>15} {'speedup':>8}")
+    for row_count in row_counts:
+        features = make_features(row_count)
+        t_loop = min(timeit.repeat(lambda: loop.apply(features), number=1, repeat=3))
+        t_vectorized = min(
+            timeit.repeat(lambda: vectorized.apply(features), number=1, repeat=3)
+        )
+        print(
+            f"{row_count:>10} {t_loop:>10.3f} {t_vectorized:>15.3f}"
+            f" {t_loop / t_vectorized:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,89 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Times a compiled apply callback on a single column of values, and on the
+numeric properties of features.
+
+Usage: python -m benchmarks.apply [ROW_COUNT ...]
+"""
+
+import sys
+import timeit
+
+import numpy as np
+
+from xcube_geodb_openeo.backend.callbacks import compile_callback
+from xcube_geodb_openeo.core.operations import ColumnFunction
+from xcube_geodb_openeo.core.operations import execute_plan
+from .aggregate_temporal import make_features
+
+CALLBACK = {
+    "process_graph": {
+        "absolute1": {
+            "process_id": "absolute",
+            "arguments": {"x": {"from_parameter": "x"}},
+        },
+        "sqrt1": {
+            "process_id": "sqrt",
+            "arguments": {"x": {"from_node": "absolute1"}},
+        },
+        "linear_scale_range1": {
+            "process_id": "linear_scale_range",
+            "arguments": {
+                "x": {"from_node": "sqrt1"},
+                "inputMin": 0,
+                "inputMax": 100,
+                "outputMax": 255,
+            },
+        },
+        "clip1": {
+            "process_id": "clip",
+            "arguments": {
+                "x": {"from_node": "linear_scale_range1"},
+                "min": 10,
+                "max": 250,
+            },
+            "result": True,
+        },
+    }
+}
+
+
+def main(row_counts):
+    compiled = compile_callback(CALLBACK)
+    plan = [ColumnFunction(lambda column: compiled({"x": column}), "date")]
+    print(f"{'rows':>10} {'column [s]':>11} {'features [s]':>13}")
+    for row_count in row_counts:
+        column = np.random.default_rng(0).normal(0, 1000, row_count)
+        column[::10] = np.nan
+        t_column = min(
+            timeit.repeat(lambda: compiled({"x": column}), number=1, repeat=3)
+        )
+        features = make_features(row_count)
+        t_features = min(
+            timeit.repeat(lambda: execute_plan(features, plan), number=1, repeat=3)
+        )
+        print(f"{row_count:>10} {t_column:>11.4f} {t_features:>13.3f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000])
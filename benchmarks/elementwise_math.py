@@ -0,0 +1,73 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compares columnar elementwise math with applying the operators feature by
+feature, as done before.
+
+Usage: python -m benchmarks.elementwise_math [ROW_COUNT ...]
+"""
+
+import copy
+import operator
+import sys
+import timeit
+
+from xcube_geodb_openeo.core.operations import ElementwiseMath
+from xcube_geodb_openeo.core.operations import execute_plan
+from xcube_geodb_openeo.core.operations import numeric_properties
+from .aggregate_temporal import make_features
+
+OPERATIONS = [(operator.mul, 2), (operator.add, 1), (operator.truediv, 3)]
+
+
+def apply_per_feature(features):
+    result = []
+    for feature in features:
+        current = copy.copy(feature)
+        current["properties"] = dict(feature["properties"])
+        props = current["properties"]
+        for operation, value in OPERATIONS:
+            for prop in numeric_properties(props, "date"):
+                props[prop] = operation(props[prop], value)
+        result.append(current)
+    return result
+
+
+def main(row_counts):
+    plan = [ElementwiseMath(op, value, "date") for op, value in OPERATIONS]
+    print(f"{'rows':>10} {'per feature [s]':>16} {'columnar [s]':>13} {'speedup':>8}")
+    for row_count in row_counts:
+        features = make_features(row_count)
+        t_loop = min(
+            timeit.repeat(lambda: apply_per_feature(features), number=1, repeat=3)
+        )
+        t_columnar = min(
+            timeit.repeat(lambda: execute_plan(features, plan), number=1, repeat=3)
+        )
+        print(
+            f"{row_count:>10} {t_loop:>16.3f} {t_columnar:>13.3f}"
+            f" {t_loop / t_columnar:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,80 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""
+Compares grouped reductions in the server process with reductions
+partitioned over a pool of worker processes.
+
+Usage: python -m benchmarks.partitioned_reduce [ROW_COUNT ...]
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from xcube_geodb_openeo.backend.processes import get_processes_registry
+from xcube_geodb_openeo.backend.workers import PartitionedReducer
+
+GROUP_COUNT = 10000
+PROPERTY_COUNT = 5
+
+
+def main(row_counts):
+    worker_count = os.cpu_count() or 1
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=worker_count, mp_context=multiprocessing.get_context("spawn")
+    )
+    rng = np.random.default_rng(42)
+    print(f"{worker_count} workers")
+    print(
+        f"{'rows':>10} {'reducer':>8} {'local [s]':>10}"
+        f" {'partitioned [s]':>16} {'speedup':>8}"
+    )
+    for row_count in row_counts:
+        values = pd.DataFrame(rng.random((row_count, PROPERTY_COUNT)))
+        codes = rng.integers(0, GROUP_COUNT, row_count)
+        for reducer_id in ("mean", "median"):
+            reducer = get_processes_registry().get_process(reducer_id)
+            partitioned = PartitionedReducer(reducer_id, pool, worker_count, 1)
+            # start the workers
+            partitioned(values, codes)
+            t_local = min(
+                timeit.repeat(
+                    lambda: reducer.reduce_grouped(values, codes), number=1, repeat=3
+                )
+            )
+            t_partitioned = min(
+                timeit.repeat(lambda: partitioned(values, codes), number=1, repeat=3)
+            )
+            print(
+                f"{row_count:>10} {reducer_id:>8} {t_local:>10.3f}"
+                f" {t_partitioned:>16.3f} {t_local / t_partitioned:>8.1f}"
+            )
+    pool.shutdown()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100000, 1000000, 5000000])
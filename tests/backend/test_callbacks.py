@@ -0,0 +1,137 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+import numpy as np
+
+from tests.core.mock_vc_provider import MockProvider
+from xcube_geodb_openeo.backend.callbacks import compile_callback
+from xcube_geodb_openeo.backend.callbacks import normalize_process_graph
+from xcube_geodb_openeo.backend.processes import get_callback
+
+
+def _scale(factor, offset=1, description="scale"):
+    return {
+        "process_graph": {
+            "multiply1": {
+                "process_id": "multiply",
+                "arguments": {"x": {"from_parameter": "x"}, "y": factor},
+                "description": description,
+            },
+            "add1": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "multiply1"}, "y": offset},
+                "result": True,
+            },
+        }
+    }
+
+
+class CallbacksTest(unittest.TestCase):
+    def test_compiled_callback(self):
+        compiled = compile_callback(_scale(2))
+        self.assertEqual(["x"], compiled.parameter_names)
+        self.assertEqual(7, compiled({"x": 3}))
+        self.assertIsNone(compiled({"x": None}))
+        np.testing.assert_array_equal(
+            np.array([1.0, 3.0, np.nan]),
+            compiled({"x": np.array([0.0, 1.0, np.nan])}),
+        )
+
+    def test_compiled_reducer(self):
+        reducer = {
+            "process_graph": {
+                "mean1": {
+                    "process_id": "mean",
+                    "arguments": {"data": {"from_parameter": "data"}},
+                },
+                "multiply1": {
+                    "process_id": "multiply",
+                    "arguments": {"x": {"from_node": "mean1"}, "y": 10},
+                    "result": True,
+                },
+            }
+        }
+        self.assertEqual(20.0, compile_callback(reducer)({"data": [1, 2, 3]}))
+
+    def test_compiled_callback_of_list(self):
+        compiled = compile_callback(_scale(-1, offset=1))
+        np.testing.assert_array_equal(
+            np.array([0.0, -1.0, np.nan]), compiled({"x": [1, 2, None]})
+        )
+        reducer = {
+            "process_graph": {
+                "add1": {
+                    "process_id": "add",
+                    "arguments": {"x": {"from_parameter": "data"}, "y": 1},
+                },
+                "mean1": {
+                    "process_id": "mean",
+                    "arguments": {"data": {"from_node": "add1"}},
+                    "result": True,
+                },
+            }
+        }
+        self.assertEqual(3.0, compile_callback(reducer)({"data": [1, 2, 3]}))
+
+    def test_compiled_callbacks_are_cached(self):
+        compiled = compile_callback(_scale(2))
+        self.assertIs(compiled, compile_callback(_scale(2, description="other")))
+        self.assertIsNot(compiled, compile_callback(_scale(3)))
+        self.assertEqual(
+            normalize_process_graph(_scale(2)["process_graph"]),
+            normalize_process_graph(
+                dict(reversed(list(_scale(2)["process_graph"].items())))
+            ),
+        )
+
+    def test_not_compilable(self):
+        self.assertIsNone(compile_callback(_scale([1, 2])))
+        self.assertIsNone(compile_callback(_scale(True)))
+        self.assertIsNone(
+            compile_callback(
+                {
+                    "process_graph": {
+                        "load1": {
+                            "process_id": "load_collection",
+                            "arguments": {"id": "collection_1"},
+                            "result": True,
+                        }
+                    }
+                }
+            )
+        )
+
+    def test_accepts(self):
+        compiled = compile_callback(_scale(2))
+        vector_cube = MockProvider({}, "").get_vector_cube(("", "collection_1"))
+        self.assertTrue(compiled.accepts({"x": 1.5}))
+        self.assertTrue(compiled.accepts({"x": [1, None]}))
+        self.assertTrue(compiled.accepts({"x": np.zeros(3), "context": {}}))
+        self.assertFalse(compiled.accepts({"x": vector_cube}))
+
+    def test_get_callback_falls_back_to_executor(self):
+        callback = get_callback(_scale(2), None)
+        self.assertEqual(5, callback({"x": 2}))
+        vector_cube = MockProvider({}, "").get_vector_cube(("", "collection_1"))
+        features = callback({"x": vector_cube}).to_geojson()["features"]
+        self.assertEqual([2001, 201], [f["properties"]["population"] for f in features])
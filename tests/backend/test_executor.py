@@ -0,0 +1,236 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+import threading
+import time
+import unittest
+
+from xcube_geodb_openeo.backend import executor as executor_module
+from xcube_geodb_openeo.backend.executor import ProcessGraphError
+from xcube_geodb_openeo.backend.executor import ProcessGraphExecutor
+from xcube_geodb_openeo.backend.executor import get_dependencies
+from xcube_geodb_openeo.backend.processes import Process
+
+
+class _Counting(Process):
+    def __init__(self, process_id, function):
+        super().__init__({"id": process_id, "parameters": []})
+        self.function = function
+        self.calls = 0
+
+    def execute(self, parameters: dict, ctx):
+        self.calls += 1
+        return self.function(parameters)
+
+
+class _Registry:
+    def __init__(self, *processes):
+        self._processes = {p.metadata["id"]: p for p in processes}
+
+    def get_process(self, process_id):
+        return self._processes[process_id]
+
+
+class ProcessGraphExecutorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.load = _Counting("load", lambda p: p["value"])
+        self.add = _Counting("add", lambda p: p["x"] + p["y"])
+        self.registry = _Registry(self.load, self.add)
+
+    def test_shared_node_is_executed_once(self):
+        graph = {
+            "load1": {"process_id": "load", "arguments": {"value": 3}},
+            "add1": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "load1"}, "y": 1},
+            },
+            "add2": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "load1"}, "y": 2},
+            },
+            "add3": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "add1"}, "y": {"from_node": "add2"}},
+                "result": True,
+            },
+        }
+        executor = ProcessGraphExecutor(graph, self.registry, None)
+        self.assertEqual(["load1", "add1", "add2", "add3"], executor.order)
+        self.assertEqual(9, executor.execute())
+        self.assertEqual(1, self.load.calls)
+        self.assertEqual(3, self.add.calls)
+
+    def test_input_and_parameters(self):
+        seen = []
+        self.registry = _Registry(_Counting("echo", lambda p: seen.append(p)))
+        graph = {
+            "echo1": {
+                "process_id": "echo",
+                "arguments": {
+                    "data": {"from_parameter": "cube"},
+                    "values": [{"from_parameter": "unknown"}],
+                    "process": {"process_graph": {"x": {"from_node": "nowhere"}}},
+                },
+                "result": True,
+            }
+        }
+        ProcessGraphExecutor(
+            graph, self.registry, None, access_token="abc", parameters={"cube": 42}
+        ).execute()
+        self.assertEqual(42, seen[0]["data"])
+        self.assertEqual(42, seen[0]["input"])
+        self.assertEqual("abc", seen[0]["access_token"])
+        self.assertEqual([{"from_parameter": "unknown"}], seen[0]["values"])
+        self.assertEqual(graph["echo1"]["arguments"]["process"], seen[0]["process"])
+
+    def test_unused_nodes_are_not_executed(self):
+        graph = {
+            "load1": {"process_id": "load", "arguments": {"value": 3}},
+            "load2": {"process_id": "load", "arguments": {"value": 4}, "result": True},
+        }
+        self.assertEqual(4, ProcessGraphExecutor(graph, self.registry, None).execute())
+        self.assertEqual(1, self.load.calls)
+
+    def test_invalid_graphs(self):
+        with self.assertRaises(ProcessGraphError):
+            ProcessGraphExecutor({}, self.registry, None)
+        with self.assertRaises(ProcessGraphError):
+            ProcessGraphExecutor(
+                {"load1": {"process_id": "load", "arguments": {}}}, self.registry, None
+            )
+        with self.assertRaises(ProcessGraphError):
+            ProcessGraphExecutor(
+                {
+                    "add1": {
+                        "process_id": "add",
+                        "arguments": {"x": {"from_node": "add2"}},
+                        "result": True,
+                    },
+                    "add2": {
+                        "process_id": "add",
+                        "arguments": {"x": {"from_node": "add1"}},
+                    },
+                },
+                self.registry,
+                None,
+            )
+        with self.assertRaises(ProcessGraphError):
+            ProcessGraphExecutor(
+                {
+                    "add1": {
+                        "process_id": "add",
+                        "arguments": {"x": {"from_node": "missing"}},
+                        "result": True,
+                    }
+                },
+                self.registry,
+                None,
+            )
+
+    def test_independent_branches_run_in_parallel(self):
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def slow_load(p):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.2)
+            with lock:
+                active.pop()
+            return p["value"]
+
+        self.registry = _Registry(_Counting("load", slow_load), self.add)
+        graph = {
+            "load1": {"process_id": "load", "arguments": {"value": 3}},
+            "load2": {"process_id": "load", "arguments": {"value": 4}},
+            "load3": {"process_id": "load", "arguments": {"value": 5}},
+            "add1": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "load1"}, "y": {"from_node": "load2"}},
+            },
+            "add2": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "add1"}, "y": {"from_node": "load3"}},
+                "result": True,
+            },
+        }
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            start = time.perf_counter()
+            result = ProcessGraphExecutor(
+                graph, self.registry, None, pool=pool, max_parallel_nodes=3
+            ).execute()
+            self.assertLess(time.perf_counter() - start, 0.5)
+            self.assertEqual(12, result)
+            self.assertEqual(3, max(peak))
+
+            peak.clear()
+            result = ProcessGraphExecutor(
+                graph, self.registry, None, pool=pool, max_parallel_nodes=2
+            ).execute()
+            self.assertEqual(12, result)
+            self.assertEqual(2, max(peak))
+
+    def test_parallel_failure(self):
+        def fail(p):
+            raise ValueError("failed")
+
+        self.registry = _Registry(_Counting("fail", fail), self.load, self.add)
+        graph = {
+            "load1": {"process_id": "load", "arguments": {"value": 3}},
+            "fail1": {"process_id": "fail", "arguments": {}},
+            "add1": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "load1"}, "y": {"from_node": "fail1"}},
+                "result": True,
+            },
+        }
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+            with self.assertRaises(ValueError):
+                ProcessGraphExecutor(graph, self.registry, None, pool=pool).execute()
+        self.assertEqual(0, self.add.calls)
+
+    def test_get_dependencies(self):
+        self.assertEqual(
+            {"a", "b"},
+            get_dependencies(
+                {
+                    "data": {"from_node": "a"},
+                    "list": [1, {"nested": {"from_node": "b"}}],
+                    "reducer": {"process_graph": {"c": {"from_node": "c"}}},
+                }
+            ),
+        )
+
+    def test_get_node_pool_creates_one_pool(self):
+        previous = executor_module._NODE_POOL_SINGLETON
+        executor_module._NODE_POOL_SINGLETON = None
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+                pools = list(
+                    pool.map(lambda _: executor_module.get_node_pool(2), range(16))
+                )
+            self.assertEqual(1, len({id(p) for p in pools}))
+            pools[0].shutdown()
+        finally:
+            executor_module._NODE_POOL_SINGLETON = previous
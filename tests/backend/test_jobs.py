@@ -0,0 +1,132 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from xcube_geodb_openeo.backend.jobs import JobError
+from xcube_geodb_openeo.backend.jobs import JobManager
+from xcube_geodb_openeo.backend.jobs import read_job
+from xcube_geodb_openeo.backend.jobs import run_job
+from xcube_geodb_openeo.backend.jobs import write_job
+
+CONFIG = {
+    "geodb_openeo": {
+        "vectorcube_provider_class": "tests.core.mock_vc_provider.MockProvider"
+    }
+}
+
+PROCESS = {
+    "process_graph": {
+        "load": {
+            "process_id": "load_collection",
+            "arguments": {"id": "~collection_1", "spatial_extent": None},
+        },
+        "save": {
+            "process_id": "save_result",
+            "arguments": {"data": {"from_node": "load"}, "format": "GeoJSON"},
+            "result": True,
+        },
+    }
+}
+
+
+class JobManagerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.manager = JobManager(self.directory.name, CONFIG, max_running_jobs=1)
+
+    def tearDown(self) -> None:
+        self.manager.shutdown()
+        self.directory.cleanup()
+
+    def test_create_and_get_jobs(self):
+        job = self.manager.create_job("user", PROCESS, title="Job 1")
+        self.assertEqual("created", job["status"])
+        self.assertEqual(job, self.manager.get_job("user", job["id"]))
+        self.assertIsNone(self.manager.get_job("other", job["id"]))
+        self.assertIsNone(self.manager.get_job("user", "../" + job["id"]))
+        self.assertEqual([job], self.manager.get_jobs("user"))
+        self.assertEqual([], self.manager.get_jobs("other"))
+        with self.assertRaises(JobError):
+            self.manager.create_job("user", {})
+        self.manager.delete_job("user", job["id"])
+        self.assertEqual([], self.manager.get_jobs("user"))
+        with self.assertRaises(JobError):
+            self.manager.start_job("user", job["id"], "token")
+
+    def test_run_job(self):
+        job = self.manager.create_job("user", PROCESS)
+        job = self.manager.start_job("user", job["id"], "token")
+        self.assertEqual("queued", job["status"])
+        job = self._wait_for(job["id"])
+        self.assertEqual("finished", job["status"])
+        job, result_path = self.manager.get_result_path("user", job["id"])
+        with open(result_path) as f:
+            self.assertEqual("FeatureCollection", json.load(f)["type"])
+        logs = self.manager.get_logs("user", job["id"])
+        self.assertEqual(
+            ["Job has been queued.", "Job has been started.", "Job has finished."],
+            [entry["message"] for entry in logs],
+        )
+        self.assertEqual(
+            logs[1:2],
+            self.manager.get_logs("user", job["id"], limit=1, offset=logs[0]["id"]),
+        )
+
+    def test_failing_job(self):
+        process = {"process_graph": dict(PROCESS["process_graph"])}
+        process["process_graph"]["load"] = {
+            "process_id": "load_collection",
+            "arguments": {"id": "collection_1", "spatial_extent": "invalid"},
+        }
+        process["process_graph"]["save"] = dict(
+            PROCESS["process_graph"]["save"], process_id="unknown"
+        )
+        job = self.manager.create_job("user", process)
+        job_dir = os.path.join(self.directory.name, job["id"])
+        write_job(job_dir, dict(job, status="queued"))
+        run_job(job_dir, CONFIG, "token")
+        self.assertEqual("error", read_job(job_dir)["status"])
+        logs = self.manager.get_logs("user", job["id"])
+        self.assertEqual("error", logs[-1]["level"])
+        self.assertEqual(
+            (read_job(job_dir), None), self.manager.get_result_path("user", job["id"])
+        )
+
+    def test_interrupted_jobs_fail(self):
+        job = self.manager.create_job("user", PROCESS)
+        write_job(
+            os.path.join(self.directory.name, job["id"]), dict(job, status="running")
+        )
+        manager = JobManager(self.directory.name, CONFIG)
+        self.assertEqual("error", manager.get_job("user", job["id"])["status"])
+
+    def _wait_for(self, job_id: str):
+        for _ in range(600):
+            job = self.manager.get_job("user", job_id)
+            if job["status"] in ("finished", "error", "canceled"):
+                return job
+            time.sleep(0.1)
+        self.fail("Job has not finished in time.")
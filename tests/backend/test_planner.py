@@ -0,0 +1,184 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import unittest
+
+from xcube_geodb_openeo.backend.planner import plan_process_graph
+
+
+def _load(**arguments):
+    return {
+        "process_id": "load_collection",
+        "arguments": dict(id="collection_1", **arguments),
+    }
+
+
+def _filter_bbox(source, west, south, east, north, **kwargs):
+    extent = dict(west=west, south=south, east=east, north=north, **kwargs)
+    return {
+        "process_id": "filter_bbox",
+        "arguments": {"data": {"from_node": source}, "extent": extent},
+    }
+
+
+def _filter_temporal(source, start, end):
+    return {
+        "process_id": "filter_temporal",
+        "arguments": {"data": {"from_node": source}, "extent": [start, end]},
+    }
+
+
+def _save(source):
+    return {
+        "process_id": "save_result",
+        "arguments": {"data": {"from_node": source}, "format": "GeoJSON"},
+        "result": True,
+    }
+
+
+class PlannerTest(unittest.TestCase):
+    def test_filters_are_merged_into_load_collection(self):
+        graph = {
+            "load": _load(spatial_extent={"bbox": "(0, 0, 10, 10)", "crs": 4326}),
+            "bbox": _filter_bbox("load", 5, -5, 15, 8),
+            "time": _filter_temporal("bbox", "2000-01-01", None),
+            "time2": _filter_temporal("time", "1999-01-01", "2000-06-01"),
+            "save": _save("time2"),
+        }
+        planned = plan_process_graph(graph)
+        self.assertEqual(["time2", "save"], sorted(planned, reverse=True))
+        self.assertEqual("load_collection", planned["time2"]["process_id"])
+        self.assertEqual(
+            {
+                "id": "collection_1",
+                "spatial_extent": {
+                    "west": 5.0,
+                    "south": 0.0,
+                    "east": 10.0,
+                    "north": 8.0,
+                    "crs": 4326,
+                },
+                "temporal_extent": [
+                    "2000-01-01T00:00:00+00:00",
+                    "2000-06-01T00:00:00+00:00",
+                ],
+            },
+            planned["time2"]["arguments"],
+        )
+        self.assertEqual({"from_node": "time2"}, planned["save"]["arguments"]["data"])
+        # the given graph is left unchanged
+        self.assertEqual("filter_bbox", graph["bbox"]["process_id"])
+
+    def test_filter_as_result(self):
+        planned = plan_process_graph(
+            {
+                "load": _load(),
+                "time": dict(_filter_temporal("load", None, "2001-01-01"), result=True),
+            }
+        )
+        self.assertEqual(["time"], list(planned))
+        self.assertTrue(planned["time"]["result"])
+        self.assertEqual(
+            [None, "2001-01-01T00:00:00+00:00"],
+            planned["time"]["arguments"]["temporal_extent"],
+        )
+
+    def test_shared_load_is_not_merged(self):
+        graph = {
+            "load": _load(),
+            "bbox": _filter_bbox("load", 0, 0, 1, 1),
+            "add": {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": "load"}, "y": {"from_node": "bbox"}},
+            },
+            "save": _save("add"),
+        }
+        self.assertEqual(graph, plan_process_graph(graph))
+
+    def test_not_mergeable(self):
+        graph = {
+            "load": _load(spatial_extent={"bbox": [0, 0, 10, 10], "crs": 3857}),
+            "bbox": _filter_bbox("load", 0, 0, 1, 1),
+            "save": _save("bbox"),
+        }
+        self.assertEqual(graph, plan_process_graph(graph))
+        graph["bbox"]["arguments"]["extent"] = {"from_parameter": "extent"}
+        self.assertEqual(graph, plan_process_graph(graph))
+
+    def test_disjoint_bbox_is_not_merged(self):
+        graph = {
+            "load": _load(spatial_extent={"bbox": "(0, 0, 10, 10)", "crs": 4326}),
+            "bbox": _filter_bbox("load", 20, 20, 30, 30),
+            "save": _save("bbox"),
+        }
+        self.assertEqual(graph, plan_process_graph(graph))
+        graph["bbox"] = _filter_bbox("load", 10, 0, 20, 10)
+        self.assertEqual(graph, plan_process_graph(graph))
+
+    def test_identical_nodes_are_shared(self):
+        def add(x, y):
+            return {
+                "process_id": "add",
+                "arguments": {"x": {"from_node": x}, "y": {"from_node": y}},
+            }
+
+        graph = {
+            "load1": _load(spatial_extent={"bbox": "(0, 0, 1, 1)", "crs": 4326}),
+            "load2": dict(
+                _load(
+                    spatial_extent={"west": 0, "south": 0, "east": 1, "north": 1},
+                    bands=None,
+                ),
+                description="the same collection",
+            ),
+            "other": _load(spatial_extent=None),
+            "time1": _filter_temporal("other", "2000-01-01", None),
+            "time2": _filter_temporal("other", "2000-01-01", None),
+            "sum1": add("load1", "time1"),
+            "sum2": add("load2", "time2"),
+            "sum": add("sum1", "sum2"),
+            "save": _save("sum"),
+        }
+        planned = plan_process_graph(graph)
+        self.assertEqual(["load1", "time1", "sum1", "sum", "save"], list(planned))
+        self.assertEqual(
+            {"x": {"from_node": "sum1"}, "y": {"from_node": "sum1"}},
+            planned["sum"]["arguments"],
+        )
+        # the filters are merged once the loads they consume are shared
+        self.assertEqual("load_collection", planned["time1"]["process_id"])
+
+    def test_identical_result_node(self):
+        planned = plan_process_graph(
+            {
+                "load1": _load(),
+                "load2": dict(_load(), result=True),
+            }
+        )
+        self.assertEqual({"load1": dict(_load(), result=True)}, planned)
+
+    def test_invalid_graph_is_unchanged(self):
+        graph = {
+            "load1": _load(),
+            "load2": _load(),
+            "save": _save("unknown"),
+        }
+        self.assertEqual(graph, plan_process_graph(graph))
@@ -0,0 +1,304 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from tests.core.mock_vc_provider import MockProvider
+from xcube_geodb_openeo.backend.processes import Process
+from xcube_geodb_openeo.backend.processes import get_processes_registry
+from xcube_geodb_openeo.backend.processes import get_simple_reducer
+from xcube_geodb_openeo.backend.processes import parse_bbox
+from xcube_geodb_openeo.backend.processes import parse_property_conditions
+from xcube_geodb_openeo.backend.processes import parse_property_selection
+from xcube_geodb_openeo.backend.processes import parse_temporal_extent
+from xcube_geodb_openeo.backend.processes import submit_process_sync
+
+
+def _multiply_by(factor: int):
+    return {
+        "process_graph": {
+            "multiply1": {
+                "process_id": "multiply",
+                "arguments": {"x": {"from_parameter": "x"}, "y": factor},
+                "result": True,
+            }
+        }
+    }
+
+
+class _Mutating(Process):
+    def execute(self, parameters, ctx):
+        parameters["input"] = None
+
+
+class ProcessesTest(unittest.TestCase):
+    def test_parameters_are_read_only(self):
+        parameters = {"input": 42}
+        with self.assertRaises(TypeError):
+            submit_process_sync(_Mutating({"id": "mutating"}), None, parameters)
+        self.assertEqual({"input": 42}, parameters)
+
+    def test_concurrent_apply(self):
+        vector_cube = MockProvider({}, "").get_vector_cube(("", "collection_1"))
+        apply = get_processes_registry().get_process("apply")
+
+        def run(factor):
+            result = submit_process_sync(
+                apply,
+                None,
+                {
+                    "input": vector_cube,
+                    "process": _multiply_by(factor),
+                    "access_token": None,
+                },
+            )
+            features = result.to_geojson()["features"]
+            return [f["properties"]["population"] for f in features]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(run, range(1, 9)))
+        self.assertEqual([[1000 * f, 100 * f] for f in range(1, 9)], results)
+
+    def test_math_processes(self):
+        vector_cube = MockProvider({}, "").get_vector_cube(("", "collection_1"))
+        registry = get_processes_registry()
+        for process_id, arguments, expected in (
+            ("subtract", {"x": vector_cube, "y": 100}, [900, 0]),
+            ("divide", {"x": vector_cube, "y": 4}, [250.0, 25.0]),
+            ("power", {"base": vector_cube, "p": 2}, [1000000, 10000]),
+            ("add", {"x": 2, "y": vector_cube}, [1002, 102]),
+            ("subtract", {"x": 10, "y": vector_cube}, [-990, -90]),
+            ("divide", {"x": 1000, "y": vector_cube}, [1.0, 10.0]),
+            ("divide", {"x": vector_cube, "y": 0}, [None, None]),
+            ("power", {"base": 2, "p": vector_cube}, [2.0**1000, 2.0**100]),
+            ("power", {"base": vector_cube, "p": -1}, [0.001, 0.01]),
+        ):
+            result = submit_process_sync(
+                registry.get_process(process_id), None, dict(arguments, input=None)
+            )
+            features = result.to_geojson()["features"]
+            self.assertEqual(
+                expected, [f["properties"]["population"] for f in features]
+            )
+
+    def test_scalar_math(self):
+        add = get_processes_registry().get_process("add")
+        self.assertEqual(5, submit_process_sync(add, None, {"input": 2, "y": 3}))
+        self.assertIsNone(submit_process_sync(add, None, {"input": 2, "y": None}))
+
+    def test_elementwise_functions(self):
+        registry = get_processes_registry()
+        for process_id, arguments, expected in (
+            ("absolute", {"x": -3.5}, 3.5),
+            ("sqrt", {"x": 9}, 3.0),
+            ("ln", {"x": 1}, 0.0),
+            ("log", {"x": 8, "base": 2}, 3.0),
+            ("exp", {"x": 0}, 1.0),
+            ("clip", {"x": -5, "min": -1, "max": 1}, -1),
+            (
+                "linear_scale_range",
+                {"x": 0.3, "inputMin": -1, "inputMax": 1, "outputMax": 255},
+                165.75,
+            ),
+            ("linear_scale_range", {"x": 25.5, "inputMin": 0, "inputMax": 255}, 0.1),
+            ("sqrt", {"x": None}, None),
+            ("log", {"x": 8, "base": None}, None),
+        ):
+            process = registry.get_process(process_id)
+            result = submit_process_sync(
+                process, None, dict(arguments, input=arguments["x"])
+            )
+            self.assertAlmostEqual(expected, result)
+            self.assertNotIsInstance(result, np.generic)
+
+    def test_apply(self):
+        vector_cube = MockProvider({}, "").get_vector_cube(("", "collection_1"))
+        apply = get_processes_registry().get_process("apply")
+        callback = {
+            "process_graph": {
+                "log1": {
+                    "process_id": "log",
+                    "arguments": {"x": {"from_parameter": "x"}, "base": 10},
+                },
+                "clip1": {
+                    "process_id": "clip",
+                    "arguments": {"x": {"from_node": "log1"}, "min": 0, "max": 2.5},
+                    "result": True,
+                },
+            }
+        }
+        result = submit_process_sync(
+            apply, None, {"input": vector_cube, "process": callback}
+        )
+        features = result.to_geojson()["features"]
+        self.assertEqual([2.5, 2.0], [f["properties"]["population"] for f in features])
+
+    def test_elementwise_function_on_vector_cube(self):
+        vector_cube = MockProvider({}, "").get_vector_cube(("", "collection_1"))
+        sqrt = get_processes_registry().get_process("sqrt")
+        result = submit_process_sync(sqrt, None, {"x": vector_cube, "input": None})
+        features = result.to_geojson()["features"]
+        self.assertAlmostEqual(
+            1000**0.5, features[0]["properties"]["population"], places=6
+        )
+
+    def test_reducer_callback(self):
+        mean = get_processes_registry().get_process("mean")
+        self.assertEqual(2.0, submit_process_sync(mean, None, {"input": [1, 2, 3]}))
+        for process_id in ("min", "max"):
+            reducer = get_processes_registry().get_process(process_id)
+            self.assertTrue(np.isnan(reducer.reduce(np.array([]))))
+
+    def test_grouped_reducers(self):
+        registry = get_processes_registry()
+        values = pd.DataFrame({"a": [1.0, 2.0, 3.0, 4.0, 6.0], "b": [0, 0, 1, 1, 1]})
+        codes = np.array([0, 1, 0, 1, 1])
+        for process_id in ("mean", "median", "sd", "min", "max", "count"):
+            reducer = registry.get_process(process_id)
+            result = reducer.reduce_grouped(values, codes)
+            for code in (0, 1):
+                for column in ("a", "b"):
+                    expected = reducer.execute(
+                        {"input": values[column][codes == code].tolist()}, None
+                    )
+                    self.assertAlmostEqual(expected, result.loc[code, column])
+
+    def test_reduce_chunks(self):
+        registry = get_processes_registry()
+        values = pd.DataFrame(
+            {"a": [1.0, 2.0, np.nan, 4.0, 7.0, 3.0], "b": [6.0, 5.0, 4, 3, 2, 1]}
+        )
+        codes = np.array([0, 1, 0, 1, 1, 2])
+        chunks = [(values.iloc[:2], codes[:2]), (values.iloc[2:], codes[2:])]
+        for process_id in ("mean", "median", "sd", "min", "max", "count"):
+            reducer = registry.get_process(process_id)
+            pd.testing.assert_frame_equal(
+                reducer.reduce_grouped(values, codes),
+                reducer.reduce_chunks(chunks),
+                check_dtype=False,
+                check_index_type=False,
+            )
+
+    def test_simple_reducer(self):
+        def reducer(process_id, **arguments):
+            arguments = arguments or {"data": {"from_parameter": "data"}}
+            return {
+                "process_graph": {
+                    "r": {"process_id": process_id, "arguments": arguments}
+                }
+            }
+
+        self.assertIs(
+            get_processes_registry().get_process("median"),
+            get_simple_reducer(reducer("median")),
+        )
+        self.assertIsNone(get_simple_reducer(reducer("add", x=1, y=2)))
+        self.assertIsNone(
+            get_simple_reducer(reducer("mean", data={"from_parameter": "x"}))
+        )
+
+    def test_parse_extents(self):
+        self.assertEqual((0.0, 1.0, 2.0, 3.0), parse_bbox("(0, 1, 2, 3)"))
+        self.assertEqual((0.0, 1.0, 2.0, 3.0), parse_bbox([0, 1, 2, 3]))
+        self.assertIsNone(parse_temporal_extent(None))
+        self.assertIsNone(parse_temporal_extent(["None", None]))
+        self.assertEqual(
+            (None, pd.Timestamp("2001-01-01", tz="UTC")),
+            parse_temporal_extent([None, "2001-01-01"]),
+        )
+
+    def test_load_collection_parameters(self):
+        load_collection = get_processes_registry().get_process("load_collection")
+        params = load_collection.translate_parameters(
+            {
+                "id": "collection_1",
+                "spatial_extent": {"west": 0, "south": 1, "east": 2, "north": 3},
+                "temporal_extent": ["2000-01-01", None],
+                "access_token": None,
+            }
+        )
+        self.assertEqual((0.0, 1.0, 2.0, 3.0), params["bbox"])
+        self.assertEqual(
+            (pd.Timestamp("2000-01-01", tz="UTC"), None), params["time_range"]
+        )
+        params = load_collection.translate_parameters(
+            {"id": "collection_1", "spatial_extent": "None", "access_token": None}
+        )
+        self.assertIsNone(params["bbox"])
+        self.assertIsNone(params["time_range"])
+
+    def test_parse_properties(self):
+        def condition(process_id, x, y):
+            return {
+                "process_graph": {
+                    "c": {
+                        "process_id": process_id,
+                        "arguments": {"x": x, "y": y},
+                        "result": True,
+                    }
+                }
+            }
+
+        value = {"from_parameter": "value"}
+        self.assertEqual(
+            (("name", "eq", "a"), ("value", "gt", 2)),
+            parse_property_conditions(
+                {
+                    "value": condition("lt", 2, value),
+                    "name": condition("eq", value, "a"),
+                }
+            ),
+        )
+        self.assertIsNone(parse_property_conditions(["value"]))
+        with self.assertRaises(ValueError):
+            parse_property_conditions({"value": condition("lt", value, value)})
+        self.assertEqual(("value",), parse_property_selection(["value"]))
+        self.assertEqual(("b",), parse_property_selection(None, ["b"]))
+        self.assertIsNone(
+            parse_property_selection({"value": condition("eq", value, 1)})
+        )
+
+
+class ProcessRegistryTest(unittest.TestCase):
+    def test_get_process(self):
+        registry = get_processes_registry()
+        self.assertEqual("mean", registry.get_process("mean").metadata["id"])
+        with self.assertRaises(ValueError):
+            registry.get_process("miau!")
+
+    def test_bodies(self):
+        registry = get_processes_registry()
+        body = registry.get_processes_body()
+        self.assertIs(body, registry.get_processes_body())
+        processes = json.loads(body)
+        self.assertEqual(
+            sorted(p.metadata["id"] for p in registry.processes),
+            sorted(p["id"] for p in processes["processes"]),
+        )
+        self.assertEqual(
+            registry.get_file_formats(),
+            json.loads(registry.get_file_formats_body()),
+        )
@@ -0,0 +1,108 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+import multiprocessing
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xcube_geodb_openeo.backend.processes import get_processes_registry
+from xcube_geodb_openeo.backend.workers import PartitionedReducer
+from xcube_geodb_openeo.backend.workers import get_chunked_reducer
+from xcube_geodb_openeo.backend.workers import get_partitions
+
+
+class WorkersTest(unittest.TestCase):
+    def test_get_partitions(self):
+        codes = np.array([0, 0, 0, 1, 1, 2, 3, 3, 3, 3])
+        self.assertEqual([(0, 3), (3, 6), (6, 10)], get_partitions(codes, 3))
+        self.assertEqual([(0, 10)], get_partitions(np.zeros(10), 4))
+
+    def test_partitioned_reducer(self):
+        rng = np.random.default_rng(0)
+        values = pd.DataFrame(
+            {"a": rng.random(1000), "b": rng.integers(0, 10, 1000)}
+        ).astype({"b": float})
+        values.loc[::7, "a"] = np.nan
+        codes = rng.integers(0, 50, 1000)
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            for reducer_id in ("mean", "median", "sd", "min", "max", "count"):
+                reducer = get_processes_registry().get_process(reducer_id)
+                partitioned = PartitionedReducer(reducer_id, pool, 3, 100)
+                expected = reducer.reduce_grouped(values, codes)
+                actual = partitioned(values, codes)
+                pd.testing.assert_frame_equal(
+                    expected, actual.sort_index(), check_dtype=False
+                )
+        finally:
+            pool.shutdown()
+
+    def test_partitioned_reducer_falls_back_on_broken_pool(self):
+        values = pd.DataFrame({"a": np.arange(1000, dtype=float)})
+        codes = np.arange(1000) % 7
+        median = get_processes_registry().get_process("median")
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            # a worker dies, so the pool is broken
+            pool.submit(os._exit, 1).exception()
+            actual = PartitionedReducer("median", pool, 2, 100)(values, codes)
+        finally:
+            pool.shutdown()
+        pd.testing.assert_frame_equal(median.reduce_grouped(values, codes), actual)
+
+    def test_partitioned_reducer_reduces_chunks(self):
+        rng = np.random.default_rng(1)
+        values = pd.DataFrame({"a": rng.random(1000), "b": rng.random(1000)})
+        values.loc[::5, "b"] = np.nan
+        codes = rng.integers(0, 40, 1000)
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            for reducer_id in ("mean", "median", "sd", "min", "max", "count"):
+                reducer = get_processes_registry().get_process(reducer_id)
+                partitioned = PartitionedReducer(reducer_id, pool, 2, 100)
+                expected = reducer.reduce_grouped(values, codes)
+                for chunk_rows in (300, 1000):
+                    chunks = (
+                        (values[i : i + chunk_rows], codes[i : i + chunk_rows])
+                        for i in range(0, len(values), chunk_rows)
+                    )
+                    actual = partitioned.reduce_chunks(chunks)
+                    pd.testing.assert_frame_equal(
+                        expected, actual.sort_index(), check_dtype=False
+                    )
+        finally:
+            pool.shutdown()
+
+    def test_get_chunked_reducer(self):
+        mean = get_processes_registry().get_process("mean")
+        self.assertEqual(mean.reduce_chunks, get_chunked_reducer(mean, {}))
+        chunked = get_chunked_reducer(mean, {"worker_pool_size": 1})
+        self.assertIsInstance(chunked.__self__, PartitionedReducer)
@@ -57,6 +57,9 @@ class MockProvider(VectorCubeProvider, DataSource):
         self,
         collection_id: Tuple[str, str],
         bbox: Optional[Tuple[float, float, float, float]] = None,
+        time_range: Optional[Tuple[Any, Any]] = None,
+        properties: Optional[Sequence[str]] = None,
+        conditions: Optional[Sequence[Tuple[str, str, Any]]] = None,
     ) -> VectorCube:
         self.bbox = bbox
         return VectorCube(collection_id, self)
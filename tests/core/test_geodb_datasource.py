@@ -0,0 +1,387 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import datetime
+import operator
+import re
+import sqlite3
+import statistics
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import pytz
+import shapely.wkt
+
+from xcube_geodb_openeo.backend.processes import get_processes_registry
+from xcube_geodb_openeo.core.geodb_datasource import GeoDBVectorSource
+from xcube_geodb_openeo.core.geodb_datasource import SQL_AGGREGATES
+from xcube_geodb_openeo.core.operations import ColumnFunction
+from xcube_geodb_openeo.core.operations import ElementwiseMath
+from xcube_geodb_openeo.core.operations import TemporalAggregation
+from xcube_geodb_openeo.core.tools import VersionCache
+from xcube_geodb_openeo.core.vectorcube import VectorCube
+
+POINT_1 = shapely.wkt.loads("POINT (9 53)")
+POINT_2 = shapely.wkt.loads("POINT (10 54)")
+
+
+def _interval(month: int):
+    return (
+        datetime.datetime(2000, month, 1, tzinfo=pytz.UTC),
+        datetime.datetime(2000, month + 1, 1, tzinfo=pytz.UTC),
+    )
+
+
+class _SQLiteGeoDB:
+    """
+    A geoDB client running the queries of GeoDBVectorSource on an in-memory
+    SQLite table. The PostgreSQL aggregates used are rewritten into
+    aggregates registered with SQLite; geometries are stored as WKT.
+    """
+
+    ROWS = [
+        # id, date, geometry, value, name
+        (1, "2000-01-05T00:00:00+00:00", "POINT (9 53)", 1.0, "a"),
+        (2, "2000-01-06T00:00:00+00:00", "POINT (9 53)", 2.0, "b"),
+        (3, "2000-02-05T00:00:00+00:00", "POINT (9 53)", 3.0, "c"),
+        (4, "2000-01-05T00:00:00+00:00", "POINT (10 54)", None, "d"),
+        (5, "2000-02-05T00:00:00+00:00", "POINT (10 54)", None, None),
+        # outside all intervals
+        (6, "2001-01-05T00:00:00+00:00", "POINT (11 55)", 7.0, "e"),
+        (7, None, "POINT (9 53)", 8.0, None),
+    ]
+
+    def __init__(self):
+        self.queries = []
+        self._connection = sqlite3.connect(":memory:")
+        self._connection.execute(
+            "CREATE TABLE collection (id INTEGER, created_at TEXT,"
+            " modified_at TEXT, date TEXT, geometry TEXT, value REAL, name TEXT)"
+        )
+        self._connection.executemany(
+            "INSERT INTO collection VALUES (?, '2000-01-01', NULL, ?, ?, ?, ?)",
+            self.ROWS,
+        )
+        self._connection.create_aggregate("median", 1, _MedianAggregate)
+        self._connection.create_aggregate("stddev_pop", 1, _StdAggregate)
+        self._connection.create_aggregate("last_by", 2, _LastAggregate)
+
+    def get_collection_info(self, name, database):
+        return {
+            "properties": {
+                "id": {"type": "integer"},
+                "created_at": {"type": "string"},
+                "modified_at": {"type": "string"},
+                "date": {"type": "string"},
+                "geometry": {"type": "string"},
+                "value": {"type": "number"},
+                "name": {"type": "string"},
+            }
+        }
+
+    def get_collection_pg(
+        self,
+        collection,
+        select="*",
+        where=None,
+        group=None,
+        order=None,
+        limit=None,
+        offset=None,
+        database=None,
+    ):
+        self.queries.append(dict(select=select, where=where, group=group))
+        select = re.sub(
+            r"percentile_cont\(0\.5\) WITHIN GROUP \(ORDER BY (\w+)\)",
+            r"median(\1)",
+            select,
+        )
+        select = re.sub(
+            r"\(array_agg\((\w+) ORDER BY (\w+) DESC\)\)\[1\]",
+            r"last_by(\1, \2)",
+            select,
+        )
+        query = f"SELECT {select} FROM {collection}"
+        if where:
+            query += f" WHERE {where}"
+        if group:
+            query += f" GROUP BY {group}"
+        if order:
+            query += f" ORDER BY {order}"
+        if limit:
+            query += f" LIMIT {limit} OFFSET {offset or 0}"
+        cursor = self._connection.execute(query)
+        frame = pd.DataFrame(
+            cursor.fetchall(), columns=[d[0] for d in cursor.description]
+        )
+        if "geometry" in frame:
+            frame["geometry"] = frame["geometry"].map(shapely.wkt.loads)
+        return frame
+
+
+class _MedianAggregate:
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+class _StdAggregate(_MedianAggregate):
+    def finalize(self):
+        return statistics.pstdev(self.values) if self.values else None
+
+
+class _LastAggregate:
+    def __init__(self):
+        self.last = None
+
+    def step(self, value, order):
+        if self.last is None or order > self.last[1]:
+            self.last = (value, order)
+
+    def finalize(self):
+        return self.last[0]
+
+
+def _comparable(features):
+    return [
+        (
+            shapely.geometry.shape(f["geometry"]).wkt,
+            dict(f["properties"], created_at=None),
+        )
+        for f in features
+    ]
+
+
+class GeoDBVectorSourceTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.geodb = MagicMock()
+        self.geodb.get_collection_info.return_value = {
+            "properties": {
+                "id": {"type": "integer"},
+                "created_at": {"type": "string"},
+                "modified_at": {"type": "string"},
+                "geometry": {"type": "string"},
+                "date": {"type": "string"},
+                "name": {"type": "string"},
+                "value": {"type": "number"},
+            }
+        }
+        self.geodb.get_collection_pg.return_value = pd.DataFrame(
+            {
+                "geometry": [POINT_1, POINT_1, POINT_2],
+                "interval_index": [0, 1, 1],
+                "value": [1.5, 3.0, np.nan],
+                "modified_at": [None, None, None],
+                "name": ["a", "b", "c"],
+            }
+        )
+        self.source = GeoDBVectorSource(("db", "collection"), self.geodb)
+
+    def test_time_range_is_part_of_where(self):
+        source = GeoDBVectorSource(
+            ("db", "collection"),
+            self.geodb,
+            time_range=(pd.Timestamp("2000-01-01", tz="UTC"), None),
+        )
+        self.assertEqual("date >= '2000-01-01T00:00:00+00:00'", source._get_where())
+
+    def test_properties_and_conditions(self):
+        source = GeoDBVectorSource(
+            ("db", "collection"),
+            self.geodb,
+            properties=("value",),
+            conditions=(
+                ("name", "eq", "it's"),
+                ("value", "gte", 2),
+                ("name", "neq", None),
+            ),
+        )
+        self.assertEqual("id, geometry, date, value", source._get_select())
+        self.assertEqual(
+            "name = 'it''s' AND value >= 2 AND name IS NOT NULL", source._get_where()
+        )
+        self.assertEqual((["value"], []), source._get_property_columns("date"))
+        with self.assertRaises(ValueError):
+            GeoDBVectorSource(
+                ("db", "collection"), self.geodb, properties=("unknown",)
+            )._get_select()
+        with self.assertRaises(ValueError):
+            GeoDBVectorSource(
+                ("db", "collection"),
+                self.geodb,
+                conditions=(("value; DROP TABLE x", "eq", 1),),
+            )._get_where()
+
+    def test_histogram_of_constant_column(self):
+        self.geodb.count_collection_rows.return_value = 100
+        self.geodb.get_collection_pg.side_effect = [
+            pd.DataFrame({"value_min": [2.0], "value_max": [2.0]}),
+            pd.DataFrame({"count": [3]}),
+        ]
+        histogram = self.source.get_property_statistics(bins=2)["value"]["histogram"]
+        self.assertEqual([3, 0], histogram["counts"])
+        self.assertEqual(
+            "value IS NOT NULL",
+            self.geodb.get_collection_pg.call_args.kwargs["where"],
+        )
+
+    def test_get_version(self):
+        self.geodb.get_collection_pg.return_value = pd.DataFrame(
+            {"created": ["2000-01-01"], "modified": [None], "count": [3]}
+        )
+        self.assertEqual("2000-01-01/None/3", self.source.get_version())
+
+    def test_get_version_is_cached(self):
+        self.geodb.get_collection_pg.return_value = pd.DataFrame(
+            {"created": ["2000-01-01"], "modified": [None], "count": [3]}
+        )
+        version_cache = VersionCache(max_age=1000)
+        for _ in range(3):
+            source = GeoDBVectorSource(
+                ("db", "collection"), self.geodb, version_cache=version_cache
+            )
+            self.assertEqual("2000-01-01/None/3", source.get_version())
+        self.assertEqual(1, self.geodb.get_collection_pg.call_count)
+        self.assertEqual(1, self.geodb.get_collection_info.call_count)
+
+    def test_aggregate_temporal(self):
+        source = GeoDBVectorSource(("db", "collection"), _SQLiteGeoDB())
+        features = source.aggregate_temporal(
+            "mean", [_interval(1), _interval(2)], ["jan", "feb"]
+        )
+        self.assertEqual(6, len(features))
+        self.assertEqual(
+            [
+                ("POINT (9 53)", "jan", 1.5),
+                ("POINT (9 53)", "feb", 3.0),
+                ("POINT (10 54)", "jan", None),
+                ("POINT (10 54)", "feb", None),
+                ("POINT (11 55)", "jan", None),
+                ("POINT (11 55)", "feb", None),
+            ],
+            [
+                (
+                    shapely.geometry.shape(f["geometry"]).wkt,
+                    f["properties"]["date"],
+                    f["properties"]["value"],
+                )
+                for f in features
+            ],
+        )
+        # the other properties are taken from the last feature, even if it
+        # lies outside the intervals
+        self.assertEqual(
+            [None, None, None, None, "e", "e"],
+            [f["properties"]["name"] for f in features],
+        )
+        self.assertIsNone(features[0]["properties"]["modified_at"])
+        self.assertNotIn("id", features[0]["properties"])
+
+    def test_aggregate_temporal_overlapping_intervals(self):
+        geodb = _SQLiteGeoDB()
+        source = GeoDBVectorSource(("db", "collection"), geodb)
+        start, _ = _interval(1)
+        _, end = _interval(2)
+        features = source.aggregate_temporal(
+            "median", [(start, end), _interval(2)], ["both", "feb"]
+        )
+        selects = [q["select"] for q in geodb.queries]
+        self.assertEqual(3, len(selects))
+        self.assertIn("percentile_cont(0.5) WITHIN GROUP (ORDER BY value)", selects[1])
+        self.assertEqual([2.0, 3.0], [f["properties"]["value"] for f in features[:2]])
+
+    def test_aggregate_temporal_unsupported_reducer(self):
+        self.assertIsNone(
+            self.source.aggregate_temporal("first", [_interval(1)], ["jan"])
+        )
+        self.geodb.get_collection_pg.assert_not_called()
+
+    def test_aggregate_temporal_matches_aggregation_in_memory(self):
+        registry = get_processes_registry()
+        start, _ = _interval(1)
+        _, end = _interval(2)
+        for intervals in (
+            [_interval(1), _interval(2), _interval(3)],
+            [(start, end), _interval(2)],
+        ):
+            labels = [f"label_{i}" for i in range(len(intervals))]
+            for reducer_id in SQL_AGGREGATES:
+                source = GeoDBVectorSource(("db", "collection"), _SQLiteGeoDB())
+                aggregation = TemporalAggregation(
+                    None,
+                    intervals,
+                    "date",
+                    reduce_grouped=registry.get_process(reducer_id).reduce_grouped,
+                    labels=labels,
+                    reducer_id=reducer_id,
+                )
+                in_memory = aggregation.apply(
+                    source.load_features(limit=None, with_stac_info=False)
+                )
+                pushed_down = aggregation.push_down(source)
+                self.assertEqual(
+                    _comparable(in_memory), _comparable(pushed_down), reducer_id
+                )
+
+    def test_vector_cube_pushes_aggregation_down(self):
+        geodb = _SQLiteGeoDB()
+        source = GeoDBVectorSource(("db", "collection"), geodb)
+        vector_cube = VectorCube(("db", "collection"), source)
+        aggregated = vector_cube.with_operation(
+            TemporalAggregation(None, [_interval(1)], "date", reducer_id="sd")
+        )
+        features = aggregated.load_features(limit=None, with_stac_info=False)
+        self.assertEqual(3, len(features))
+        # the geometries and their last features, and the aggregates
+        self.assertEqual(2, len(geodb.queries))
+        self.assertIn("stddev_pop(value) AS value", geodb.queries[1]["select"])
+        self.assertEqual(0.5, features[0]["properties"]["value"])
+
+    def test_vector_cube_pushes_math_down(self):
+        self.geodb.get_collection_pg.return_value = pd.DataFrame(
+            {"id": [1], "geometry": [POINT_1], "date": ["2000-01-01"], "value": [-9.0]}
+        )
+        self.geodb.get_collection_pg.return_value.bounds = pd.DataFrame(
+            {"minx": [9], "miny": [53], "maxx": [9], "maxy": [53]}
+        )
+        vector_cube = (
+            VectorCube(("db", "collection"), self.source)
+            .with_operation(ElementwiseMath(operator.mul, 2, "date"))
+            .with_operation(ElementwiseMath(operator.truediv, 3, "date"))
+            .with_operation(ColumnFunction(np.absolute, "date"))
+        )
+        features = vector_cube.load_features(limit=5, offset=10)
+        self.geodb.get_collection_pg.assert_called_once()
+        kwargs = self.geodb.get_collection_pg.call_args.kwargs
+        self.assertIn("((value * (2))::float8 / (3)) AS value", kwargs["select"])
+        self.assertIn("geometry, date, name", kwargs["select"])
+        self.assertEqual((5, 10), (kwargs["limit"], kwargs["offset"]))
+        # the remaining operation is applied to the computed values
+        self.assertEqual(9.0, features[0]["properties"]["value"])
+        self.assertEqual("1", features[0]["id"])
@@ -0,0 +1,399 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import datetime
+import json
+import operator
+import unittest
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from xcube_geodb_openeo.backend.processes import get_processes_registry
+from xcube_geodb_openeo.core.operations import ColumnFunction
+from xcube_geodb_openeo.core.operations import CubeMath
+from xcube_geodb_openeo.core.operations import ElementwiseMath
+from xcube_geodb_openeo.core.operations import Filter
+from xcube_geodb_openeo.core.operations import Projection
+from xcube_geodb_openeo.core.operations import PropertyColumns
+from xcube_geodb_openeo.core.operations import TemporalAggregation
+from xcube_geodb_openeo.core.operations import TemporalFilter
+from xcube_geodb_openeo.core.operations import execute_plan
+from xcube_geodb_openeo.core.operations import preserves_count
+
+POINT = {"type": "Point", "coordinates": [9.0, 52.0]}
+
+
+def _feature(feature_id, time, value, name="hamburg"):
+    return {
+        "type": "Feature",
+        "id": feature_id,
+        "geometry": POINT,
+        "properties": {"date": time, "value": value, "name": name},
+    }
+
+
+_GROUPED_REDUCERS = {
+    "mean": lambda values, codes: values.groupby(codes).mean(),
+    "median": lambda values, codes: values.groupby(codes).median(),
+    "std": lambda values, codes: values.groupby(codes).std(ddof=0),
+}
+
+
+class _Cube:
+    id = "other"
+
+    def __init__(self, features):
+        self._features = features
+
+    def load_features(self, limit=None, offset=0, with_stac_info=True):
+        return self._features
+
+
+class OperationsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.features = [
+            _feature("0", "2000-01-01T00:00:00Z", 1),
+            _feature("1", "2000-01-02T00:00:00Z", 2.5),
+            _feature("2", "2000-02-01T00:00:00Z", 4),
+        ]
+
+    def test_fused_math_does_not_modify_input(self):
+        plan = [
+            ElementwiseMath(operator.add, 1, "date"),
+            ElementwiseMath(operator.mul, 2, "date"),
+        ]
+        result = execute_plan(self.features, plan)
+        self.assertEqual([4, 7.0, 10], [f["properties"]["value"] for f in result])
+        self.assertEqual([1, 2.5, 4], [f["properties"]["value"] for f in self.features])
+        self.assertEqual("hamburg", result[0]["properties"]["name"])
+        self.assertEqual("2000-01-01T00:00:00Z", result[0]["properties"]["date"])
+
+    def test_projection_and_filter(self):
+        plan = [
+            Filter(lambda f: f["properties"]["value"] > 2),
+            Projection(["value"]),
+        ]
+        result = execute_plan(self.features, plan)
+        self.assertEqual(["1", "2"], [f["id"] for f in result])
+        self.assertEqual({"value": 2.5}, result[0]["properties"])
+        self.assertFalse(preserves_count(plan))
+        self.assertTrue(preserves_count(plan[1:]))
+
+    def test_cube_math(self):
+        other = _Cube(list(reversed(self.features)))
+        result = execute_plan(self.features, [CubeMath(other, operator.add, "date")])
+        self.assertEqual([2, 5.0, 8], [f["properties"]["value"] for f in result])
+
+    def test_cube_math_nulls_non_finite_results(self):
+        other = _Cube(
+            [
+                _feature("0", "2000-01-01T00:00:00Z", 0),
+                _feature("1", "2000-01-02T00:00:00Z", None),
+                _feature("2", "2000-02-01T00:00:00Z", -1),
+            ]
+        )
+        for operation, expected in (
+            (operator.truediv, [None, None, -4.0]),
+            (operator.pow, [1.0, None, 0.25]),
+        ):
+            result = CubeMath(other, operation, "date").apply(self.features)
+            self.assertEqual(expected, [f["properties"]["value"] for f in result])
+        json.dumps(result, allow_nan=False)
+
+    def test_cube_math_mismatches(self):
+        other = _Cube([_feature("2", "2000-01-01T00:00:00Z", 10)])
+        for policy, expected in (
+            ("null", [None, None, 14]),
+            ("keep", [1, 2.5, 14]),
+        ):
+            result = CubeMath(other, operator.add, "date", policy).apply(self.features)
+            self.assertEqual(expected, [f["properties"]["value"] for f in result])
+        with self.assertRaises(ValueError):
+            CubeMath(other, operator.add, "date", "error").apply(self.features)
+
+    def test_cube_math_joins_on_geometry_and_time(self):
+        features = [dict(f, id=None) for f in self.features]
+        other = _Cube(list(reversed(features)))
+        result = CubeMath(other, operator.mul, "date").apply(features)
+        self.assertEqual([1, 6.25, 16], [f["properties"]["value"] for f in result])
+
+    def test_temporal_aggregation(self):
+        utc = pytz.UTC
+        end_date = datetime.datetime(2000, 2, 1, tzinfo=utc)
+        plan = [
+            ElementwiseMath(operator.mul, 2, "date"),
+            TemporalAggregation(
+                lambda values: sum(values) / len(values),
+                [(datetime.datetime(2000, 1, 1, tzinfo=utc), end_date)],
+                "date",
+            ),
+        ]
+        result = execute_plan(self.features, plan)
+        self.assertEqual(1, len(result))
+        self.assertEqual(3.5, result[0]["properties"]["value"])
+        self.assertEqual(end_date, result[0]["properties"]["date"])
+        self.assertEqual("hamburg", result[0]["properties"]["name"])
+
+    def test_columnar_math_keeps_missing_values(self):
+        self.features[1]["properties"]["value"] = None
+        self.features[2]["properties"]["flag"] = True
+        result = ElementwiseMath(operator.sub, 1, "date").apply(self.features)
+        self.assertEqual([0.0, None, 3.0], [f["properties"]["value"] for f in result])
+        self.assertEqual(True, result[2]["properties"]["flag"])
+        self.assertNotIn("flag", result[0]["properties"])
+        self.assertIsNone(self.features[1]["properties"]["value"])
+
+    def test_column_expression(self):
+        self.assertEqual(
+            "(value + (1))",
+            ElementwiseMath(operator.add, 1, "date").column_expression("value"),
+        )
+        self.assertEqual(
+            "power(value, 2)",
+            ElementwiseMath(operator.pow, np.int64(2), "date").column_expression(
+                "value"
+            ),
+        )
+        self.assertEqual(
+            "(10 - (value))",
+            ElementwiseMath(operator.sub, 10, "date", True).column_expression("value"),
+        )
+        self.assertEqual(
+            "power(2, value)",
+            ElementwiseMath(operator.pow, 2, "date", True).column_expression("value"),
+        )
+        for operation, value, reverse in (
+            # SQL raises errors where the results are null
+            (operator.pow, 0.5, False),
+            (operator.pow, -1, False),
+            (operator.pow, -2, True),
+            (operator.truediv, 1, True),
+        ):
+            self.assertIsNone(
+                ElementwiseMath(operation, value, "date", reverse).column_expression(
+                    "value"
+                )
+            )
+        for operation, value in (
+            (operator.truediv, 0),
+            (operator.add, True),
+            (operator.add, float("nan")),
+            (np.maximum, 1),
+        ):
+            self.assertIsNone(
+                ElementwiseMath(operation, value, "date").column_expression("value")
+            )
+        self.assertIsNone(ColumnFunction(np.sqrt, "date").column_expression("value"))
+
+    def test_elementwise_math_with_non_finite_results(self):
+        self.features[1]["properties"]["value"] = 0
+        result = ElementwiseMath(operator.truediv, 0, "date").apply(self.features)
+        self.assertEqual([None] * 3, [f["properties"]["value"] for f in result])
+        self.setUp()
+        self.features[0]["properties"]["value"] = 0
+        self.features[1]["properties"]["value"] = 2
+        result = ElementwiseMath(operator.pow, -1, "date").apply(self.features)
+        self.assertEqual([None, 0.5, 0.25], [f["properties"]["value"] for f in result])
+
+    def test_reversed_elementwise_math(self):
+        for operation, expected in (
+            (operator.sub, [9, 7.5, 6]),
+            (operator.truediv, [10.0, 4.0, 2.5]),
+            (operator.pow, list(np.power(10.0, [1, 2.5, 4]))),
+        ):
+            self.setUp()
+            result = ElementwiseMath(operation, 10, "date", reverse=True).apply(
+                self.features
+            )
+            self.assertEqual(expected, [f["properties"]["value"] for f in result])
+
+    def test_column_function(self):
+        self.features[1]["properties"]["value"] = None
+        self.features[2]["properties"]["value"] = -4
+        result = ColumnFunction(np.sqrt, "date").apply(self.features)
+        self.assertEqual([1.0, None, None], [f["properties"]["value"] for f in result])
+        result = ColumnFunction(lambda column: 7, "date").apply(self.features)
+        self.assertEqual([7, None, 7], [f["properties"]["value"] for f in result])
+        result = ColumnFunction(lambda column: None, "date").apply(self.features)
+        self.assertEqual([None] * 3, [f["properties"]["value"] for f in result])
+        self.assertEqual("hamburg", result[0]["properties"]["name"])
+
+    def test_temporal_filter(self):
+        features = self.features + [_feature("3", None, 5)]
+        start = pd.Timestamp("2000-01-02", tz="UTC")
+        end = pd.Timestamp("2000-02-01", tz="UTC")
+        for start_, end_, expected in (
+            (start, end, ["1"]),
+            (start, None, ["1", "2"]),
+            (None, end, ["0", "1"]),
+        ):
+            result = TemporalFilter(start_, end_, "date").apply(features)
+            self.assertEqual(expected, [f["id"] for f in result])
+        result[0]["properties"]["value"] = 7
+        self.assertEqual(1, features[0]["properties"]["value"])
+        self.assertEqual([], TemporalFilter(start, end, "date").apply([]))
+
+    def test_property_columns(self):
+        self.features[2]["properties"]["flag"] = True
+        columns = PropertyColumns(self.features)
+        self.assertEqual(["date", "value", "name", "flag"], columns.names)
+        self.assertEqual(["value"], columns.numeric_names("date"))
+        np.testing.assert_array_equal([1, 2.5, 4], columns["value"])
+
+    def test_temporal_aggregation_intervals(self):
+        utc = pytz.UTC
+        jan = datetime.datetime(2000, 1, 1, tzinfo=utc)
+        feb = datetime.datetime(2000, 2, 1, tzinfo=utc)
+        mar = datetime.datetime(2000, 3, 1, tzinfo=utc)
+        disjoint = [(feb, mar), (jan, feb)]
+        overlapping = [(jan, mar), (jan, feb)]
+        for intervals, expected in (
+            (disjoint, [4.0, 1.75]),
+            (overlapping, [2.5, 1.75]),
+        ):
+            for reduce_grouped in (_GROUPED_REDUCERS["mean"], None):
+                result = TemporalAggregation(
+                    np.mean,
+                    intervals,
+                    "date",
+                    reduce_grouped=reduce_grouped,
+                    labels=["first", "second"],
+                ).apply(self.features)
+                self.assertEqual(expected, [f["properties"]["value"] for f in result])
+                self.assertEqual(
+                    ["first", "second"], [f["properties"]["date"] for f in result]
+                )
+        with self.assertRaises(ValueError):
+            TemporalAggregation(np.mean, disjoint, "date", labels=["first"])
+
+    def test_temporal_aggregation_of_empty_intervals(self):
+        utc = pytz.UTC
+        intervals = [
+            (
+                datetime.datetime(2000, 1, 1, tzinfo=utc),
+                datetime.datetime(2000, 2, 1, tzinfo=utc),
+            ),
+            (
+                datetime.datetime(2001, 1, 1, tzinfo=utc),
+                datetime.datetime(2001, 2, 1, tzinfo=utc),
+            ),
+        ]
+        count = lambda values, codes: values.groupby(codes).count()
+        for reduce, reduce_grouped, reducer_id, expected in (
+            (np.mean, _GROUPED_REDUCERS["mean"], "mean", [1.75, None]),
+            (np.mean, None, None, [1.75, None]),
+            (len, count, "count", [2, 0]),
+            (len, None, "count", [2, 0]),
+            # reducers that fail on empty groups
+            (np.min, None, None, [1, None]),
+            (lambda values: np.max(values) - np.min(values), None, None, [1.5, None]),
+        ):
+            result = TemporalAggregation(
+                reduce,
+                intervals,
+                "date",
+                reduce_grouped=reduce_grouped,
+                reducer_id=reducer_id,
+            ).apply(self.features)
+            self.assertEqual(expected, [f["properties"]["value"] for f in result])
+
+    def test_chunked_temporal_aggregation(self):
+        other = {"type": "Point", "coordinates": [10.0, 53.0]}
+        features = self.features + [
+            dict(_feature("3", "2000-01-03T00:00:00Z", 8, "bremen"), geometry=other),
+            dict(_feature("4", "2000-01-04T00:00:00Z", None), geometry=other),
+            dict(_feature("5", "2000-01-05T00:00:00Z", 9, "bremen"), geometry=other),
+        ]
+        # numeric, but missing in the first chunks
+        features[4]["properties"]["extra"] = 1.5
+        features[5]["properties"]["extra"] = 3
+        # a number in one chunk, a string in another
+        features[0]["properties"]["mixed"] = 1
+        features[5]["properties"]["mixed"] = "x"
+        utc = pytz.UTC
+        args = (
+            [
+                (
+                    datetime.datetime(2000, 1, 1, tzinfo=utc),
+                    datetime.datetime(2000, 1, 4, tzinfo=utc),
+                ),
+                (
+                    datetime.datetime(2000, 1, 2, tzinfo=utc),
+                    datetime.datetime(2000, 2, 1, tzinfo=utc),
+                ),
+            ],
+            "date",
+        )
+        registry = get_processes_registry()
+        for reducer_id in ("mean", "median", "sd", "count"):
+            reducer = registry.get_process(reducer_id)
+            expected = TemporalAggregation(
+                None, *args, reduce_grouped=reducer.reduce_grouped
+            ).apply(features)
+            for chunk_rows in (1, 2, 100):
+                actual = TemporalAggregation(
+                    None,
+                    *args,
+                    reduce_chunks=reducer.reduce_chunks,
+                    chunk_rows=chunk_rows,
+                ).apply(features)
+                self.assertEqual(4, len(actual))
+                for e, a in zip(expected, actual):
+                    self.assertEqual(e["geometry"], a["geometry"])
+                    e_props = dict(e["properties"], created_at=None)
+                    a_props = dict(a["properties"], created_at=None)
+                    self.assertEqual(e_props, a_props)
+                self.assertNotIn("mixed", actual[0]["properties"])
+                self.assertIn("extra", actual[3]["properties"])
+
+    def test_vectorized_temporal_aggregation(self):
+        other = {"type": "Point", "coordinates": [10.0, 53.0]}
+        features = self.features + [
+            dict(_feature("3", "2000-01-03T00:00:00Z", 8, "bremen"), geometry=other),
+            dict(_feature("4", "2000-03-03T00:00:00Z", 9, "bremen"), geometry=other),
+        ]
+        features[1]["properties"]["flag"] = True
+        utc = pytz.UTC
+        args = (
+            [
+                (
+                    datetime.datetime(2000, 1, 1, tzinfo=utc),
+                    datetime.datetime(2000, 2, 1, tzinfo=utc),
+                )
+            ],
+            "date",
+        )
+        for name, reduce in (
+            ("mean", np.mean),
+            ("median", np.median),
+            ("std", np.std),
+        ):
+            reduce_grouped = _GROUPED_REDUCERS[name]
+            expected = TemporalAggregation(reduce, *args).apply(features)
+            actual = TemporalAggregation(None, *args, reduce_grouped).apply(features)
+            self.assertEqual(2, len(actual))
+            for e, a in zip(expected, actual):
+                self.assertEqual(e["geometry"], a["geometry"])
+                e_props = dict(e["properties"], created_at=None)
+                a_props = dict(a["properties"], created_at=None)
+                self.assertEqual(e_props, a_props)
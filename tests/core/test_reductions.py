@@ -0,0 +1,114 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import functools
+import glob
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xcube_geodb_openeo.core.reductions import GroupedMoments
+from xcube_geodb_openeo.core.reductions import GroupedValues
+
+
+def get_values(row_count: int = 1000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    values = pd.DataFrame(
+        {"a": rng.normal(1e6, 1, row_count), "b": rng.random(row_count)}
+    )
+    values.loc[::7, "a"] = np.nan
+    codes = rng.integers(0, 40, row_count)
+    # a group without any valid value
+    values.loc[codes == 3, "b"] = np.nan
+    return values, codes
+
+
+def get_chunks(values: pd.DataFrame, codes: np.ndarray, count: int):
+    bounds = np.linspace(0, len(codes), count + 1).astype(int)
+    return [
+        (values.iloc[start:stop], codes[start:stop])
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+class GroupedMomentsTest(unittest.TestCase):
+    def test_from_values(self):
+        values, codes = get_values()
+        state = GroupedMoments.from_values(values, codes)
+        grouped = values.groupby(codes)
+        pd.testing.assert_frame_equal(grouped.mean(), state.get_mean())
+        pd.testing.assert_frame_equal(grouped.std(ddof=0), state.get_std())
+        pd.testing.assert_frame_equal(grouped.min(), state.get_min())
+        pd.testing.assert_frame_equal(grouped.max(), state.get_max())
+        pd.testing.assert_frame_equal(grouped.count(), state.get_count())
+
+    def test_combine(self):
+        values, codes = get_values()
+        states = [
+            GroupedMoments.from_values(v, c) for v, c in get_chunks(values, codes, 7)
+        ]
+        state = functools.reduce(lambda a, b: a.combine(b), states)
+        grouped = values.groupby(codes)
+        pd.testing.assert_frame_equal(grouped.mean(), state.get_mean())
+        pd.testing.assert_frame_equal(grouped.std(ddof=0), state.get_std())
+        pd.testing.assert_frame_equal(grouped.min(), state.get_min())
+        pd.testing.assert_frame_equal(grouped.count(), state.get_count())
+
+    def test_combine_different_groups(self):
+        values = pd.DataFrame({"a": [1.0, 2.0, 3.0, 5.0]})
+        first = GroupedMoments.from_values(values.iloc[:2], np.array([0, 0]))
+        second = GroupedMoments.from_values(values.iloc[2:], np.array([2, 0]))
+        state = first.combine(second)
+        expected = pd.DataFrame({"a": [8.0 / 3, 3.0]}, index=[0, 2])
+        pd.testing.assert_frame_equal(
+            expected, state.get_mean(), check_index_type=False
+        )
+        self.assertEqual([3, 0, 1], list(state.size))
+
+
+class GroupedValuesTest(unittest.TestCase):
+    def test_get_quantile(self):
+        values, codes = get_values()
+        state = GroupedValues.from_values(values, codes)
+        pd.testing.assert_frame_equal(
+            values.groupby(codes).median(), state.get_quantile(0.5)
+        )
+        pd.testing.assert_frame_equal(
+            values.groupby(codes).quantile(0.9), state.get_quantile(0.9)
+        )
+
+    def test_combine_with_spilling(self):
+        values, codes = get_values(5000)
+        with tempfile.TemporaryDirectory() as directory:
+            state = None
+            for chunk_values, chunk_codes in get_chunks(values, codes, 10):
+                chunk_state = GroupedValues.from_values(
+                    chunk_values, chunk_codes, memory_budget=10000, directory=directory
+                )
+                state = chunk_state if state is None else state.combine(chunk_state)
+            self.assertTrue(glob.glob(os.path.join(directory, "*", "*.npy")))
+            pd.testing.assert_frame_equal(
+                values.groupby(codes).median(), state.get_quantile(0.5)
+            )
+            state.close()
+            self.assertEqual([], os.listdir(directory))
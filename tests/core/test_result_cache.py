@@ -0,0 +1,97 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+from xcube_geodb_openeo.core.result_cache import ResultCache
+from xcube_geodb_openeo.core.result_cache import compute_result_key
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_get_and_put(self):
+        cache = ResultCache(memory_budget=100)
+        self.assertIsNone(cache.get("a"))
+        data, etag = cache.put("a", {"db~c": "1"}, b"result")
+        self.assertEqual(b"result", data)
+        self.assertEqual((b"result", etag), cache.get("a"))
+        self.assertEqual(etag, cache.put("b", {}, b"result")[1])
+        self.assertNotEqual(etag, cache.put("c", {}, b"other")[1])
+
+    def test_memory_budget(self):
+        cache = ResultCache(memory_budget=10)
+        cache.put("a", {}, b"12345")
+        cache.put("b", {}, b"12345")
+        cache.get("a")
+        cache.put("c", {}, b"12345")
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual((10, 0), cache.size)
+
+    def test_spill_to_disk(self):
+        cache = ResultCache(
+            memory_budget=10, directory=self.directory.name, disk_budget=10
+        )
+        for key in ("a", "b", "c", "d"):
+            cache.put(key, {}, key.encode() * 5)
+        self.assertEqual((10, 10), cache.size)
+        self.assertEqual(2, len(os.listdir(self.directory.name)))
+        for key in ("a", "b", "c", "d"):
+            self.assertEqual(key.encode() * 5, cache.get(key)[0])
+        cache.put("e", {}, b"eeeee")
+        self.assertIsNone(cache.get("a"))
+        cache.put("f", {}, b"f" * 20)
+        self.assertIsNone(cache.get("f"))
+        self.assertEqual((10, 10), cache.size)
+
+    def test_versions(self):
+        cache = ResultCache(directory=self.directory.name, memory_budget=4)
+        cache.put("a", {"db~c1": "1", "db~c2": "1"}, b"aaaa")
+        cache.put("b", {"db~c2": "1"}, b"bbbb")
+        cache.put("c", {"db~c1": "1"}, b"cccc")
+        cache.check_versions({"db~c2": "1"})
+        self.assertIsNotNone(cache.get("a"))
+        cache.check_versions({"db~c2": "2"})
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        cache.invalidate("db~c1")
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual((0, 0), cache.size)
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_compute_result_key(self):
+        key = compute_result_key("{}", ["db~c1", "db~c2"], {"db~c1": "1"})
+        self.assertEqual(
+            key, compute_result_key("{}", ["db~c2", "db~c1"], {"db~c1": "1"})
+        )
+        self.assertNotEqual(key, compute_result_key("{}", ["db~c1"], {"db~c1": "1"}))
+        self.assertNotEqual(
+            key, compute_result_key("{}", ["db~c1", "db~c2"], {"db~c1": "2"})
+        )
@@ -0,0 +1,98 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+from tests.core.mock_vc_provider import MockProvider
+from xcube_geodb_openeo.core.summary_store import CollectionSummaryStore
+from xcube_geodb_openeo.core.summary_store import refresh_summaries
+
+
+class CollectionSummaryStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.provider = MockProvider({}, "")
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_refresh(self):
+        store = CollectionSummaryStore(self.tmp_dir.name)
+        vc = self.provider.get_vector_cube(("", "collection_1"))
+        self.assertIsNone(store.get(vc.id))
+
+        summary = store.refresh(vc)
+        self.assertEqual("~collection_1", summary["id"])
+        self.assertEqual(2, summary["feature_count"])
+        self.assertEqual(["Polygon"], summary["geometry_types"])
+        self.assertEqual([9.0, 52.0, 11.0, 54.0], summary["bbox"])
+        self.assertIsNone(summary["time_extent"])
+        self.assertFalse(summary["has_vertical_dim"])
+        self.assertEqual("something", summary["metadata"]["title"])
+
+        population = summary["statistics"]["population"]
+        self.assertEqual(100, population["min"])
+        self.assertEqual(1000, population["max"])
+        self.assertEqual(2, sum(population["histogram"]["counts"]))
+        self.assertEqual(11, len(population["histogram"]["edges"]))
+
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmp_dir.name, "~collection_1.json"))
+        )
+        self.assertIs(summary, store.refresh(vc))
+
+    def test_summaries_are_persisted(self):
+        store = CollectionSummaryStore(self.tmp_dir.name)
+        vc = self.provider.get_vector_cube(("", "collection_1"))
+        summary = store.refresh(vc)
+
+        other_store = CollectionSummaryStore(self.tmp_dir.name)
+        self.assertEqual(summary, other_store.get(vc.id))
+
+    def test_refresh_summaries(self):
+        store = CollectionSummaryStore(self.tmp_dir.name, refresh_interval=0)
+        refreshed = refresh_summaries(self.provider, store)
+        self.assertEqual(len(self.provider.get_collection_keys()), len(refreshed))
+        self.assertIsNotNone(store.get(refreshed[0]))
+
+    def test_schedule_refresh(self):
+        store = CollectionSummaryStore(self.tmp_dir.name)
+        vc = self.provider.get_vector_cube(("", "collection_1"))
+        store.schedule_refresh(vc)
+        store.schedule_refresh(vc)
+        _wait_for_refresh(store)
+        self.assertEqual(2, store.get(vc.id)["feature_count"])
+
+    def test_schedule_refresh_all(self):
+        store = CollectionSummaryStore(self.tmp_dir.name, refresh_interval=1000)
+        self.assertTrue(store.schedule_refresh_all(self.provider))
+        # at most once per refresh interval
+        self.assertFalse(store.schedule_refresh_all(self.provider))
+        _wait_for_refresh(store)
+        for collection_id in self.provider.get_collection_keys():
+            self.assertIsNotNone(store.get("~".join(collection_id)))
+
+
+def _wait_for_refresh(store: CollectionSummaryStore):
+    # the single worker runs the tasks in order
+    store._executor.submit(lambda: None).result(timeout=5)
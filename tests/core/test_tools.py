@@ -0,0 +1,151 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import concurrent.futures
+import datetime
+import time
+import unittest
+
+import pandas as pd
+import pytz
+
+from xcube_geodb_openeo.core.tools import Cache
+from xcube_geodb_openeo.core.tools import CountCache
+from xcube_geodb_openeo.core.tools import VersionCache
+from xcube_geodb_openeo.core.tools import parse_datetimes
+
+
+class ToolsTest(unittest.TestCase):
+    def test_parse_datetimes(self):
+        times = parse_datetimes(
+            ["2000-01-01T00:00:00Z", "2000-01-02T12:00:00", "2000-01-03T00:00:00+01:00"]
+        )
+        self.assertIsInstance(times, pd.DatetimeIndex)
+        self.assertEqual("datetime64[ns, UTC]", str(times.dtype))
+        self.assertEqual(pd.Timestamp("2000-01-02T12:00:00Z"), times[1])
+        self.assertEqual(pd.Timestamp("2000-01-02T23:00:00Z"), times[2])
+
+        start = datetime.datetime(2000, 1, 2, tzinfo=pytz.UTC)
+        self.assertEqual([False, True, True], list(times >= start))
+
+    def test_parse_datetimes_mixed_formats(self):
+        times = parse_datetimes(
+            ["2000-01-01", "2000-01-02T12:30:00+01:00", None, "2000/01/04 06:00"]
+        )
+        self.assertEqual(pd.Timestamp("2000-01-01T00:00:00Z"), times[0])
+        self.assertEqual(pd.Timestamp("2000-01-02T11:30:00Z"), times[1])
+        self.assertTrue(pd.isna(times[2]))
+        self.assertEqual(pd.Timestamp("2000-01-04T06:00:00Z"), times[3])
+
+    def test_parse_datetimes_from_series(self):
+        times = parse_datetimes(pd.Series(["2000-01-01", "2000-02-01"]))
+        self.assertEqual(pd.Timestamp("2000-02-01T00:00:00Z"), times[1])
+
+
+class CacheTest(unittest.TestCase):
+    def test_capacity(self):
+        cache = Cache(2)
+        for key in "abc":
+            cache.insert(key, key.upper())
+        self.assertEqual(["b", "c"], cache.get_keys())
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual("B", cache.get("b"))
+        cache.insert("d", "D")
+        self.assertEqual(["b", "d"], cache.get_keys())
+
+    def test_get_or_create_creates_once(self):
+        cache = Cache(10)
+        calls = []
+
+        def create():
+            calls.append(1)
+            time.sleep(0.05)
+            return "item"
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            items = list(pool.map(lambda _: cache.get_or_create("k", create), range(8)))
+        self.assertEqual(["item"] * 8, items)
+        self.assertEqual(1, len(calls))
+
+    def test_get_or_create_caches_none(self):
+        cache = Cache(10)
+        calls = []
+        self.assertIsNone(cache.get_or_create("k", lambda: calls.append(1)))
+        self.assertIsNone(cache.get_or_create("k", lambda: calls.append(1)))
+        self.assertEqual(1, len(calls))
+
+    def test_concurrent_inserts_keep_capacity(self):
+        cache = Cache(5)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: (cache.insert(i, i), cache.get(i - 1)), range(500)))
+        self.assertEqual(5, len(cache))
+
+
+class CountCacheTest(unittest.TestCase):
+    def test_get(self):
+        cache = CountCache(max_age=1000)
+        self.assertEqual(40, cache.get("c", lambda: 42, lambda: 40))
+        _wait_for_refresh(cache)
+        self.assertEqual(42, cache.get("c", lambda: 43, lambda: 40))
+        _wait_for_refresh(cache)
+        self.assertEqual(42, cache.get("c", lambda: 43, lambda: 40))
+
+    def test_get_refreshes_outdated_counts(self):
+        cache = CountCache(max_age=0)
+        self.assertEqual(40, cache.get("c", lambda: 42, lambda: 40))
+        _wait_for_refresh(cache)
+        self.assertEqual(42, cache.get("c", lambda: 43, lambda: 40))
+        _wait_for_refresh(cache)
+        self.assertEqual(43, cache.get("c", lambda: 44, lambda: 40))
+
+
+class VersionCacheTest(unittest.TestCase):
+    def test_get(self):
+        cache = VersionCache(max_age=1000)
+        self.assertEqual("1", cache.get("c", lambda: "1"))
+        self.assertEqual("1", cache.get("c", lambda: "2"))
+        self.assertIsNone(cache.get("d", lambda: None))
+        self.assertIsNone(cache.get("d", lambda: "2"))
+
+    def test_get_fetches_outdated_versions(self):
+        cache = VersionCache(max_age=0)
+        self.assertEqual("1", cache.get("c", lambda: "1"))
+        time.sleep(0.01)
+        self.assertEqual("2", cache.get("c", lambda: "2"))
+
+    def test_get_fetches_once(self):
+        cache = VersionCache(max_age=1000)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.05)
+            return "1"
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            versions = list(pool.map(lambda _: cache.get("c", fetch), range(8)))
+        self.assertEqual(["1"] * 8, versions)
+        self.assertEqual(1, len(calls))
+
+
+def _wait_for_refresh(cache: CountCache):
+    # the single worker runs the tasks in order
+    cache._executor.submit(lambda: None).result(timeout=5)
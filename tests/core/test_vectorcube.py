@@ -1,6 +1,9 @@
+import operator
 import unittest
 
 from tests.core.mock_vc_provider import MockProvider
+from xcube_geodb_openeo.core.operations import ElementwiseMath
+from xcube_geodb_openeo.core.operations import Filter
 
 
 class VectorCubeTest(unittest.TestCase):
@@ -24,3 +27,39 @@ class VectorCubeTest(unittest.TestCase):
             ["https://schemas.stacspec.org/v1.0.0/item-spec/json-schema/item.json"],
             feature_2["stac_extensions"],
         )
+
+    def test_with_operation_is_lazy(self):
+        mp = MockProvider({}, "")
+        vc = mp.get_vector_cube(("", "collection_1"))
+        derived = vc.with_operation(ElementwiseMath(operator.mul, 2, "time"))
+        self.assertEqual([], vc.plan)
+        self.assertEqual(1, len(derived.plan))
+        self.assertEqual(vc.id, derived.id)
+
+        gj = derived.to_geojson()
+        self.assertEqual(
+            [2000, 200], [f["properties"]["population"] for f in gj["features"]]
+        )
+        self.assertEqual(
+            [1000, 100],
+            [f["properties"]["population"] for f in vc.to_geojson()["features"]],
+        )
+        self.assertEqual(200, derived.get_feature("1")["properties"]["population"])
+
+    def test_with_filter_operation(self):
+        mp = MockProvider({}, "")
+        vc = mp.get_vector_cube(("", "collection_1"))
+        derived = vc.with_operation(
+            Filter(lambda f: f["properties"]["population"] > 500)
+        )
+        self.assertEqual(1, derived.feature_count)
+        features = derived.to_geojson()["features"]
+        self.assertEqual("hamburg", features[0]["properties"]["name"])
+
+    def test_dimension_probes(self):
+        mp = MockProvider({}, "")
+        vc = mp.get_vector_cube(("", "collection_1"))
+        self.assertTrue(vc.has_time_dim())
+        self.assertFalse(vc.has_vertical_dim())
+        self.assertIsNone(vc.get_time_dim_extent())
+        self.assertIsNone(vc.get_vertical_dim_extent())
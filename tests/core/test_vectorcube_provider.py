@@ -0,0 +1,36 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import unittest
+
+from xcube_geodb_openeo.core.vectorcube_provider import GeoDBProvider
+
+
+class GeoDBProviderTest(unittest.TestCase):
+    def test_count_caches_are_per_user(self):
+        config = {"geodb_openeo": {"count_cache_max_age": 10}}
+        provider = GeoDBProvider(config, "token_1")
+        other_provider = GeoDBProvider(config, "token_2")
+        self.assertIsNot(provider._count_cache, other_provider._count_cache)
+        self.assertEqual(10, provider._count_cache._max_age)
+        # the refreshes of all users share one thread
+        self.assertIs(
+            provider._count_cache._executor, other_provider._count_cache._executor
+        )
@@ -19,7 +19,6 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 import datetime
-import importlib
 import os
 import re
 from typing import Any, List
@@ -32,14 +31,27 @@ from xcube.constants import LOG
 from xcube.server.api import ApiContext
 from xcube.server.api import Context
 
+from ..backend.callbacks import normalize_process_graph
+from ..backend.jobs import JobManager
+from ..backend.processes import get_processes_registry
+from ..core.geodb_datasource import PropertyCondition
+from ..core.geodb_datasource import TimeRange
+from ..core.result_cache import ResultCache
+from ..core.result_cache import compute_result_key
+from ..core.summary_store import CollectionSummaryStore
 from ..core.tools import Cache
 from ..core.vectorcube import Feature
 from ..core.vectorcube import VectorCube
 from ..core.vectorcube_provider import VectorCubeProvider
+from ..core.vectorcube_provider import create_cube_provider
 from ..defaults import (
     STAC_VERSION,
     STAC_EXTENSIONS,
     DEFAULT_VC_CACHE_SIZE,
+    DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    DEFAULT_RESULT_CACHE_MEMORY_BUDGET,
+    DEFAULT_RESULT_CACHE_DISK_BUDGET,
+    DEFAULT_MAX_RUNNING_JOBS,
 )
 
 
@@ -58,18 +70,11 @@ class GeoDbContext(ApiContext):
         self._config = dict(config)
 
     def get_cube_provider(self, access_token: str) -> VectorCubeProvider:
-        if access_token in self._geodb_connection_cache.get_keys():
-            return self._geodb_connection_cache.get(access_token)
         if not self.config:
             raise RuntimeError("config not set")
-        cube_provider_class = self.config["geodb_openeo"]["vectorcube_provider_class"]
-        cube_provider_module = cube_provider_class[: cube_provider_class.rindex(".")]
-        class_name = cube_provider_class[cube_provider_class.rindex(".") + 1 :]
-        module = importlib.import_module(cube_provider_module)
-        cls = getattr(module, class_name)
-        cube_provider = cls(self.config, access_token)
-        self._geodb_connection_cache.insert(access_token, cube_provider)
-        return cube_provider
+        return self._geodb_connection_cache.get_or_create(
+            access_token, lambda: create_cube_provider(self.config, access_token)
+        )
 
     @property
     def request(self) -> Mapping[str, Any]:
@@ -89,25 +94,122 @@ class GeoDbContext(ApiContext):
         ]
         self._vector_cube_cache = Cache(DEFAULT_VC_CACHE_SIZE)
         self._geodb_connection_cache = Cache(DEFAULT_VC_CACHE_SIZE)
+        self._summary_store = None
+        summary_store_dir = self.config["geodb_openeo"].get("summary_store_dir")
+        if summary_store_dir:
+            self._summary_store = CollectionSummaryStore(
+                summary_store_dir,
+                self.config["geodb_openeo"].get(
+                    "summary_refresh_interval", DEFAULT_SUMMARY_REFRESH_INTERVAL
+                ),
+            )
+        config = self.config["geodb_openeo"]
+        self._result_cache = ResultCache(
+            config.get(
+                "result_cache_memory_budget", DEFAULT_RESULT_CACHE_MEMORY_BUDGET
+            ),
+            config.get("result_cache_dir"),
+            config.get("result_cache_disk_budget", DEFAULT_RESULT_CACHE_DISK_BUDGET),
+        )
+        self._job_manager = None
+        if config.get("jobs_dir"):
+            self._job_manager = JobManager(
+                config["jobs_dir"],
+                self.config,
+                config.get("max_running_jobs", DEFAULT_MAX_RUNNING_JOBS),
+            )
+        # build the process catalog now rather than on the first request
+        registry = get_processes_registry()
+        registry.get_processes_body()
+        registry.get_file_formats_body()
 
     def update(self, prev_ctx: Optional["Context"]):
         pass
 
+    @property
+    def summary_store(self) -> Optional[CollectionSummaryStore]:
+        return self._summary_store
+
+    @property
+    def job_manager(self) -> Optional[JobManager]:
+        return self._job_manager
+
+    @property
+    def result_cache(self) -> ResultCache:
+        return self._result_cache
+
+    def get_result_key(
+        self, access_token: str, process_graph: Mapping
+    ) -> Optional[Tuple[str, Dict[str, str]]]:
+        """
+        Returns the key of the result of a process graph in the result cache,
+        together with the versions of the collections the graph loads. Cached
+        results computed from earlier versions of these collections are
+        dropped.
+        :return: key and versions, or None if the result must not be cached
+            since the version of a collection is unknown
+        """
+        collection_ids = ["~".join(c) for c in self.get_collection_ids(access_token)]
+        versions = {}
+        for node in process_graph.values():
+            if node.get("process_id") != "load_collection":
+                continue
+            collection_id = node.get("arguments", {}).get("id")
+            if collection_id not in collection_ids:
+                return None
+            vector_cube = self.get_vector_cube(
+                access_token, tuple(collection_id.split("~")), bbox=None
+            )
+            version = vector_cube.get_version()
+            if version is None:
+                return None
+            versions[collection_id] = version
+        self._result_cache.check_versions(versions)
+        key = compute_result_key(
+            normalize_process_graph(process_graph), collection_ids, versions
+        )
+        return key, versions
+
+    def refresh_collection_summaries(self, access_token: str) -> bool:
+        """
+        Schedules a background refresh of the stored summaries of all
+        collections visible with the given access token, at most once per
+        refresh interval; only collections modified since are recomputed.
+        :return: whether a refresh has been scheduled
+        """
+        if not self._summary_store:
+            return False
+        return self._summary_store.schedule_refresh_all(
+            self.get_cube_provider(access_token)
+        )
+
     def get_vector_cube(
         self,
         access_token: str,
         collection_id: Tuple[str, str],
         bbox: Optional[Tuple[float, float, float, float]],
+        time_range: Optional[TimeRange] = None,
+        properties: Optional[Tuple[str, ...]] = None,
+        conditions: Optional[Tuple[PropertyCondition, ...]] = None,
     ) -> VectorCube:
-        cache_key = (access_token, collection_id, bbox)
-        vector_cube = self._vector_cube_cache.get(cache_key)
-        if vector_cube:
-            return vector_cube
-        vector_cube = self.get_cube_provider(access_token).get_vector_cube(
-            collection_id, bbox
+        cache_key = (
+            access_token,
+            collection_id,
+            bbox,
+            time_range,
+            properties,
+            conditions,
+        )
+        return self._vector_cube_cache.get_or_create(
+            cache_key,
+            lambda: self.get_cube_provider(access_token).get_vector_cube(
+                collection_id,
+                bbox,
+                time_range=time_range,
+                properties=properties,
+                conditions=conditions,
+            ),
         )
-        self._vector_cube_cache.insert(cache_key, vector_cube)
-        return vector_cube
 
     @property
     def collections(self) -> Dict:
@@ -127,6 +229,7 @@ class GeoDbContext(ApiContext):
         index = offset
         actual_limit = limit
         collection_ids = self.get_collection_ids(access_token)
+        self.refresh_collection_summaries(access_token)
         while index < offset + actual_limit and index < len(collection_ids):
             collection_id = collection_ids[index]
             collection = self.get_collection(
@@ -154,7 +257,14 @@ class GeoDbContext(ApiContext):
         if ensure_exists and collection_id not in self.get_collection_ids(access_token):
             return None
         vector_cube = self.get_vector_cube(access_token, collection_id, bbox=None)
-        return _get_vector_cube_collection(base_url, vector_cube, full)
+        summary = None
+        if self._summary_store:
+            summary = self._summary_store.get(vector_cube.id)
+            if full:
+                # until the summary is available, the collection is described
+                # from geoDB directly
+                self._summary_store.schedule_refresh(vector_cube)
+        return _get_vector_cube_collection(base_url, vector_cube, full, summary)
 
     def get_collection_items(
         self,
@@ -275,10 +385,13 @@ def get_collections_links(limit: int, offset: int, url: str, collection_count: i
 
 
 def _get_vector_cube_collection(
-    base_url: str, vector_cube: VectorCube, full: bool = False
+    base_url: str,
+    vector_cube: VectorCube,
+    full: bool = False,
+    summary: Optional[Dict] = None,
 ) -> Optional[Dict]:
     vector_cube_id = vector_cube.id
-    metadata = vector_cube.get_metadata(full)
+    metadata = summary["metadata"] if summary else vector_cube.get_metadata(full)
     vector_cube_collection = {
         "stac_version": STAC_VERSION,
         "stac_extensions": STAC_EXTENSIONS,
@@ -310,11 +423,17 @@ def _get_vector_cube_collection(
         ],
     }
     if full:
-        geometry_types = vector_cube.get_geometry_types()
-        bbox = vector_cube.get_bbox()
-        z_dim = vector_cube.get_vertical_dim()
-        axes = ["x", "y", "z"] if z_dim else ["x", "y"]
-        srid = vector_cube.srid
+        if summary:
+            geometry_types = summary["geometry_types"]
+            bbox = summary["bbox"]
+            has_vertical_dim = summary["has_vertical_dim"]
+            srid = summary["srid"]
+        else:
+            geometry_types = vector_cube.get_geometry_types()
+            bbox = vector_cube.get_bbox()
+            has_vertical_dim = vector_cube.has_vertical_dim()
+            srid = vector_cube.srid
+        axes = ["x", "y", "z"] if has_vertical_dim else ["x", "y"]
         vector_cube_collection["cube:dimensions"] = {
             "vector": {
                 "type": "geometry",
@@ -324,9 +443,14 @@ def _get_vector_cube_collection(
                 "reference_system": srid,
             }
         }
-        vector_cube_collection["summaries"] = (
-            metadata["summaries"] if "summaries" in metadata else {}
-        )
+        summaries = dict(metadata["summaries"]) if "summaries" in metadata else {}
+        if summary:
+            for prop, statistics in summary["statistics"].items():
+                summaries.setdefault(
+                    prop,
+                    {"minimum": statistics["min"], "maximum": statistics["max"]},
+                )
+        vector_cube_collection["summaries"] = summaries
     if "version" in metadata:
         vector_cube_collection["version"] = metadata["version"]
     return vector_cube_collection
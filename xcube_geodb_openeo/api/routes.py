@@ -29,9 +29,8 @@ import os
 import requests
 import sys
 
-from typing import Tuple, Optional
+from typing import Dict, Mapping, Optional, Tuple
 
-from openeo.internal.graph_building import PGNode
 from xcube.constants import LOG
 from xcube.server.api import ApiError, ApiRequest, ApiResponse, ServerContextT
 from xcube.server.api import ApiHandler
@@ -41,11 +40,22 @@ from .api import api
 from .context import _fix_time
 from xcube_geodb_openeo.backend import capabilities
 from xcube_geodb_openeo.backend import processes
+from xcube_geodb_openeo.backend.executor import ProcessGraphError
+from xcube_geodb_openeo.backend.executor import ProcessGraphExecutor
+from xcube_geodb_openeo.backend.executor import get_node_pool
+from xcube_geodb_openeo.backend.jobs import JobError
+from xcube_geodb_openeo.backend.jobs import JobManager
+from xcube_geodb_openeo.backend.jobs import RESULT_FILE_NAME
+from xcube_geodb_openeo.backend.planner import plan_process_graph
+from xcube_geodb_openeo.core.result_cache import CachedResult
 from xcube_geodb_openeo.core.vectorcube import VectorCube
 from xcube_geodb_openeo.defaults import (
+    DEFAULT_MAX_PARALLEL_NODES,
+    DEFAULT_NODE_POOL_SIZE,
     STAC_DEFAULT_ITEMS_LIMIT,
     STAC_MAX_ITEMS_LIMIT,
     STAC_MIN_ITEMS_LIMIT,
+    STAC_VERSION,
 )
 
 
@@ -250,6 +260,21 @@ def set_cookies(response: ApiResponse, access_token: str, refresh_token: str) ->
 
 
 def validate(access_token: str):
+    try:
+        decode_access_token(access_token)
+    except jwt.ExpiredSignatureError as ese:
+        LOG.info(ese.args[0])
+        return None
+
+    return True
+
+
+def decode_access_token(access_token: str) -> Dict:
+    """
+    Returns the claims of an access token, verifying its signature with the
+    public keys of Keycloak.
+    :raise jwt.InvalidTokenError: if the token is invalid or has expired
+    """
     KEYCLOAK_JWKS_URL = f"{os.environ['KC_BASE_URL']}/protocol/openid-connect/certs"
 
     # Fetch public keys from Keycloak
@@ -259,19 +284,15 @@ def validate(access_token: str):
 
     public_key = None
     for key in jwks["keys"]:
-        if key["kid"] == headers["kid"]:
+        if key["kid"] == headers.get("kid"):
             public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
 
     if not public_key:
-        raise Exception("Invalid token: No matching public key found")
+        raise jwt.InvalidTokenError("Invalid token: No matching public key found")
 
-    try:
-        jwt.decode(access_token, public_key, algorithms=["RS256"], audience="account")
-    except jwt.ExpiredSignatureError as ese:
-        LOG.info(ese.args[0])
-        return None
-
-    return True
+    return jwt.decode(
+        access_token, public_key, algorithms=["RS256"], audience="account"
+    )
 
 
 @api.route("/")
@@ -341,10 +362,7 @@ class ProcessesHandler(ApiHandler):
         """
         registry = processes.get_processes_registry()
         self.response.finish(
-            {
-                "processes": [p.metadata for p in registry.processes],
-                "links": registry.get_links(),
-            }
+            registry.get_processes_body(), content_type="application/json"
         )
 
 
@@ -363,7 +381,10 @@ class FormatsHandler(ApiHandler):
         """
         Returns the supported file formats.
         """
-        self.response.finish(processes.get_processes_registry().get_file_formats())
+        registry = processes.get_processes_registry()
+        self.response.finish(
+            registry.get_file_formats_body(), content_type="application/json"
+        )
 
 
 @api.route("/result")
@@ -385,58 +406,58 @@ class ResultHandler(ApiHandler):
             # a redirect has been prepared; initialise authentication
             return
 
-        if not self.request.body:
-            raise ApiError(
-                400,
-                "Request must contain body with valid process graph,"
-                " see openEO specification.",
-            )
-        try:
-            request = json.loads(self.request.body)
-        except Exception as exc:
-            raise ApiError(
-                400,
-                "Request must contain body with valid process graph,"
-                " see openEO specification. Error: " + exc.args[0],
-            )
-        if "process" not in request:
-            raise (ApiError(400, "Request body must contain parameter 'process'."))
-
+        request = read_process_request(self.request)
         processing_request = request["process"]
         registry = processes.get_processes_registry()
-        graph = processing_request["process_graph"]
-        pg_node = PGNode.from_flat_graph(graph)
-        registry.get_process(pg_node.process_id)
-
-        nodes = []
-        current_node = pg_node
-        while (
-            "data" in current_node.arguments
-            and "from_node" in current_node.arguments["data"]
-        ):
-            nodes.append(current_node)
-            current_node = current_node.arguments["data"]["from_node"]
-        nodes.append(current_node)
-        nodes.reverse()
-
-        current_result = None
-        for node in nodes:
-            process = registry.get_process(node.process_id)
-            expected_parameters = process.metadata["parameters"]
-            process_parameters = node.arguments
-            process_parameters["input"] = current_result
-            process_parameters["access_token"] = access_token
-            self.ensure_parameters(expected_parameters, process_parameters)
-            process.parameters = process_parameters
-            current_result = processes.submit_process_sync(process, self.ctx)
-
-        current_result: VectorCube
+        graph = plan_process_graph(processing_request["process_graph"])
+        result_key = self.ctx.get_result_key(access_token, graph)
+        if result_key:
+            cached_result = self.ctx.result_cache.get(result_key[0])
+            if cached_result:
+                self.finish_result(cached_result)
+                return
+        config = self.ctx.config["geodb_openeo"]
+        pool = get_node_pool(config.get("node_pool_size", DEFAULT_NODE_POOL_SIZE))
         try:
-            current_result.load_features()
-        except GeoDBError as exc:
+            executor = ProcessGraphExecutor(
+                graph,
+                registry,
+                self.ctx,
+                access_token=access_token,
+                pool=pool,
+                max_parallel_nodes=config.get(
+                    "max_parallel_nodes", DEFAULT_MAX_PARALLEL_NODES
+                ),
+            )
+            for node_id in executor.order:
+                process = registry.get_process(graph[node_id]["process_id"])
+                self.ensure_parameters(
+                    process.metadata["parameters"], graph[node_id].get("arguments", {})
+                )
+            result = executor.execute()
+        except ProcessGraphError as exc:
             raise ApiError(400, exc.args[0])
-        final_result = current_result.to_geojson()
-        self.response.finish(final_result)
+
+        if isinstance(result, VectorCube):
+            try:
+                result.load_features()
+            except GeoDBError as exc:
+                raise ApiError(400, exc.args[0])
+            result = result.to_geojson()
+        data = json.dumps(result).encode("utf-8")
+        if result_key:
+            self.finish_result(self.ctx.result_cache.put(*result_key, data))
+        else:
+            self.response.finish(data, content_type="application/json")
+
+    def finish_result(self, cached_result: CachedResult):
+        data, etag = cached_result
+        self.response.set_header("ETag", etag)
+        if self.request.headers.get("If-None-Match") == etag:
+            self.response.set_status(304)
+            self.response.finish()
+        else:
+            self.response.finish(data, content_type="application/json")
 
     @staticmethod
     def ensure_parameters(expected_parameters, process_parameters):
@@ -451,6 +472,268 @@ class ResultHandler(ApiHandler):
                     )
 
 
+@api.route("/jobs")
+class JobsHandler(ApiHandler):
+    """
+    Lists the batch jobs of the user, and creates new ones.
+    """
+
+    @api.operation(operationId="jobs", summary="List all batch jobs.")
+    def get(self):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        jobs = get_job_manager(self.ctx).get_jobs(get_user_id(access_token))
+        base_url = self.ctx.config["geodb_openeo"]["SERVER_URL"]
+        self.response.finish(
+            {
+                "jobs": [get_job_metadata(job, base_url, full=False) for job in jobs],
+                "links": [],
+            }
+        )
+
+    @api.operation(operationId="create_job", summary="Create a new batch job.")
+    def post(self):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        request = read_process_request(self.request)
+        try:
+            job = get_job_manager(self.ctx).create_job(
+                get_user_id(access_token),
+                request["process"],
+                title=request.get("title"),
+                description=request.get("description"),
+            )
+        except JobError as exc:
+            raise ApiError(400, exc.args[0])
+        base_url = self.ctx.config["geodb_openeo"]["SERVER_URL"]
+        self.response.set_status(201)
+        self.response.set_header("Location", f"{base_url}/jobs/{job['id']}")
+        self.response.set_header("OpenEO-Identifier", job["id"])
+        self.response.finish()
+
+
+@api.route("/jobs/{job_id}")
+class JobHandler(ApiHandler):
+    """
+    Shows and deletes a batch job.
+    """
+
+    @api.operation(operationId="describe_job", summary="Full metadata of a job.")
+    def get(self, job_id: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        job = get_job_manager(self.ctx).get_job(get_user_id(access_token), job_id)
+        if not job:
+            raise ApiError(404, f"Job {job_id} does not exist.")
+        base_url = self.ctx.config["geodb_openeo"]["SERVER_URL"]
+        self.response.finish(get_job_metadata(job, base_url))
+
+    @api.operation(operationId="delete_job", summary="Delete a batch job.")
+    def delete(self, job_id: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        try:
+            get_job_manager(self.ctx).delete_job(get_user_id(access_token), job_id)
+        except JobError as exc:
+            raise ApiError(404, exc.args[0])
+        self.response.set_status(204)
+        self.response.finish()
+
+
+@api.route("/jobs/{job_id}/results")
+class JobResultsHandler(ApiHandler):
+    """
+    Starts and cancels the processing of a batch job, and lists its results.
+    """
+
+    @api.operation(operationId="list_results", summary="List batch job results.")
+    def get(self, job_id: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        try:
+            job, result_path = get_job_manager(self.ctx).get_result_path(
+                get_user_id(access_token), job_id
+            )
+        except JobError as exc:
+            raise ApiError(404, exc.args[0])
+        if not result_path:
+            raise ApiError(400, f"Job {job_id} has not finished yet.")
+        base_url = self.ctx.config["geodb_openeo"]["SERVER_URL"]
+        self.response.finish(get_job_results(job, base_url))
+
+    @api.operation(operationId="start_job", summary="Start processing a job.")
+    def post(self, job_id: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        try:
+            get_job_manager(self.ctx).start_job(
+                get_user_id(access_token), job_id, access_token
+            )
+        except JobError as exc:
+            raise ApiError(404, exc.args[0])
+        self.response.set_status(202)
+        self.response.finish()
+
+    @api.operation(operationId="stop_job", summary="Cancel processing a job.")
+    def delete(self, job_id: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        try:
+            get_job_manager(self.ctx).cancel_job(get_user_id(access_token), job_id)
+        except JobError as exc:
+            raise ApiError(404, exc.args[0])
+        self.response.set_status(204)
+        self.response.finish()
+
+
+@api.route("/jobs/{job_id}/results/{file_name}")
+class JobResultFileHandler(ApiHandler):
+    """
+    Downloads a result file of a batch job.
+    """
+
+    def get(self, job_id: str, file_name: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        try:
+            _, result_path = get_job_manager(self.ctx).get_result_path(
+                get_user_id(access_token), job_id
+            )
+        except JobError as exc:
+            raise ApiError(404, exc.args[0])
+        if not result_path or file_name != os.path.basename(result_path):
+            raise ApiError(404, f"Job {job_id} has no result {file_name}.")
+        with open(result_path, "rb") as f:
+            self.response.finish(f.read(), content_type="application/geo+json")
+
+
+@api.route("/jobs/{job_id}/logs")
+class JobLogsHandler(ApiHandler):
+    """
+    Lists the log entries of a batch job.
+    """
+
+    @api.operation(operationId="debug_job", summary="Logs for a batch job.")
+    def get(self, job_id: str):
+        refresh_pkce_pair(self.ctx)
+        access_token = authenticate(self.request, self.response, self.ctx)
+        if not access_token:
+            # a redirect has been prepared; initialise authentication
+            return
+        try:
+            logs = get_job_manager(self.ctx).get_logs(
+                get_user_id(access_token),
+                job_id,
+                offset=self.request.get_query_arg("offset"),
+                limit=_get_limit(self.request, default=0),
+            )
+        except JobError as exc:
+            raise ApiError(404, exc.args[0])
+        self.response.finish({"logs": logs, "links": []})
+
+
+def read_process_request(request: ApiRequest) -> Dict:
+    if not request.body:
+        raise ApiError(
+            400,
+            "Request must contain body with valid process graph,"
+            " see openEO specification.",
+        )
+    try:
+        process_request = json.loads(request.body)
+    except Exception as exc:
+        raise ApiError(
+            400,
+            "Request must contain body with valid process graph,"
+            " see openEO specification. Error: " + exc.args[0],
+        )
+    if "process" not in process_request:
+        raise (ApiError(400, "Request body must contain parameter 'process'."))
+    return process_request
+
+
+def get_job_manager(ctx: ServerContextT) -> JobManager:
+    if not ctx.job_manager:
+        raise ApiError(501, "Batch jobs are not enabled on this server.")
+    return ctx.job_manager
+
+
+def get_user_id(access_token: str) -> str:
+    """
+    Returns the id of the user an access token has been issued to, which
+    owns the jobs created with the token. The id is only taken from tokens
+    whose signature has been verified; if token validation is skipped, jobs
+    are owned by the token itself.
+    """
+    if bool(os.getenv("SKIP_TOKEN_VALIDATION", False)):
+        return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+    try:
+        claims = decode_access_token(access_token)
+    except jwt.InvalidTokenError as exc:
+        raise ApiError(401, f"Invalid access token: {exc}")
+    if "sub" in claims:
+        return str(claims["sub"])
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+def get_job_metadata(job: Mapping, base_url: str, full: bool = True) -> Dict:
+    keys = ["id", "title", "description", "status", "created", "updated"]
+    if full:
+        keys.append("process")
+    metadata = {k: job[k] for k in keys}
+    metadata["links"] = [
+        {"rel": "self", "href": f"{base_url}/jobs/{job['id']}"},
+    ]
+    return metadata
+
+
+def get_job_results(job: Mapping, base_url: str) -> Dict:
+    return {
+        "type": "Collection",
+        "stac_version": STAC_VERSION,
+        "id": job["id"],
+        "title": job["title"],
+        "description": job["description"] or "",
+        "license": "proprietary",
+        "extent": {
+            "spatial": {"bbox": [[-180, -90, 180, 90]]},
+            "temporal": {"interval": [[None, None]]},
+        },
+        "assets": {
+            RESULT_FILE_NAME: {
+                "href": f"{base_url}/jobs/{job['id']}/results/{RESULT_FILE_NAME}",
+                "type": "application/geo+json",
+                "roles": ["data"],
+            }
+        },
+        "links": [],
+    }
+
+
 @api.route("/conformance")
 class ConformanceHandler(ApiHandler):
     """
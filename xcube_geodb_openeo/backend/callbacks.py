@@ -0,0 +1,199 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import collections
+import json
+import numbers
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .executor import ProcessGraphExecutor
+from .processes import ArrayFunction
+from .processes import get_processes_registry
+from ..defaults import DEFAULT_CALLBACK_CACHE_SIZE
+
+# node fields which do not change what a process graph computes
+_IGNORED_NODE_FIELDS = ("description",)
+
+
+class CompiledCallback:
+    """
+    A callback translated into a sequence of array functions. It computes the
+    result of the callback directly from the parameter values, without
+    resolving arguments or looking up processes on every invocation, so
+    that it is cheap to evaluate once per group of values, and operates on
+    whole arrays at once.
+    Compiled callbacks hold no state of their invocations, so they are shared
+    by all requests.
+    """
+
+    def __init__(
+        self,
+        steps: List[Tuple[str, ArrayFunction, Dict[str, Any]]],
+        result_node_id: str,
+    ):
+        self._steps = steps
+        self._result_node_id = result_node_id
+        self._parameter_names = {
+            value["from_parameter"]
+            for _, _, arguments in steps
+            for value in arguments.values()
+            if isinstance(value, dict) and "from_parameter" in value
+        }
+
+    @property
+    def parameter_names(self) -> List[str]:
+        return sorted(self._parameter_names)
+
+    def accepts(self, parameters: Mapping[str, Any]) -> bool:
+        """
+        Tells whether the values of the parameters used by the callback are
+        numbers, arrays of numbers, or None.
+        """
+        return all(
+            _is_array_value(parameters.get(name)) for name in self._parameter_names
+        )
+
+    def __call__(self, parameters: Mapping[str, Any]) -> Any:
+        # lists are computed as arrays, rather than with the list operators
+        # of Python; None becomes NaN
+        parameters = {
+            name: (
+                np.array(value, dtype=np.float64)
+                if isinstance(value, (list, tuple))
+                else value
+            )
+            for name, value in parameters.items()
+        }
+        results = {}
+        for node_id, function, arguments in self._steps:
+            results[node_id] = function.compute(
+                {
+                    name: _resolve(value, results, parameters)
+                    for name, value in arguments.items()
+                }
+            )
+        return results[self._result_node_id]
+
+
+def compile_callback(callback: Mapping) -> Optional[CompiledCallback]:
+    """
+    Compiles a callback, i.e. a process graph passed as argument to a
+    process. Callbacks are compiled only if all of their processes are array
+    functions, and all of their arguments are numbers, null, or references to
+    parameters or nodes; otherwise, None is returned.
+    Compiled callbacks are cached, keyed by the normalized process graph, so
+    that repeated requests reuse them.
+    """
+    key = normalize_process_graph(callback["process_graph"])
+    return _get_compiled_callbacks().get(key, callback["process_graph"])
+
+
+def normalize_process_graph(process_graph: Mapping) -> str:
+    """
+    Returns a canonical representation of a process graph, which is equal
+    for graphs that differ only in the order of their keys or in
+    descriptions.
+    """
+    nodes = {
+        node_id: {k: v for k, v in node.items() if k not in _IGNORED_NODE_FIELDS}
+        for node_id, node in process_graph.items()
+    }
+    return json.dumps(nodes, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class _CompiledCallbacks:
+    """A bounded cache of compiled callbacks, least recently used first."""
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._callbacks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, process_graph: Mapping) -> Optional[CompiledCallback]:
+        with self._lock:
+            if key in self._callbacks:
+                self._callbacks.move_to_end(key)
+                return self._callbacks[key]
+        # callbacks which cannot be compiled are remembered as None
+        compiled = _compile(process_graph)
+        with self._lock:
+            self._callbacks[key] = compiled
+            while len(self._callbacks) > self._max_size:
+                self._callbacks.popitem(last=False)
+        return compiled
+
+
+_COMPILED_CALLBACKS_SINGLETON = None
+_COMPILED_CALLBACKS_LOCK = threading.Lock()
+
+
+def _get_compiled_callbacks() -> _CompiledCallbacks:
+    global _COMPILED_CALLBACKS_SINGLETON
+    if not _COMPILED_CALLBACKS_SINGLETON:
+        with _COMPILED_CALLBACKS_LOCK:
+            if not _COMPILED_CALLBACKS_SINGLETON:
+                _COMPILED_CALLBACKS_SINGLETON = _CompiledCallbacks(
+                    DEFAULT_CALLBACK_CACHE_SIZE
+                )
+    return _COMPILED_CALLBACKS_SINGLETON
+
+
+def _compile(process_graph: Mapping) -> Optional[CompiledCallback]:
+    # validates the graph and sorts its nodes
+    executor = ProcessGraphExecutor(process_graph, get_processes_registry(), None)
+    steps = []
+    for node_id in executor.order:
+        function = executor.get_process(node_id)
+        arguments = process_graph[node_id].get("arguments", {})
+        if not isinstance(function, ArrayFunction):
+            return None
+        if not set(arguments).issubset(function.argument_names):
+            return None
+        if not all(_is_compilable(value) for value in arguments.values()):
+            return None
+        steps.append((node_id, function, dict(arguments)))
+    return CompiledCallback(steps, executor.result_node_id)
+
+
+def _is_compilable(value: Any) -> bool:
+    if isinstance(value, dict):
+        return value.keys() == {"from_node"} or value.keys() == {"from_parameter"}
+    return value is None or (
+        isinstance(value, numbers.Number) and not isinstance(value, bool)
+    )
+
+
+def _is_array_value(value: Any) -> bool:
+    if value is None or isinstance(value, (numbers.Number, np.ndarray)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(v is None or isinstance(v, numbers.Number) for v in value)
+    return False
+
+
+def _resolve(value: Any, results: Mapping[str, Any], parameters: Mapping) -> Any:
+    if isinstance(value, dict):
+        if "from_node" in value:
+            return results[value["from_node"]]
+        return parameters.get(value["from_parameter"])
+    return value
@@ -32,6 +32,25 @@ https://openeo.org/documentation/1.0/developers/api/reference.html#tag/Capabilit
 
 
 def get_root(config: Mapping[str, Any], base_url: str):
+    endpoints = [
+        {'path': '/.well-known/openeo', 'methods': ['GET']},
+        {'path': '/file_formats', 'methods': ['GET']},
+        {'path': '/result', 'methods': ['POST']},
+        {'path': '/collections', 'methods': ['GET']},
+        {'path': '/processes', 'methods': ['GET']},
+        {'path': '/collections/{collection_id}', 'methods': ['GET']},
+        {'path': '/collections/{collection_id}/items', 'methods': ['GET']},
+        {'path': '/collections/{collection_id}/items/{feature_id}',
+         'methods': ['GET']},
+    ]
+    if config['geodb_openeo'].get('jobs_dir'):
+        endpoints += [
+            {'path': '/jobs', 'methods': ['GET', 'POST']},
+            {'path': '/jobs/{job_id}', 'methods': ['GET', 'DELETE']},
+            {'path': '/jobs/{job_id}/results',
+             'methods': ['GET', 'POST', 'DELETE']},
+            {'path': '/jobs/{job_id}/logs', 'methods': ['GET']},
+        ]
     return {
         'api_version': API_VERSION,
         'backend_version': __version__,
@@ -44,17 +63,7 @@ def get_root(config: Mapping[str, Any], base_url: str):
             f'https://api.stacspec.org/v1.0.0/{part}'
             for part in ['core', 'collections', 'ogcapi-features']
         ],
-        'endpoints': [
-            {'path': '/.well-known/openeo', 'methods': ['GET']},
-            {'path': '/file_formats', 'methods': ['GET']},
-            {'path': '/result', 'methods': ['POST']},
-            {'path': '/collections', 'methods': ['GET']},
-            {'path': '/processes', 'methods': ['GET']},
-            {'path': '/collections/{collection_id}', 'methods': ['GET']},
-            {'path': '/collections/{collection_id}/items', 'methods': ['GET']},
-            {'path': '/collections/{collection_id}/items/{feature_id}',
-             'methods': ['GET']},
-        ],
+        'endpoints': endpoints,
         "links": [
             {
                 "rel": "root",
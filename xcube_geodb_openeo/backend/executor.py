@@ -0,0 +1,264 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import concurrent.futures
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+from xcube.server.api import ServerContextT
+
+from .processes import Process
+from .processes import ProcessRegistry
+from .processes import submit_process_sync
+from ..defaults import DEFAULT_MAX_PARALLEL_NODES
+from ..defaults import DEFAULT_NODE_POOL_SIZE
+
+# arguments that hold the data cube a process works on; the value of the
+# first one present is passed to the process as "input" as well
+DATA_ARGUMENTS = ("data", "x")
+
+
+class ProcessGraphError(ValueError):
+    pass
+
+
+class ProcessGraphExecutor:
+    """
+    Executes a flat openEO process graph.
+    The nodes are evaluated in topological order, each one exactly once. Their
+    results are memoized by node id, so that nodes consumed by several other
+    nodes are not executed again. References to other nodes ("from_node") and
+    to parameters of the graph ("from_parameter") are resolved in all
+    arguments, except within callbacks, which are process graphs themselves.
+
+    If a thread pool is given, nodes whose dependencies are available are
+    dispatched to it as soon as possible, so that independent branches run
+    concurrently; at most max_parallel_nodes nodes of the graph are in
+    flight at a time. Otherwise, the nodes are executed one after another.
+
+    The executor holds no state of its own executions, so it may execute the
+    graph several times, also concurrently, e.g. for callbacks.
+    """
+
+    def __init__(
+        self,
+        process_graph: Dict[str, Dict],
+        registry: ProcessRegistry,
+        ctx: ServerContextT,
+        access_token: Optional[str] = None,
+        parameters: Optional[Mapping[str, Any]] = None,
+        pool: Optional[concurrent.futures.Executor] = None,
+        max_parallel_nodes: int = DEFAULT_MAX_PARALLEL_NODES,
+    ):
+        if not process_graph:
+            raise ProcessGraphError("Empty process graph provided.")
+        self._graph = process_graph
+        self._ctx = ctx
+        self._access_token = access_token
+        self._parameters = dict(parameters or {})
+        self._pool = pool
+        self._max_parallel_nodes = max_parallel_nodes
+        self._dependencies = {
+            node_id: get_dependencies(node.get("arguments", {}))
+            for node_id, node in process_graph.items()
+        }
+        self._result_node_id = self._find_result_node()
+        self._order = self._sort_topologically()
+        self._processes = {}
+        for node_id in self._order:
+            try:
+                process = registry.get_process(process_graph[node_id]["process_id"])
+            except ValueError as exc:
+                raise ProcessGraphError(exc.args[0])
+            self._processes[node_id] = process
+
+    @property
+    def result_node_id(self) -> str:
+        return self._result_node_id
+
+    @property
+    def order(self) -> List[str]:
+        """The ids of the nodes the result depends on, in execution order."""
+        return list(self._order)
+
+    def get_dependencies(self, node_id: str) -> Set[str]:
+        return set(self._dependencies[node_id])
+
+    def get_process(self, node_id: str) -> Process:
+        return self._processes[node_id]
+
+    def execute(self, parameters: Optional[Mapping[str, Any]] = None) -> Any:
+        """
+        Executes the graph and returns the result of its result node.
+        :param parameters: values of graph parameters for this execution, in
+            addition to those the executor has been created with
+        """
+        bound_parameters = dict(self._parameters)
+        bound_parameters.update(parameters or {})
+        if self._pool is not None and self._max_parallel_nodes > 1:
+            return self._execute_parallel(bound_parameters)
+        results = {}
+        for node_id in self._order:
+            results[node_id] = self.execute_node(node_id, results, bound_parameters)
+        return results[self._result_node_id]
+
+    def execute_node(
+        self,
+        node_id: str,
+        results: Mapping[str, Any],
+        parameters: Optional[Mapping[str, Any]] = None,
+    ) -> Any:
+        """
+        Executes a single node, given the results of the nodes it depends on.
+        The process gets its own binding of the resolved arguments.
+        """
+        node = self._graph[node_id]
+        process = self._processes[node_id]
+        arguments = resolve_arguments(
+            node.get("arguments", {}),
+            results,
+            self._parameters if parameters is None else parameters,
+        )
+        arguments["input"] = next(
+            (arguments[a] for a in DATA_ARGUMENTS if a in arguments), None
+        )
+        arguments["access_token"] = self._access_token
+        return submit_process_sync(process, self._ctx, arguments)
+
+    def _execute_parallel(self, parameters: Mapping[str, Any]) -> Any:
+        waiting = {node_id: self.get_dependencies(node_id) for node_id in self._order}
+        dependents = {node_id: [] for node_id in self._order}
+        for node_id in self._order:
+            for dependency in waiting[node_id]:
+                dependents[dependency].append(node_id)
+        ready = [node_id for node_id in self._order if not waiting[node_id]]
+        running = {}
+        results = {}
+        try:
+            while ready or running:
+                while ready and len(running) < self._max_parallel_nodes:
+                    node_id = ready.pop(0)
+                    inputs = {d: results[d] for d in self._dependencies[node_id]}
+                    future = self._pool.submit(
+                        self.execute_node, node_id, inputs, parameters
+                    )
+                    running[future] = node_id
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    node_id = running.pop(future)
+                    results[node_id] = future.result()
+                    for dependent in dependents[node_id]:
+                        waiting[dependent].remove(node_id)
+                        if not waiting[dependent]:
+                            ready.append(dependent)
+        finally:
+            for future in running:
+                future.cancel()
+        return results[self._result_node_id]
+
+    def _find_result_node(self) -> str:
+        result_nodes = [
+            node_id for node_id, node in self._graph.items() if node.get("result")
+        ]
+        if len(result_nodes) != 1:
+            raise ProcessGraphError(
+                f"Process graph must contain exactly one result node,"
+                f" found {len(result_nodes)}."
+            )
+        return result_nodes[0]
+
+    def _sort_topologically(self) -> List[str]:
+        order = []
+        visited = set()
+        in_progress = set()
+
+        def visit(node_id: str):
+            if node_id in visited:
+                return
+            if node_id not in self._graph:
+                raise ProcessGraphError(f"Unknown node referenced: {node_id}")
+            if node_id in in_progress:
+                raise ProcessGraphError(f"Process graph contains a cycle at {node_id}")
+            in_progress.add(node_id)
+            for dependency in sorted(self._dependencies[node_id]):
+                visit(dependency)
+            in_progress.remove(node_id)
+            visited.add(node_id)
+            order.append(node_id)
+
+        visit(self._result_node_id)
+        return order
+
+
+_NODE_POOL_SINGLETON = None
+_NODE_POOL_LOCK = threading.Lock()
+
+
+def get_node_pool(
+    max_workers: int = DEFAULT_NODE_POOL_SIZE,
+) -> concurrent.futures.ThreadPoolExecutor:
+    """Return the thread pool singleton shared by all process graphs."""
+    global _NODE_POOL_SINGLETON
+    if _NODE_POOL_SINGLETON is None:
+        with _NODE_POOL_LOCK:
+            if _NODE_POOL_SINGLETON is None:
+                _NODE_POOL_SINGLETON = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="process-graph"
+                )
+    return _NODE_POOL_SINGLETON
+
+
+def get_dependencies(value: Any) -> Set[str]:
+    """
+    Returns the ids of all nodes referenced by an argument value, leaving out
+    callbacks.
+    """
+    if isinstance(value, dict):
+        if "from_node" in value:
+            return {value["from_node"]}
+        if "process_graph" in value:
+            return set()
+        return set().union(*[get_dependencies(v) for v in value.values()])
+    if isinstance(value, list):
+        return set().union(*[get_dependencies(v) for v in value])
+    return set()
+
+
+def resolve_arguments(
+    value: Any, results: Mapping[str, Any], parameters: Mapping[str, Any]
+) -> Any:
+    """
+    Returns a copy of an argument value with node references replaced by the
+    respective results and parameter references replaced by the parameter
+    values, if known. Callbacks are returned unchanged.
+    """
+    if isinstance(value, dict):
+        if "from_node" in value:
+            return results[value["from_node"]]
+        if "from_parameter" in value and value["from_parameter"] in parameters:
+            return parameters[value["from_parameter"]]
+        if "process_graph" in value:
+            return value
+        return {k: resolve_arguments(v, results, parameters) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_arguments(v, results, parameters) for v in value]
+    return value
@@ -0,0 +1,368 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from xcube.constants import LOG
+
+from .executor import ProcessGraphExecutor
+from .planner import plan_process_graph
+from .processes import get_processes_registry
+from ..core.geodb_datasource import PropertyCondition
+from ..core.geodb_datasource import TimeRange
+from ..core.tools import Cache
+from ..core.vectorcube import VectorCube
+from ..core.vectorcube_provider import VectorCubeProvider
+from ..core.vectorcube_provider import create_cube_provider
+from ..defaults import DEFAULT_MAX_RUNNING_JOBS
+from ..defaults import DEFAULT_VC_CACHE_SIZE
+
+JOB_FILE_NAME = "job.json"
+LOG_FILE_NAME = "log.jsonl"
+RESULT_FILE_NAME = "result.json"
+
+# statuses of jobs that do not change anymore unless the job is restarted
+FINAL_STATUSES = ("finished", "error", "canceled")
+
+
+class JobError(ValueError):
+    pass
+
+
+class JobManager:
+    """
+    Runs batch jobs, i.e. process graphs executed asynchronously, in a pool
+    of worker processes. Jobs started while all workers are busy are queued;
+    the number of workers caps the number of jobs running at the same time.
+
+    Each job has a directory of its own below the jobs directory, which holds
+    the job description (including its status), its log, and the result once
+    the job has finished. Thus, jobs and their results survive restarts of
+    the server; jobs interrupted by a restart fail.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        config: Mapping[str, Any],
+        max_running_jobs: int = DEFAULT_MAX_RUNNING_JOBS,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._config = dict(config)
+        self._max_running_jobs = max_running_jobs
+        self._pool = None
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        for job_id in os.listdir(directory):
+            job = read_job(self._get_job_dir(job_id))
+            if job and job["status"] in ("queued", "running"):
+                self._fail(job_id, "Job has been interrupted by a restart.")
+
+    def create_job(self, owner: str, process: Mapping, **properties) -> Dict:
+        """
+        Creates a job, which is not started yet.
+        :param owner: the id of the user owning the job
+        :param process: the process to run, holding the process graph
+        :param properties: the title and the description of the job
+        :return: the job
+        """
+        if "process_graph" not in process:
+            raise JobError("Process must contain a process graph.")
+        job_id = uuid.uuid4().hex
+        now = _utc_now()
+        job = {
+            "id": job_id,
+            "title": properties.get("title"),
+            "description": properties.get("description"),
+            "process": dict(process),
+            "status": "created",
+            "created": now,
+            "updated": now,
+            "owner": owner,
+        }
+        os.makedirs(self._get_job_dir(job_id))
+        write_job(self._get_job_dir(job_id), job)
+        return job
+
+    def get_job(self, owner: str, job_id: str) -> Optional[Dict]:
+        """Returns a job, or None if the user has no job of that id."""
+        if not job_id.isalnum():
+            return None
+        job = read_job(self._get_job_dir(job_id))
+        if not job or job["owner"] != owner:
+            return None
+        return job
+
+    def get_jobs(self, owner: str) -> List[Dict]:
+        """Returns the jobs of a user, the latest first."""
+        jobs = [self.get_job(owner, job_id) for job_id in os.listdir(self._directory)]
+        jobs = [job for job in jobs if job]
+        return sorted(jobs, key=lambda job: job["created"], reverse=True)
+
+    def start_job(self, owner: str, job_id: str, access_token: str) -> Dict:
+        """
+        Queues a job for execution with the given access token.
+        Jobs already queued or running are left as they are.
+        """
+        with self._lock:
+            job = self._get_existing_job(owner, job_id)
+            if job["status"] in ("queued", "running"):
+                return job
+            job_dir = self._get_job_dir(job_id)
+            for file_name in (LOG_FILE_NAME, RESULT_FILE_NAME):
+                if os.path.exists(os.path.join(job_dir, file_name)):
+                    os.remove(os.path.join(job_dir, file_name))
+            job = update_job(job_dir, status="queued")
+            append_log(job_dir, "info", "Job has been queued.")
+            future = self._get_pool().submit(
+                run_job, job_dir, self._config, access_token
+            )
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return job
+
+    def cancel_job(self, owner: str, job_id: str) -> Dict:
+        """
+        Cancels a job that is queued. Jobs that are already running are
+        completed.
+        """
+        with self._lock:
+            job = self._get_existing_job(owner, job_id)
+            future = self._futures.get(job_id)
+            if job["status"] == "queued" and future and future.cancel():
+                job_dir = self._get_job_dir(job_id)
+                append_log(job_dir, "info", "Job has been canceled.")
+                job = update_job(job_dir, status="canceled")
+            return job
+
+    def delete_job(self, owner: str, job_id: str):
+        """Deletes a job and its results, canceling it if queued."""
+        job = self.cancel_job(owner, job_id)
+        if job["status"] == "running":
+            raise JobError(f"Job {job_id} is running and cannot be deleted.")
+        with self._lock:
+            self._futures.pop(job_id, None)
+            shutil.rmtree(self._get_job_dir(job_id))
+
+    def get_logs(
+        self, owner: str, job_id: str, offset: Optional[str] = None, limit: int = 0
+    ) -> List[Dict]:
+        """
+        Returns the log entries of a job.
+        :param offset: if given, only the entries following the entry of
+            that id are returned
+        :param limit: if positive, at most that many entries are returned
+        """
+        self._get_existing_job(owner, job_id)
+        logs = read_logs(self._get_job_dir(job_id))
+        if offset is not None:
+            ids = [entry["id"] for entry in logs]
+            logs = logs[ids.index(offset) + 1 :] if offset in ids else []
+        return logs[:limit] if limit > 0 else logs
+
+    def get_result_path(self, owner: str, job_id: str) -> Tuple[Dict, Optional[str]]:
+        """
+        Returns a job and the path of its result file, which is None unless
+        the job has finished.
+        """
+        job = self._get_existing_job(owner, job_id)
+        if job["status"] != "finished":
+            return job, None
+        return job, os.path.join(self._get_job_dir(job_id), RESULT_FILE_NAME)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_existing_job(self, owner: str, job_id: str) -> Dict:
+        job = self.get_job(owner, job_id)
+        if not job:
+            raise JobError(f"Job {job_id} does not exist.")
+        return job
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            # workers must not inherit the threads of the server
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._max_running_jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def _on_done(self, job_id: str, future: concurrent.futures.Future):
+        with self._lock:
+            if self._futures.get(job_id) is future:
+                del self._futures[job_id]
+        if future.cancelled() or future.exception() is None:
+            return
+        # the worker process has died, which breaks the pool
+        if isinstance(future.exception(), BrokenProcessPool):
+            with self._lock:
+                self._pool = None
+        self._fail(job_id, f"Job has failed: {future.exception()}")
+
+    def _fail(self, job_id: str, message: str):
+        job_dir = self._get_job_dir(job_id)
+        if os.path.isdir(job_dir):
+            append_log(job_dir, "error", message)
+            update_job(job_dir, status="error")
+
+    def _get_job_dir(self, job_id: str) -> str:
+        return os.path.join(self._directory, job_id)
+
+
+class JobContext:
+    """
+    The server context within worker processes, providing what processes
+    need: the configuration and the vector cubes.
+    """
+
+    def __init__(self, config: Mapping[str, Any]):
+        self.config = config
+        self._cube_providers = {}
+        self._vector_cube_cache = Cache(DEFAULT_VC_CACHE_SIZE)
+
+    def get_cube_provider(self, access_token: str) -> VectorCubeProvider:
+        if access_token not in self._cube_providers:
+            self._cube_providers[access_token] = create_cube_provider(
+                self.config, access_token
+            )
+        return self._cube_providers[access_token]
+
+    def get_vector_cube(
+        self,
+        access_token: str,
+        collection_id: Tuple[str, str],
+        bbox: Optional[Tuple[float, float, float, float]],
+        time_range: Optional[TimeRange] = None,
+        properties: Optional[Tuple[str, ...]] = None,
+        conditions: Optional[Tuple[PropertyCondition, ...]] = None,
+    ) -> VectorCube:
+        cache_key = (collection_id, bbox, time_range, properties, conditions)
+        return self._vector_cube_cache.get_or_create(
+            cache_key,
+            lambda: self.get_cube_provider(access_token).get_vector_cube(
+                collection_id,
+                bbox,
+                time_range=time_range,
+                properties=properties,
+                conditions=conditions,
+            ),
+        )
+
+    def transform_bbox(
+        self,
+        access_token: str,
+        collection_id: Tuple[str, str],
+        bbox: Tuple[float, float, float, float],
+        crs: int,
+    ) -> Tuple[float, float, float, float]:
+        from xcube_geodb.core.geodb import GeoDBClient
+
+        vector_cube = self.get_vector_cube(access_token, collection_id, bbox=None)
+        return GeoDBClient.transform_bbox_crs(bbox, vector_cube.srid, crs)
+
+
+def run_job(job_dir: str, config: Mapping[str, Any], access_token: str):
+    """
+    Runs a job in a worker process, writing its status, log and result to
+    the job directory.
+    """
+    job = update_job(job_dir, status="running")
+    append_log(job_dir, "info", "Job has been started.")
+    try:
+        graph = plan_process_graph(job["process"]["process_graph"])
+        executor = ProcessGraphExecutor(
+            graph,
+            get_processes_registry(),
+            JobContext(config),
+            access_token=access_token,
+        )
+        result = executor.execute()
+        if isinstance(result, VectorCube):
+            result = result.to_geojson()
+        tmp_path = os.path.join(job_dir, RESULT_FILE_NAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, os.path.join(job_dir, RESULT_FILE_NAME))
+    except Exception as exc:
+        LOG.exception(f"Job in {job_dir} has failed")
+        append_log(job_dir, "error", f"Job has failed: {exc}")
+        update_job(job_dir, status="error")
+        return
+    # log first, so that the log is complete once the job is seen finished
+    append_log(job_dir, "info", "Job has finished.")
+    update_job(job_dir, status="finished")
+
+
+def read_job(job_dir: str) -> Optional[Dict]:
+    path = os.path.join(job_dir, JOB_FILE_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_job(job_dir: str, job: Mapping):
+    path = os.path.join(job_dir, JOB_FILE_NAME)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def update_job(job_dir: str, **properties) -> Dict:
+    job = dict(read_job(job_dir), **properties, updated=_utc_now())
+    write_job(job_dir, job)
+    return job
+
+
+def append_log(job_dir: str, level: str, message: str):
+    path = os.path.join(job_dir, LOG_FILE_NAME)
+    entry = {
+        "id": uuid.uuid4().hex,
+        "level": level,
+        "message": message,
+        "time": _utc_now(),
+    }
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def read_logs(job_dir: str) -> List[Dict]:
+    path = os.path.join(job_dir, LOG_FILE_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _utc_now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
@@ -0,0 +1,258 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import copy
+import json
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from .executor import get_dependencies
+from .processes import LoadCollection
+from .processes import get_processes_registry
+from .processes import parse_bbox
+from .processes import parse_temporal_extent
+from ..core.geodb_datasource import TimeRange
+
+
+def plan_process_graph(process_graph: Mapping[str, Dict]) -> Dict[str, Dict]:
+    """
+    Rewrites a process graph before it is executed, so that collections are
+    loaded with a single query that fetches no rows a later step throws
+    away, and so that no computation is done twice.
+
+    Filters applied directly to a collection loaded are merged into the
+    arguments of the load_collection node. The merged node takes the id of
+    the filter, so that references to the filter remain valid.
+    A load_collection node is only merged with a filter consuming it if no
+    other node consumes it, and if the filter arguments are literal values.
+
+    Nodes computing the same, i.e. calling the same process with the same
+    canonical arguments on the same inputs, are replaced by a single node,
+    see _share_identical_nodes.
+    :param process_graph: the flat process graph, which is not modified
+    :return: the rewritten process graph
+    """
+    graph = _share_identical_nodes(copy.deepcopy(dict(process_graph)))
+    merged = False
+    while _merge_next_filter(graph):
+        merged = True
+    # merging filters may make load_collection nodes identical
+    return _share_identical_nodes(graph) if merged else graph
+
+
+def _share_identical_nodes(graph: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Replaces structurally identical sub-graphs of a process graph by a single
+    one. Two nodes are identical if they call the same process with the same
+    arguments, once missing arguments are replaced by their defaults, extents
+    of load_collection are parsed, and references to identical nodes are
+    replaced by references to the node kept. Of each set of identical nodes,
+    the first one in topological order is kept; it becomes the result node
+    if any of them is. Graphs that are not valid are returned unchanged, so
+    that the executor reports their errors.
+    :param graph: the flat process graph, which is modified
+    :return: the process graph without identical nodes
+    """
+    order = _sort_topologically(graph)
+    if order is None:
+        return graph
+    kept_ids: Dict[str, str] = {}
+    kept_by_signature: Dict[str, str] = {}
+    for node_id in order:
+        node = graph[node_id]
+        if "arguments" in node:
+            node["arguments"] = _replace_references(node["arguments"], kept_ids)
+        signature = _get_signature(node)
+        kept_ids[node_id] = kept_by_signature.setdefault(signature, node_id)
+    shared = {
+        node_id: node for node_id, node in graph.items() if kept_ids[node_id] == node_id
+    }
+    for node_id, node in graph.items():
+        if node.get("result"):
+            shared[kept_ids[node_id]]["result"] = True
+    return shared
+
+
+def _sort_topologically(graph: Mapping[str, Dict]) -> Optional[List[str]]:
+    dependencies = {
+        node_id: get_dependencies(node.get("arguments", {}))
+        for node_id, node in graph.items()
+    }
+    if any(not d.issubset(graph) for d in dependencies.values()):
+        return None
+    order = []
+    done = set()
+    while len(order) < len(graph):
+        ready = [
+            node_id
+            for node_id in graph
+            if node_id not in done and dependencies[node_id].issubset(done)
+        ]
+        if not ready:
+            # the graph contains a cycle
+            return None
+        order += ready
+        done.update(ready)
+    return order
+
+
+def _replace_references(value: Any, node_ids: Mapping[str, str]) -> Any:
+    if isinstance(value, dict):
+        if "from_node" in value:
+            return dict(value, from_node=node_ids[value["from_node"]])
+        if "process_graph" in value:
+            return value
+        return {k: _replace_references(v, node_ids) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_replace_references(v, node_ids) for v in value]
+    return value
+
+
+def _get_signature(node: Mapping) -> str:
+    process_id = node.get("process_id")
+    arguments = dict(node.get("arguments", {}))
+    try:
+        process = get_processes_registry().get_process(process_id)
+    except ValueError:
+        process = None
+    if process is not None:
+        for parameter in process.metadata.get("parameters", []):
+            if "default" in parameter:
+                arguments.setdefault(parameter["name"], parameter["default"])
+        canonicalize = _ARGUMENT_CANONICALIZATIONS.get(process_id)
+        if canonicalize:
+            try:
+                arguments = canonicalize(arguments)
+            except (KeyError, TypeError, ValueError):
+                pass
+    return json.dumps([process_id, arguments], sort_keys=True, default=str)
+
+
+def _canonicalize_load_collection(arguments: Dict) -> Dict:
+    load_collection = get_processes_registry().get_process("load_collection")
+    params = load_collection.translate_parameters(dict(arguments, access_token=None))
+    spatial_extent = None
+    if params["bbox"]:
+        spatial_extent = _to_spatial_extent(
+            parse_bbox(params["bbox"]), int(params["crs"])
+        )
+    return dict(
+        arguments,
+        spatial_extent=spatial_extent,
+        temporal_extent=_to_temporal_extent(params["time_range"]),
+        properties=[params["properties"], params["conditions"]],
+        bands=None,
+    )
+
+
+# canonical forms of the arguments of processes, which may be given in
+# several equivalent ways
+_ARGUMENT_CANONICALIZATIONS: Dict[str, Callable[[Dict], Dict]] = {
+    "load_collection": _canonicalize_load_collection,
+}
+
+
+def _merge_next_filter(graph: Dict[str, Dict]) -> bool:
+    consumers = {node_id: 0 for node_id in graph}
+    for node in graph.values():
+        for dependency in get_dependencies(node.get("arguments", {})):
+            if dependency in consumers:
+                consumers[dependency] += 1
+    for node_id, node in graph.items():
+        merge = _FILTER_MERGES.get(node.get("process_id"))
+        data = node.get("arguments", {}).get("data")
+        if not merge or not isinstance(data, dict) or "from_node" not in data:
+            continue
+        source_id = data["from_node"]
+        source = graph.get(source_id)
+        if (
+            not source
+            or source.get("process_id") != "load_collection"
+            or source.get("result")
+            or consumers[source_id] != 1
+        ):
+            continue
+        try:
+            arguments = merge(dict(source.get("arguments", {})), node["arguments"])
+        except (KeyError, TypeError, ValueError):
+            arguments = None
+        if arguments is None:
+            continue
+        merged = dict(source, arguments=arguments)
+        if node.get("result"):
+            merged["result"] = True
+        graph[node_id] = merged
+        del graph[source_id]
+        return True
+    return False
+
+
+def _merge_bbox(arguments: Dict, filter_arguments: Mapping) -> Optional[Dict]:
+    extent = filter_arguments["extent"]
+    crs = int(extent.get("crs") or LoadCollection.DEFAULT_CRS)
+    bbox = parse_bbox([extent[k] for k in ("west", "south", "east", "north")])
+    load_collection = get_processes_registry().get_process("load_collection")
+    params = load_collection.translate_parameters(dict(arguments, access_token=None))
+    if params["bbox"]:
+        if int(params["crs"]) != crs:
+            return None
+        other = parse_bbox(params["bbox"])
+        bbox = (
+            max(bbox[0], other[0]),
+            max(bbox[1], other[1]),
+            min(bbox[2], other[2]),
+            min(bbox[3], other[3]),
+        )
+        if bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+            # the extents do not overlap, or only touch; their intersection
+            # is no valid bbox, so the filter is applied to the features
+            return None
+    arguments["spatial_extent"] = _to_spatial_extent(bbox, crs)
+    return arguments
+
+
+def _merge_temporal_extent(arguments: Dict, filter_arguments: Mapping) -> Dict:
+    time_range = parse_temporal_extent(filter_arguments["extent"])
+    if time_range is None:
+        return arguments
+    other = parse_temporal_extent(arguments.get("temporal_extent"))
+    if other is not None:
+        starts = [t for t in (time_range[0], other[0]) if t is not None]
+        ends = [t for t in (time_range[1], other[1]) if t is not None]
+        time_range = (max(starts) if starts else None, min(ends) if ends else None)
+    arguments["temporal_extent"] = _to_temporal_extent(time_range)
+    return arguments
+
+
+def _to_spatial_extent(bbox: Sequence[float], crs: int) -> Dict:
+    return dict(zip(("west", "south", "east", "north"), bbox), crs=crs)
+
+
+def _to_temporal_extent(time_range: Optional[TimeRange]) -> Optional[List]:
+    if time_range is None:
+        return None
+    return [t.isoformat() if t is not None else None for t in time_range]
+
+
+# merge the arguments of a filter into the arguments of load_collection; they
+# return None if the filter cannot be merged
+_FILTER_MERGES: Dict[str, Callable[[Dict, Mapping], Optional[Dict]]] = {
+    "filter_bbox": _merge_bbox,
+    "filter_temporal": _merge_temporal_extent,
+}
@@ -21,20 +21,36 @@
 import datetime
 import operator
 
-import dateutil.parser
 import importlib
 import importlib.resources as resources
 import json
+import numpy as np
+import pandas as pd
 import pytz
+import shapely.geometry
+import threading
 
 from abc import abstractmethod
-from typing import Dict, List, Any, Callable
+from types import MappingProxyType
+from typing import Dict, List, Any, Callable, Iterable, Mapping, Optional, Tuple
 
-import shapely
-from geojson import Feature, FeatureCollection
+from geojson import FeatureCollection
 from xcube.server.api import ServerContextT
-from openeo.internal.graph_building import PGNode
-from ..core.vectorcube import StaticVectorCubeFactory, VectorCube
+from ..core.operations import ColumnFunction
+from ..core.operations import CubeMath
+from ..core.operations import ElementwiseMath
+from ..core.operations import Filter
+from ..core.operations import TemporalAggregation
+from ..core.operations import TemporalFilter
+from ..core.reductions import GroupedMoments
+from ..core.reductions import GroupedValues
+from ..core.reductions import ReducerState
+from ..core.geodb_datasource import PropertyCondition
+from ..core.geodb_datasource import TimeRange
+from ..core.tools import parse_datetimes
+from ..core.vectorcube import VectorCube
+from ..defaults import DEFAULT_AGGREGATION_CHUNK_ROWS
+from .workers import get_chunked_reducer
 
 
 class Process:
@@ -42,6 +58,8 @@ class Process:
     This class represents a process. It contains the metadata, and the method
     "Execute".
     Instances can be passed as parameter to Processing.
+    Processes are stateless definitions, shared by all requests; everything
+    an invocation needs is passed to "execute".
     """
 
     def __init__(self, metadata: Dict):
@@ -51,22 +69,13 @@ class Process:
         if "module" in self._metadata:
             del self.metadata["module"]
             del self.metadata["class_name"]
-        self._parameters = {}
 
     @property
     def metadata(self) -> Dict:
         return self._metadata
 
-    @property
-    def parameters(self) -> Dict:
-        return self._parameters
-
-    @parameters.setter
-    def parameters(self, p: dict) -> None:
-        self._parameters = p
-
     @abstractmethod
-    def execute(self, parameters: dict, ctx: ServerContextT) -> Any:
+    def execute(self, parameters: Mapping, ctx: ServerContextT) -> Any:
         pass
 
     def translate_parameters(self, parameters: dict) -> dict:
@@ -97,21 +106,30 @@ def read_default_processes() -> List[Process]:
 
 
 class ProcessRegistry:
+    """
+    Holds the available processes, indexed by their ids, and the serialized
+    bodies of the responses listing them, which are computed only once.
+    """
+
     @property
     def processes(self) -> List[Process]:
-        return self._processes
+        return list(self._processes.values())
 
     def __init__(self):
-        self._processes = []
+        self._processes = {}
         self.links = []
+        self._processes_body = None
+        self._file_formats_body = None
         self._add_default_processes()
         self._add_default_links()
 
     def add_process(self, process: Process) -> None:
-        self.processes.append(process)
+        self._processes[process.metadata["id"]] = process
+        self._processes_body = None
 
     def add_link(self, link: Dict) -> None:
         self.links.append(link)
+        self._processes_body = None
 
     def get_links(self) -> List:
         return self.links.copy()
@@ -169,10 +187,27 @@ class ProcessRegistry:
         # return {'input': [], 'output': ['GeoJSON']}
 
     def get_process(self, process_id: str) -> Process:
-        for process in self.processes:
-            if process.metadata["id"] == process_id:
-                return process
-        raise ValueError(f"Unknown process_id: {process_id}")
+        try:
+            return self._processes[process_id]
+        except KeyError:
+            raise ValueError(f"Unknown process_id: {process_id}")
+
+    def get_processes_body(self) -> bytes:
+        """Returns the JSON-encoded response body listing all processes."""
+        if self._processes_body is None:
+            self._processes_body = _encode(
+                {
+                    "processes": [p.metadata for p in self.processes],
+                    "links": self.get_links(),
+                }
+            )
+        return self._processes_body
+
+    def get_file_formats_body(self) -> bytes:
+        """Returns the JSON-encoded response body listing all file formats."""
+        if self._file_formats_body is None:
+            self._file_formats_body = _encode(self.get_file_formats())
+        return self._file_formats_body
 
     def _add_default_processes(self):
         for dp in read_default_processes():
@@ -182,146 +217,348 @@ class ProcessRegistry:
         self.add_link({})
 
 
+def _encode(obj: Any) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+
 _PROCESS_REGISTRY_SINGLETON = None
+_PROCESS_REGISTRY_LOCK = threading.Lock()
 
 
 def get_processes_registry() -> ProcessRegistry:
     """Return the process registry singleton."""
     global _PROCESS_REGISTRY_SINGLETON
     if not _PROCESS_REGISTRY_SINGLETON:
-        _PROCESS_REGISTRY_SINGLETON = ProcessRegistry()
+        with _PROCESS_REGISTRY_LOCK:
+            if not _PROCESS_REGISTRY_SINGLETON:
+                _PROCESS_REGISTRY_SINGLETON = ProcessRegistry()
     return _PROCESS_REGISTRY_SINGLETON
 
 
-def submit_process_sync(p: Process, ctx: ServerContextT) -> Any:
+def submit_process_sync(p: Process, ctx: ServerContextT, parameters: Mapping) -> Any:
     """
     Submits a process synchronously, and returns the result.
     :param p: The process to execute.
     :param ctx: The Server context.
+    :param parameters: The parameters to execute the process with; the process
+        gets a read-only view of them.
     :return: processing result
     """
-    return p.execute(p.parameters, ctx)
+    return p.execute(MappingProxyType(dict(parameters)), ctx)
+
+
+def get_callback_executor(
+    callback: Mapping, ctx: ServerContextT, access_token: Optional[str] = None
+):
+    """
+    Returns an executor for a callback, i.e. a process graph passed as
+    argument to a process. The executor may be invoked repeatedly, with the
+    callback parameters (such as "x" or "data") given for each invocation.
+    :param callback: The argument, containing the key "process_graph".
+    :param ctx: The Server context.
+    :param access_token: The access token of the user.
+    :return: the executor
+    """
+    from .executor import ProcessGraphExecutor
+
+    return ProcessGraphExecutor(
+        callback["process_graph"],
+        get_processes_registry(),
+        ctx,
+        access_token=access_token,
+    )
+
+
+def get_callback(
+    callback: Mapping, ctx: ServerContextT, access_token: Optional[str] = None
+) -> Callable[[Mapping], Any]:
+    """
+    Returns a function evaluating a callback for given callback parameters.
+    Callbacks consisting of array functions only are compiled once, and the
+    compiled callbacks are shared by all requests; they are evaluated on whole
+    arrays. Other callbacks, and compiled ones given parameters they cannot
+    handle, such as vector cubes, are executed as process graphs.
+    :param callback: The argument, containing the key "process_graph".
+    :param ctx: The Server context.
+    :param access_token: The access token of the user.
+    :return: the function, taking a mapping of callback parameters
+    """
+    from .callbacks import compile_callback
+
+    compiled = compile_callback(callback)
+    executor = (
+        None
+        if compiled is not None
+        else get_callback_executor(callback, ctx, access_token)
+    )
+
+    def evaluate(parameters: Mapping) -> Any:
+        nonlocal executor
+        if compiled is not None and compiled.accepts(parameters):
+            return compiled(parameters)
+        if executor is None:
+            executor = get_callback_executor(callback, ctx, access_token)
+        return executor.execute(parameters)
+
+    return evaluate
 
 
 class LoadCollection(Process):
     DEFAULT_CRS = 4326
 
-    def execute(self, query_params: dict, ctx: ServerContextT):
+    def execute(self, query_params: Mapping, ctx: ServerContextT):
         params = self.translate_parameters(query_params)
         collection_id = tuple(params["collection_id"].split("~"))
         bbox_transformed = None
         if params["bbox"]:
-            bbox = [
-                float(v)
-                for v in params["bbox"]
-                .replace("(", "")
-                .replace(")", "")
-                .replace(" ", "")
-                .split(",")
-            ]
+            bbox = list(parse_bbox(params["bbox"]))
             crs = int(params["crs"])
             bbox_transformed = ctx.transform_bbox(
                 params["access_token"], collection_id, bbox, crs
             )
 
         return ctx.get_vector_cube(
-            params["access_token"], collection_id, bbox=bbox_transformed
+            params["access_token"],
+            collection_id,
+            bbox=tuple(bbox_transformed) if bbox_transformed else None,
+            time_range=params["time_range"],
+            properties=params["properties"],
+            conditions=params["conditions"],
         )
 
-    def translate_parameters(self, query_params: dict) -> dict:
-        bbox_qp = (
-            query_params["spatial_extent"]["bbox"]
-            if (
-                "spatial_extent" in query_params
-                and query_params["spatial_extent"]
-                and "bbox" in query_params["spatial_extent"]
+    def translate_parameters(self, query_params: Mapping) -> dict:
+        spatial_extent = query_params.get("spatial_extent")
+        if not isinstance(spatial_extent, Mapping):
+            spatial_extent = None
+        bbox_qp = None
+        if spatial_extent and "bbox" in spatial_extent:
+            bbox_qp = spatial_extent["bbox"]
+        elif spatial_extent and "west" in spatial_extent:
+            bbox_qp = tuple(
+                spatial_extent[k] for k in ("west", "south", "east", "north")
             )
-            else None
-        )
         if not bbox_qp:
             crs_qp = None
         else:
-            crs_qp = (
-                query_params["spatial_extent"]["crs"]
-                if (
-                    "spatial_extent" in query_params
-                    and query_params["spatial_extent"]
-                    and "crs" in query_params["spatial_extent"]
-                )
-                else self.DEFAULT_CRS
-            )
+            crs_qp = spatial_extent.get("crs") or self.DEFAULT_CRS
         return {
             "collection_id": query_params["id"],
             "bbox": bbox_qp,
             "crs": crs_qp,
+            "time_range": parse_temporal_extent(query_params.get("temporal_extent")),
+            "properties": parse_property_selection(
+                query_params.get("properties"), query_params.get("bands")
+            ),
+            "conditions": parse_property_conditions(query_params.get("properties")),
             "access_token": query_params["access_token"],
         }
 
 
+class FilterBbox(Process):
+    """
+    Drops the features of a vector cube that do not intersect a bounding box.
+    Usually, the planner merges the bounding box into the spatial extent of
+    the collection loaded, so that this process is not executed at all.
+    """
+
+    def execute(self, query_params: Mapping, ctx: ServerContextT) -> VectorCube:
+        vector_cube = query_params["input"]
+        extent = query_params["extent"]
+        bbox = [extent[k] for k in ("west", "south", "east", "north")]
+        bbox = ctx.transform_bbox(
+            query_params.get("access_token"),
+            tuple(vector_cube.id.split("~")),
+            bbox,
+            int(extent.get("crs") or LoadCollection.DEFAULT_CRS),
+        )
+        box = shapely.geometry.box(*bbox)
+        return vector_cube.with_operation(
+            Filter(lambda f: shapely.geometry.shape(f["geometry"]).intersects(box))
+        )
+
+
+class FilterTemporal(Process):
+    """
+    Drops the features of a vector cube whose time does not lie within a
+    temporal extent. Usually, the planner merges the extent into the temporal
+    extent of the collection loaded, so that this process is not executed at
+    all.
+    """
+
+    def execute(self, query_params: Mapping, ctx: ServerContextT) -> VectorCube:
+        vector_cube = query_params["input"]
+        time_range = parse_temporal_extent(query_params["extent"])
+        time_dim_name = vector_cube.get_time_dim_name()
+        if not time_range or not time_dim_name:
+            return vector_cube
+        start, end = time_range
+        return vector_cube.with_operation(TemporalFilter(start, end, time_dim_name))
+
+
+def parse_bbox(bbox: Any) -> Tuple[float, ...]:
+    """
+    Parses a bounding box, given as sequence of numbers or as string of the
+    form "(west, south, east, north)".
+    """
+    if isinstance(bbox, str):
+        bbox = bbox.replace("(", "").replace(")", "").replace(" ", "").split(",")
+    return tuple(float(v) for v in bbox)
+
+
+def parse_temporal_extent(extent: Any) -> Optional[TimeRange]:
+    """
+    Parses a temporal extent, given as list of start and end, into a time
+    range of UTC timestamps. Open bounds are given as null; None is returned
+    if both bounds are open or no extent is given.
+    """
+    if not extent or not isinstance(extent, (list, tuple)):
+        return None
+    start, end = [
+        None if v is None or v == "None" else parse_datetimes([v])[0] for v in extent
+    ]
+    if start is None and end is None:
+        return None
+    return start, end
+
+
+def parse_property_selection(
+    properties: Any, bands: Any = None
+) -> Optional[Tuple[str, ...]]:
+    """
+    Parses the names of the properties to load, given as list either as
+    properties or as bands. None is returned if all properties are to be
+    loaded.
+    """
+    for selection in (properties, bands):
+        if isinstance(selection, (list, tuple)):
+            return tuple(str(name) for name in selection)
+    return None
+
+
+def parse_property_conditions(
+    properties: Any,
+) -> Optional[Tuple[PropertyCondition, ...]]:
+    """
+    Parses the property filters of load_collection, given as mapping of
+    property names to callbacks, into conditions. Each callback must consist
+    of a single comparison of the parameter "value" with a constant.
+    """
+    if not isinstance(properties, Mapping) or not properties:
+        return None
+    return tuple(
+        _parse_property_condition(name, callback)
+        for name, callback in sorted(properties.items())
+    )
+
+
+# the comparison equivalent to the given one with its operands swapped
+_SWAPPED_COMPARISONS = {
+    "eq": "eq",
+    "neq": "neq",
+    "lt": "gt",
+    "lte": "gte",
+    "gt": "lt",
+    "gte": "lte",
+}
+
+
+def _parse_property_condition(name: str, callback: Any) -> PropertyCondition:
+    nodes = list(callback.get("process_graph", {}).values())
+    if len(nodes) == 1 and nodes[0].get("process_id") in _SWAPPED_COMPARISONS:
+        process_id = nodes[0]["process_id"]
+        arguments = nodes[0].get("arguments", {})
+        x, y = arguments.get("x"), arguments.get("y")
+        if x == {"from_parameter": "value"} and not isinstance(y, dict):
+            return name, process_id, y
+        if y == {"from_parameter": "value"} and not isinstance(x, dict):
+            return name, _SWAPPED_COMPARISONS[process_id], x
+    raise ValueError(
+        f"Unsupported filter on property {name}:"
+        f" only comparisons of the value with a constant are supported."
+    )
+
+
 class AggregateTemporal(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT):
+    def execute(self, query_params: Mapping, ctx: ServerContextT):
         # todo allow for more complex reducer functions
-        # todo allow for more than one interval
-        reducer_node = PGNode.from_flat_graph(query_params["reducer"]["process_graph"])
-        reducer_id = reducer_node.process_id
-        registry = get_processes_registry()
-        reducer = registry.get_process(reducer_id)
+        reducer = get_callback(
+            query_params["reducer"], ctx, query_params.get("access_token")
+        )
+        context = query_params.get("context")
+        simple_reducer = get_simple_reducer(query_params["reducer"])
         vector_cube = query_params["input"]
-        interval = query_params["intervals"][0]
         pattern = query_params["context"]["pattern"]
+        api_config = _get_api_config(ctx)
         utc = pytz.UTC
-        start_date = datetime.datetime.strptime(interval[0], pattern).replace(
-            tzinfo=utc
-        )
-        end_date = datetime.datetime.strptime(interval[1], pattern).replace(tzinfo=utc)
-        time_dim_name = vector_cube.get_time_dim_name()
-        features_by_geometry = vector_cube.get_features_by_geometry(limit=None)
-
-        result = StaticVectorCubeFactory().copy(vector_cube, False, "_agg_temp")
-
-        for geometry in features_by_geometry:
-            features = features_by_geometry[geometry]
-            extractions = {}
-            for feature in features:
-                for prop in [
-                    p
-                    for p in feature["properties"]
-                    if not p == "created_at"
-                    and not p == "modified_at"
-                    and not p == time_dim_name
-                    and (
-                        type(feature["properties"][p]) == float
-                        or type(feature["properties"][p]) == int
-                    )
-                ]:
-                    if prop not in extractions:
-                        extractions[prop] = []
-                    date = dateutil.parser.parse(
-                        feature["properties"][time_dim_name]
-                    ).replace(tzinfo=utc)
-                    if start_date <= date < end_date:
-                        extractions[prop].append(feature["properties"][prop])
-
-            new_properties = {
-                "created_at": datetime.datetime.now(utc),
-                time_dim_name: end_date,
-            }
-            for prop in extractions.keys():
-                new_properties[prop] = reducer.execute(
-                    {"input": extractions[prop]}, ctx=ctx
-                )
-            for prop in feature["properties"]:
-                if prop not in new_properties:
-                    new_properties[prop] = feature["properties"][prop]
-            result.features.append(
-                Feature(None, shapely.wkt.loads(geometry), new_properties)
+        intervals = [
+            (
+                datetime.datetime.strptime(start, pattern).replace(tzinfo=utc),
+                datetime.datetime.strptime(end, pattern).replace(tzinfo=utc),
             )
+            for start, end in query_params["intervals"]
+        ]
+
+        return vector_cube.with_operation(
+            TemporalAggregation(
+                lambda values: reducer({"data": values, "context": context}),
+                intervals,
+                vector_cube.get_time_dim_name(),
+                labels=query_params.get("labels") or None,
+                reducer_id=simple_reducer.metadata["id"] if simple_reducer else None,
+                reduce_chunks=(
+                    get_chunked_reducer(simple_reducer, api_config)
+                    if simple_reducer
+                    else None
+                ),
+                chunk_rows=api_config.get(
+                    "aggregation_chunk_rows", DEFAULT_AGGREGATION_CHUNK_ROWS
+                ),
+            )
+        )
+
+
+def _get_api_config(ctx: ServerContextT) -> Mapping[str, Any]:
+    config = getattr(ctx, "config", None)
+    if not isinstance(config, Mapping):
+        return {}
+    return config.get("geodb_openeo", {})
+
+
+def get_simple_reducer(callback: Mapping) -> Optional["Reducer"]:
+    """
+    Returns the reducer a reducer callback consists of, if it is a single
+    reducer process applied to the data only, such as "mean"; None otherwise.
+    """
+    nodes = list(callback["process_graph"].values())
+    if len(nodes) != 1:
+        return None
+    arguments = nodes[0].get("arguments", {})
+    if arguments != {"data": {"from_parameter": "data"}}:
+        return None
+    process = get_processes_registry().get_process(nodes[0]["process_id"])
+    return process if isinstance(process, Reducer) else None
+
 
-        return result.create()
+class ArrayFunction(Process):
+    """
+    A process computing its result from numbers, or arrays of numbers, only.
+    Callbacks consisting of such processes are compiled into functions that
+    operate on whole arrays at once.
+    """
+
+    argument_names: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def compute(self, arguments: Mapping) -> Any:
+        """
+        Computes the result from the argument values, which are numbers,
+        arrays of numbers, or None.
+        """
+        pass
 
 
 class SaveResult(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT):
+    def execute(self, query_params: Mapping, ctx: ServerContextT):
         vector_cube = query_params["input"]
         if query_params["format"].lower() == "geojson":
             collection = FeatureCollection(
@@ -330,128 +567,371 @@ class SaveResult(Process):
             return collection
 
 
-class Mean(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT):
-        import numpy as np
+class Reducer(ArrayFunction):
+    """
+    A process reducing a list of numbers to a single one. Besides reducing
+    a single list, reducers can reduce many groups of values at once, either
+    in one call or chunk by chunk, combining the states of the chunks.
+    """
+
+    argument_names = ("data",)
+    # whether the size of the state depends on the number of groups only
+    bounded_state = True
+
+    def execute(self, query_params: Mapping, ctx: ServerContextT):
+        return self.reduce(np.asarray(query_params["input"]))
+
+    def compute(self, arguments: Mapping) -> Any:
+        return self.reduce(np.asarray(arguments["data"]))
+
+    @abstractmethod
+    def reduce(self, values: np.ndarray) -> Any:
+        pass
+
+    @abstractmethod
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        """
+        Reduces all groups of values in one vectorized call.
+        :param values: the values, one column per property
+        :param codes: the group code of each row
+        :return: the results of each column, indexed by group code
+        """
+        pass
+
+    @abstractmethod
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        """
+        Returns the mergeable state of the groups of a chunk of values.
+        :param values: the values, one column per property
+        :param codes: the non-negative group code of each row
+        """
+        pass
+
+    @abstractmethod
+    def finalize(self, state: ReducerState) -> pd.DataFrame:
+        """
+        Returns the results of a state like reduce_grouped, indexed by group
+        code.
+        """
+        pass
+
+    def reduce_chunks(
+        self, chunks: Iterable[Tuple[pd.DataFrame, np.ndarray]]
+    ) -> pd.DataFrame:
+        """
+        Reduces the groups of values given in chunks of rows, holding the
+        state of a single chunk besides the combined one at a time.
+        :param chunks: pairs of values and group codes
+        :return: the results of each column, indexed by group code
+        """
+        state = None
+        try:
+            for values, codes in chunks:
+                chunk_state = self.create_state(values, codes)
+                state = chunk_state if state is None else state.combine(chunk_state)
+            return self.finalize(state) if state is not None else pd.DataFrame()
+        finally:
+            if state is not None:
+                state.close()
+
+
+class Mean(Reducer):
+    def reduce(self, values: np.ndarray) -> Any:
+        return np.mean(values)
+
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        return values.groupby(codes).mean()
+
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        return GroupedMoments.from_values(values, codes)
+
+    def finalize(self, state: GroupedMoments) -> pd.DataFrame:
+        return state.get_mean()
+
+
+class Std(Reducer):
+    def reduce(self, values: np.ndarray) -> Any:
+        return np.std(values)
+
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        return values.groupby(codes).std(ddof=0)
+
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        return GroupedMoments.from_values(values, codes)
+
+    def finalize(self, state: GroupedMoments) -> pd.DataFrame:
+        return state.get_std()
+
+
+class Median(Reducer):
+    # all values are kept, spilling to disk beyond the memory budget
+    bounded_state = False
+
+    def reduce(self, values: np.ndarray) -> Any:
+        return np.median(values)
+
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        return values.groupby(codes).median()
 
-        return np.mean(query_params["input"])
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        return GroupedValues.from_values(values, codes)
 
+    def finalize(self, state: GroupedValues) -> pd.DataFrame:
+        return state.get_quantile(0.5)
 
-class Std(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT):
-        import numpy as np
 
-        return np.std(query_params["input"])
+class Min(Reducer):
+    def reduce(self, values: np.ndarray) -> Any:
+        # like the other reducers, no values give NaN
+        return np.min(values) if np.size(values) else np.nan
 
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        return values.groupby(codes).min()
 
-class Median(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT):
-        import numpy as np
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        return GroupedMoments.from_values(values, codes)
 
-        return np.median(query_params["input"])
+    def finalize(self, state: GroupedMoments) -> pd.DataFrame:
+        return state.get_min()
+
+
+class Max(Reducer):
+    def reduce(self, values: np.ndarray) -> Any:
+        # like the other reducers, no values give NaN
+        return np.max(values) if np.size(values) else np.nan
+
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        return values.groupby(codes).max()
+
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        return GroupedMoments.from_values(values, codes)
+
+    def finalize(self, state: GroupedMoments) -> pd.DataFrame:
+        return state.get_max()
+
+
+class Count(Reducer):
+    def reduce(self, values: np.ndarray) -> Any:
+        return int(np.count_nonzero(pd.notna(values)))
+
+    def reduce_grouped(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        return values.groupby(codes).count()
+
+    def create_state(self, values: pd.DataFrame, codes: np.ndarray) -> ReducerState:
+        return GroupedMoments.from_values(values, codes)
+
+    def finalize(self, state: GroupedMoments) -> pd.DataFrame:
+        return state.get_count()
 
 
 class ArrayApply(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT) -> Any:
-        graph = query_params["process"]["process_graph"]
-        node = PGNode.from_flat_graph(graph)
+    def execute(self, query_params: Mapping, ctx: ServerContextT) -> Any:
+        process = get_callback(
+            query_params["process"], ctx, query_params.get("access_token")
+        )
+        return process(
+            {"x": query_params["input"], "context": query_params.get("context")}
+        )
+
+
+class MathProcess(ArrayFunction):
+    """
+    A binary math process. Applied to a vector cube, the operator is applied
+    to whole property columns.
+    """
+
+    operation: Callable = None
+    argument_names = ("x", "y")
+
+    def execute(self, query_params: Mapping, ctx: ServerContextT) -> Any:
+        x_name, y_name = self.argument_names
+        return execute_math_function(
+            query_params, ctx, self.operation, x_name=x_name, y_name=y_name
+        )
+
+    def compute(self, arguments: Mapping) -> Any:
+        x, y = [arguments.get(name) for name in self.argument_names]
+        return None if x is None or y is None else self.operation(x, y)
+
+
+class Apply(Process):
+    """
+    Applies a callback to each value of the numeric properties of a vector
+    cube. Callbacks that can be compiled are evaluated on whole property
+    columns; others are executed as process graphs on the vector cube.
+    """
 
-        current_result = query_params["input"]
-        registry = get_processes_registry()
-        process = registry.get_process(node.process_id)
-        process_parameters = node.arguments
-        process_parameters["input"] = current_result
-        process.parameters = process_parameters
-        current_result = submit_process_sync(process, ctx)
+    def execute(self, query_params: Mapping, ctx: ServerContextT) -> Any:
+        from .callbacks import compile_callback
+
+        vector_cube = query_params["input"]
+        callback = query_params["process"]
+        context = query_params.get("context")
+        compiled = compile_callback(callback)
+        if (
+            isinstance(vector_cube, VectorCube)
+            and compiled is not None
+            and set(compiled.parameter_names).issubset({"x", "context"})
+            and compiled.accepts({"context": context})
+        ):
+            return vector_cube.with_operation(
+                ColumnFunction(
+                    lambda column: compiled({"x": column, "context": context}),
+                    vector_cube.get_time_dim_name(),
+                )
+            )
+        process = get_callback(callback, ctx, query_params.get("access_token"))
+        return process({"x": vector_cube, "context": context})
+
+
+class Add(MathProcess):
+    operation = operator.add
+
+
+class Subtract(MathProcess):
+    operation = operator.sub
+
+
+class Multiply(MathProcess):
+    operation = operator.mul
+
+
+class Divide(MathProcess):
+    operation = operator.truediv
+
+
+class Power(MathProcess):
+    operation = operator.pow
+    argument_names = ("base", "p")
+
+
+class ElementwiseFunction(ArrayFunction):
+    """
+    A math process computed for each value of "x" separately; its other
+    arguments are numbers. Applied to a vector cube, it is computed on whole
+    property columns. The result is null if any argument is null.
+    """
+
+    argument_names = ("x",)
+    defaults: Mapping[str, Any] = MappingProxyType({})
+
+    def execute(self, query_params: Mapping, ctx: ServerContextT) -> Any:
+        arguments = {
+            name: query_params[name]
+            for name in self.argument_names
+            if name in query_params
+        }
+        x = arguments.get("x", query_params["input"])
+        if isinstance(x, VectorCube):
+            return x.with_operation(
+                ColumnFunction(
+                    lambda column: self.compute(dict(arguments, x=column)),
+                    x.get_time_dim_name(),
+                )
+            )
+        return self.compute(arguments)
+
+    def compute(self, arguments: Mapping) -> Any:
+        values = dict(self.defaults)
+        values.update(arguments)
+        if any(values.get(name) is None for name in self.argument_names):
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = self.evaluate(**values)
+        return result.item() if isinstance(result, np.generic) else result
+
+    @abstractmethod
+    def evaluate(self, x: Any, **arguments) -> Any:
+        pass
+
+
+class Absolute(ElementwiseFunction):
+    def evaluate(self, x: Any, **arguments) -> Any:
+        return np.absolute(x)
+
+
+class Sqrt(ElementwiseFunction):
+    def evaluate(self, x: Any, **arguments) -> Any:
+        return np.sqrt(x)
+
+
+class Ln(ElementwiseFunction):
+    def evaluate(self, x: Any, **arguments) -> Any:
+        return np.log(x)
+
+
+class Log(ElementwiseFunction):
+    argument_names = ("x", "base")
+
+    def evaluate(self, x: Any, **arguments) -> Any:
+        return np.log(x) / np.log(arguments["base"])
 
-        return current_result
 
+class Exp(ElementwiseFunction):
+    def evaluate(self, x: Any, **arguments) -> Any:
+        return np.exp(x)
 
-class Add(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT) -> Any:
-        return execute_math_function(query_params, ctx, operator.add)
 
+class LinearScaleRange(ElementwiseFunction):
+    argument_names = ("x", "inputMin", "inputMax", "outputMin", "outputMax")
+    defaults = MappingProxyType({"outputMin": 0, "outputMax": 1})
 
-class Multiply(Process):
-    def execute(self, query_params: dict, ctx: ServerContextT) -> VectorCube:
-        return execute_math_function(query_params, ctx, operator.mul)
+    def evaluate(self, x: Any, **arguments) -> Any:
+        input_min = arguments["inputMin"]
+        input_max = arguments["inputMax"]
+        output_min = arguments["outputMin"]
+        output_max = arguments["outputMax"]
+        x = np.clip(x, input_min, input_max)
+        return (x - input_min) / (input_max - input_min) * (
+            output_max - output_min
+        ) + output_min
+
+
+class Clip(ElementwiseFunction):
+    argument_names = ("x", "min", "max")
+
+    def evaluate(self, x: Any, **arguments) -> Any:
+        return np.clip(x, arguments["min"], arguments["max"])
 
 
 def execute_math_function(
-    query_params: dict, ctx: ServerContextT, op: Callable
+    query_params: Mapping,
+    ctx: ServerContextT,
+    op: Callable,
+    x_name: str = "x",
+    y_name: str = "y",
 ) -> VectorCube:
-    current_result = query_params["input"]
-    y = query_params["y"]
-    if isinstance(y, dict) and "process_graph" in y:
-        process = get_next_process(current_result, y)
-        result = basic_math_vc(current_result, submit_process_sync(process, ctx), op)
-    elif isinstance(y, dict) and "from_node" in y:
-        process = get_prev_process(current_result, y)
-        result = basic_math_vc(current_result, submit_process_sync(process, ctx), op)
+    """
+    Applies a binary operator to a vector cube and a number, or to two vector
+    cubes. The operator is applied to whole property columns, so it must
+    accept NumPy arrays; plain numbers are combined directly.
+    """
+    current_result = query_params.get(x_name, query_params["input"])
+    y = query_params[y_name]
+    if isinstance(y, Mapping) and "process_graph" in y:
+        process = get_callback(y, ctx, query_params.get("access_token"))
+        other = process({"x": current_result, "data": current_result})
+        result = basic_math_vc(current_result, other, op)
+    elif isinstance(y, VectorCube) and not isinstance(current_result, VectorCube):
+        # a number and the result of another node, such as subtract(10, cube)
+        result = basic_math(y, current_result, op, reverse=True)
+    elif isinstance(y, VectorCube):
+        # the result of another node, resolved by the executor
+        result = basic_math_vc(current_result, y, op)
+    elif not isinstance(current_result, VectorCube):
+        result = None if current_result is None or y is None else op(current_result, y)
     else:
         result = basic_math(current_result, y, op)
     return result
 
 
-def basic_math(vc: VectorCube, v: [int, float], operation: Callable):
-    result = StaticVectorCubeFactory().copy(vc, True).create()
-    features = result.load_features(limit=None, with_stac_info=False)
-    time_dim_name = result.get_time_dim_name()
-    for feature in features:
-        for prop in [
-            p
-            for p in feature["properties"]
-            if not p == "created_at"
-            and not p == "modified_at"
-            and not p == time_dim_name
-            and (
-                isinstance(feature["properties"][p], float)
-                or isinstance(feature["properties"][p], int)
-            )
-        ]:
-            feature["properties"][prop] = operation(v, feature["properties"][prop])
-    return result
+def basic_math(
+    vc: VectorCube, v: [int, float], operation: Callable, reverse: bool = False
+):
+    return vc.with_operation(
+        ElementwiseMath(operation, v, vc.get_time_dim_name(), reverse=reverse)
+    )
 
 
 def basic_math_vc(a: VectorCube, b: VectorCube, operation: Callable) -> VectorCube:
-    result = StaticVectorCubeFactory().copy(a, True).create()
-    features = result.load_features(limit=None, with_stac_info=False)
-    time_dim_name = result.get_time_dim_name()
-    for feature in features:
-        for prop in [
-            p
-            for p in feature["properties"]
-            if not p == "created_at"
-            and not p == "modified_at"
-            and not p == time_dim_name
-            and (
-                isinstance(feature["properties"][p], float)
-                or isinstance(feature["properties"][p], int)
-            )
-        ]:
-            feature_b = b.get_feature(feature["id"])
-            feature["properties"][prop] = operation(
-                feature["properties"][prop], feature_b["properties"][prop]
-            )
-    return result
-
-
-def get_next_process(current_result, y) -> Process:
-    sub_graph = y["process_graph"]
-    node = PGNode.from_flat_graph(sub_graph)
-    registry = get_processes_registry()
-    process = registry.get_process(node.process_id)
-    process_parameters = node.arguments
-    process_parameters["input"] = current_result
-    process.parameters = process_parameters
-    return process
-
-
-def get_prev_process(current_result, y) -> Process:
-    node = y["from_node"]
-    registry = get_processes_registry()
-    process = registry.get_process(node.process_id)
-    process_parameters = node.arguments
-    process_parameters["input"] = current_result
-    process.parameters = process_parameters
-    return process
+    return a.with_operation(CubeMath(b, operation, a.get_time_dim_name()))
@@ -0,0 +1,293 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import concurrent.futures
+import functools
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Iterable, List, Mapping, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..core.operations import ChunkedReducer
+from ..core.reductions import ReducerState
+from ..defaults import DEFAULT_MIN_PARTITION_ROWS
+
+# directory backed by memory, where partitions are shared with workers
+_SHARED_MEMORY_DIR = "/dev/shm"
+
+
+class PartitionedReducer:
+    """
+    Reduces groups of values in a pool of worker processes, so that large
+    reductions use several cores and do not hold the GIL of the server.
+
+    The values are written once, as float64 matrix together with the codes,
+    to memory-mapped files in shared memory, and each worker maps the files
+    and reduces a contiguous range of rows. If the state of the reducer is
+    bounded, such as the moments of mean and sd, the rows are split evenly,
+    each worker returns the state of its range, and the states are combined.
+    Otherwise, the values are sorted by group code first, each range holds
+    whole groups only, and the partial results are merged by concatenation.
+    Values with fewer rows than two partitions are reduced locally.
+
+    Values given in several chunks are reduced by reduce_chunks: with a
+    bounded state, each chunk is split among the workers and the states of
+    all chunks are combined. Otherwise, the values of all chunks are kept
+    in the state of the reducer, which spills to disk, and reduced locally.
+    """
+
+    def __init__(
+        self,
+        reducer_id: str,
+        pool: concurrent.futures.Executor,
+        partition_count: int,
+        min_partition_rows: int = DEFAULT_MIN_PARTITION_ROWS,
+    ):
+        self.reducer_id = reducer_id
+        self._pool = pool
+        self._partition_count = partition_count
+        self._min_partition_rows = min_partition_rows
+
+    def __call__(self, values: pd.DataFrame, codes: np.ndarray) -> pd.DataFrame:
+        reducer = _get_reducer(self.reducer_id)
+        partition_count = self._get_partition_count(values)
+        if partition_count < 2:
+            return reducer.reduce_grouped(values, codes)
+        if reducer.bounded_state:
+            result = reducer.finalize(
+                self._create_state(reducer, values, codes, partition_count)
+            )
+            result.columns = values.columns
+            return result
+        codes = np.asarray(codes, dtype=np.int64)
+        # the values and codes themselves stay in their original order for
+        # the local fallback
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        matrix = values.to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        try:
+            parts = self._reduce_partitions(
+                matrix,
+                sorted_codes,
+                get_partitions(sorted_codes, partition_count),
+                as_state=False,
+            )
+        except BrokenProcessPool:
+            # a worker has died; the next reduction gets a new pool
+            _reset_worker_pool(self._pool)
+            return reducer.reduce_grouped(values, codes)
+        result = pd.concat(parts)
+        result.columns = values.columns
+        return result
+
+    def reduce_chunks(
+        self, chunks: Iterable[Tuple[pd.DataFrame, np.ndarray]]
+    ) -> pd.DataFrame:
+        """
+        Reduces the groups of values given in chunks of rows, like
+        Reducer.reduce_chunks. A single chunk is reduced like values given
+        at once.
+        :param chunks: pairs of values and group codes
+        :return: the results of each column, indexed by group code
+        """
+        reducer = _get_reducer(self.reducer_id)
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return pd.DataFrame()
+        second = next(chunks, None)
+        if second is None:
+            return self(*first)
+        chunks = itertools.chain([first, second], chunks)
+        if not reducer.bounded_state:
+            return reducer.reduce_chunks(chunks)
+        state = None
+        for values, codes in chunks:
+            chunk_state = self._create_state(
+                reducer, values, codes, self._get_partition_count(values)
+            )
+            state = chunk_state if state is None else state.combine(chunk_state)
+        result = reducer.finalize(state)
+        result.columns = first[0].columns
+        return result
+
+    def _get_partition_count(self, values: pd.DataFrame) -> int:
+        if len(values.columns) == 0:
+            return 0
+        return min(
+            self._partition_count, len(values) // max(self._min_partition_rows, 1)
+        )
+
+    def _create_state(
+        self,
+        reducer: Any,
+        values: pd.DataFrame,
+        codes: np.ndarray,
+        partition_count: int,
+    ) -> ReducerState:
+        """
+        Returns the state of a bounded reducer, splitting the rows evenly
+        among the workers.
+        """
+        if partition_count < 2:
+            return reducer.create_state(values, codes)
+        codes = np.asarray(codes, dtype=np.int64)
+        bounds = np.linspace(0, len(codes), partition_count + 1).astype(int)
+        try:
+            states = self._reduce_partitions(
+                values.to_numpy(dtype=np.float64, na_value=np.nan),
+                codes,
+                list(zip(bounds[:-1], bounds[1:])),
+                as_state=True,
+            )
+        except BrokenProcessPool:
+            _reset_worker_pool(self._pool)
+            return reducer.create_state(values, codes)
+        return functools.reduce(lambda a, b: a.combine(b), states)
+
+    def _reduce_partitions(
+        self,
+        matrix: np.ndarray,
+        codes: np.ndarray,
+        partitions: List[Tuple[int, int]],
+        as_state: bool,
+    ) -> List[Union[pd.DataFrame, ReducerState]]:
+        directory = tempfile.mkdtemp(
+            prefix="partitions-",
+            dir=_SHARED_MEMORY_DIR if os.path.isdir(_SHARED_MEMORY_DIR) else None,
+        )
+        try:
+            values_path = os.path.join(directory, "values.npy")
+            codes_path = os.path.join(directory, "codes.npy")
+            np.save(values_path, matrix)
+            np.save(codes_path, codes)
+            futures = [
+                self._pool.submit(
+                    reduce_partition,
+                    self.reducer_id,
+                    values_path,
+                    codes_path,
+                    start,
+                    stop,
+                    as_state,
+                )
+                for start, stop in partitions
+            ]
+            return [future.result() for future in futures]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def get_partitions(sorted_codes: np.ndarray, count: int) -> List[Tuple[int, int]]:
+    """
+    Splits sorted group codes into at most count contiguous ranges of about
+    equal length, without splitting groups.
+    :return: the start and stop index of each range
+    """
+    row_count = len(sorted_codes)
+    bounds = [0]
+    for i in range(1, count):
+        # move the bound back to the first row of the group it falls into
+        bound = int(
+            np.searchsorted(
+                sorted_codes, sorted_codes[i * row_count // count], side="left"
+            )
+        )
+        if bound > bounds[-1]:
+            bounds.append(bound)
+    bounds.append(row_count)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def reduce_partition(
+    reducer_id: str,
+    values_path: str,
+    codes_path: str,
+    start: int,
+    stop: int,
+    as_state: bool = False,
+) -> Union[pd.DataFrame, ReducerState]:
+    """
+    Reduces a range of rows within a worker process.
+    :param as_state: whether to return the mergeable state of the range
+        rather than its results
+    """
+    values = pd.DataFrame(np.array(np.load(values_path, mmap_mode="r")[start:stop]))
+    codes = np.array(np.load(codes_path, mmap_mode="r")[start:stop])
+    reducer = _get_reducer(reducer_id)
+    if as_state:
+        return reducer.create_state(values, codes)
+    return reducer.reduce_grouped(values, codes)
+
+
+def get_chunked_reducer(reducer: Any, config: Mapping[str, Any]) -> ChunkedReducer:
+    """
+    Returns the chunked reducer of a reducer process, which runs in the
+    worker pool if worker_pool_size is configured.
+    :param reducer: the reducer process
+    :param config: the configuration of the geodb_openeo API
+    """
+    pool_size = config.get("worker_pool_size", 0)
+    if pool_size < 1:
+        return reducer.reduce_chunks
+    return PartitionedReducer(
+        reducer.metadata["id"],
+        get_worker_pool(pool_size),
+        pool_size,
+        config.get("min_partition_rows", DEFAULT_MIN_PARTITION_ROWS),
+    ).reduce_chunks
+
+
+_WORKER_POOL_SINGLETON = None
+_WORKER_POOL_LOCK = threading.Lock()
+
+
+def get_worker_pool(max_workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """Return the process pool singleton shared by all process graphs."""
+    global _WORKER_POOL_SINGLETON
+    if _WORKER_POOL_SINGLETON is None:
+        with _WORKER_POOL_LOCK:
+            if _WORKER_POOL_SINGLETON is None:
+                # workers must not inherit the threads of the server
+                _WORKER_POOL_SINGLETON = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _WORKER_POOL_SINGLETON
+
+
+def _reset_worker_pool(pool: concurrent.futures.Executor):
+    global _WORKER_POOL_SINGLETON
+    with _WORKER_POOL_LOCK:
+        if _WORKER_POOL_SINGLETON is pool:
+            _WORKER_POOL_SINGLETON = None
+
+
+def _get_reducer(reducer_id: str):
+    from .processes import get_processes_registry
+
+    return get_processes_registry().get_process(reducer_id)
@@ -19,11 +19,12 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 import abc
-from datetime import datetime
+import datetime
 from functools import cached_property
-from typing import List, Any, Optional, Tuple, Dict
+from typing import List, Any, Callable, Optional, Sequence, Tuple, Dict
 
-import dateutil.parser
+import numpy as np
+import pandas as pd
 import shapely
 import shapely.wkt
 from geojson.feature import Feature
@@ -33,7 +34,47 @@ from xcube.constants import LOG
 from xcube_geodb.core.geodb import GeoDBClient
 from xcube_geodb.core.metadata import MetadataManager
 
+from .operations import NON_NUMERIC_PROPERTIES
+from .operations import build_aggregated_features
+from .operations import get_empty_group_value
+from .operations import numeric_properties
+from .tools import CountCache
+from .tools import VersionCache
+from .tools import parse_datetimes
 from ..defaults import STAC_VERSION, STAC_EXTENSIONS, STAC_DEFAULT_ITEMS_LIMIT
+from ..defaults import (
+    COUNT_STRATEGIES,
+    DEFAULT_COUNT_STRATEGY,
+    DEFAULT_EXACT_COUNT_THRESHOLD,
+)
+
+# the start and end of a time range, either of which may be open
+TimeRange = Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]
+
+# SQL aggregate functions of the reducers that temporal aggregations can be
+# pushed down for
+SQL_AGGREGATES = {
+    "mean": "avg({})",
+    "median": "percentile_cont(0.5) WITHIN GROUP (ORDER BY {})",
+    "sd": "stddev_pop({})",
+    "min": "min({})",
+    "max": "max({})",
+    "count": "count({})",
+}
+
+# a condition features must meet to be loaded: the name of a property, the id
+# of a comparison process, and the value the property is compared with
+PropertyCondition = Tuple[str, str, Any]
+
+# SQL operators of the comparison processes property conditions may use
+SQL_COMPARISONS = {
+    "eq": "=",
+    "neq": "<>",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+}
 
 
 class DataSource(abc.ABC):
@@ -54,7 +95,7 @@ class DataSource(abc.ABC):
     @abc.abstractmethod
     def get_time_dim(
         self, bbox: Optional[Tuple[float, float, float, float]] = None
-    ) -> Optional[List[datetime]]:
+    ) -> Optional[pd.DatetimeIndex]:
         pass
 
     @abc.abstractmethod
@@ -89,11 +130,145 @@ class DataSource(abc.ABC):
     def get_metadata(self, full: bool = False) -> Dict:
         pass
 
+    def has_time_dim(self) -> bool:
+        return self.get_time_dim_name() is not None
+
+    def has_vertical_dim(self) -> bool:
+        vertical_dim = self.get_vertical_dim()
+        return vertical_dim is not None and len(vertical_dim) > 0
+
+    def get_time_dim_extent(self) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        time_dim = self.get_time_dim()
+        if time_dim is None or len(time_dim) == 0:
+            return None
+        return time_dim.min(), time_dim.max()
+
+    def get_vertical_dim_extent(self) -> Optional[Tuple[Any, Any]]:
+        vertical_dim = self.get_vertical_dim()
+        if vertical_dim is None or len(vertical_dim) == 0:
+            return None
+        return min(vertical_dim), max(vertical_dim)
+
+    def get_last_modified(self) -> Optional[str]:
+        """
+        Returns the time the data have last been modified, or None if unknown.
+        """
+        return None
+
+    def get_version(self) -> Optional[str]:
+        """
+        Returns a version of the data, which changes whenever features are
+        inserted, modified or deleted, or None if unknown.
+        """
+        return None
+
+    def load_computed_features(
+        self,
+        column_expressions: Sequence[Callable[[str], str]],
+        limit: Optional[int] = STAC_DEFAULT_ITEMS_LIMIT,
+        offset: int = 0,
+        with_stac_info: bool = True,
+    ) -> Optional[List[Feature]]:
+        """
+        Loads features whose numeric properties are computed by the
+        datasource, as done by a sequence of columnar operations.
+        :param column_expressions: functions that return an SQL expression
+            of the new value of a numeric property, given an SQL expression
+            of its current value; they are applied one after another
+        :return: the features, or None if the datasource cannot compute them
+        """
+        return None
+
+    def aggregate_temporal(
+        self,
+        reducer_id: str,
+        intervals: Sequence[Tuple[datetime.datetime, datetime.datetime]],
+        labels: Sequence[Any],
+    ) -> Optional[List[Feature]]:
+        """
+        Aggregates the numeric properties of all features sharing a geometry
+        within each of the intervals, as done by the TemporalAggregation
+        operation, without loading the features first.
+        :param reducer_id: the id of the reducer, such as "mean"
+        :param intervals: the intervals, as [start, end) tuples
+        :param labels: the time of the resulting features of each interval
+        :return: the aggregated features, or None if the datasource does
+            not support the reducer
+        """
+        return None
+
+    def get_property_statistics(self, bins: int = 10) -> Dict[str, Dict]:
+        """
+        Computes minimum, maximum and a histogram of each numeric property.
+        :param bins: the number of histogram bins
+        :return: a dict mapping property names to dicts with the keys
+            "min", "max", and "histogram", which holds the bin "edges" and the
+            "counts" per bin
+        """
+        features = self.load_features(limit=None, with_stac_info=False)
+        values = {}
+        for feature in features:
+            props = feature["properties"]
+            for prop in numeric_properties(props, self.get_time_dim_name()):
+                values.setdefault(prop, []).append(props[prop])
+        statistics = {}
+        for prop, prop_values in values.items():
+            counts, edges = np.histogram(prop_values, bins=bins)
+            statistics[prop] = {
+                "min": min(prop_values),
+                "max": max(prop_values),
+                "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+            }
+        return statistics
+
 
 class GeoDBVectorSource(DataSource):
-    def __init__(self, collection_id: Tuple[str, str], geodb: GeoDBClient):
+    def __init__(
+        self,
+        collection_id: Tuple[str, str],
+        geodb: GeoDBClient,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        time_range: Optional[TimeRange] = None,
+        properties: Optional[Sequence[str]] = None,
+        conditions: Optional[Sequence[PropertyCondition]] = None,
+        count_strategy: str = DEFAULT_COUNT_STRATEGY,
+        exact_count_threshold: int = DEFAULT_EXACT_COUNT_THRESHOLD,
+        count_cache: Optional[CountCache] = None,
+        version_cache: Optional[VersionCache] = None,
+    ):
+        """
+        :param collection_id: the (database, name) tuple of the collection
+        :param geodb: the geoDB client
+        :param bbox: if given, only features intersecting the bbox, given in
+            the CRS of the collection, are loaded and counted
+        :param time_range: if given, only features whose time lies within
+            [start, end) are loaded and counted; either bound may be None
+        :param properties: if given, only these properties are loaded, in
+            addition to the id, the geometry and the time dimension
+        :param conditions: if given, only features meeting all conditions
+            are loaded and counted
+        :param count_strategy: how to count the features of unfiltered
+            collections: 'exact' always counts all rows, 'estimate' uses the
+            estimate of the query planner, and 'cached' uses exact counts
+            that are refreshed in the background
+        :param exact_count_threshold: estimates lower than this are replaced
+            by exact counts
+        :param count_cache: the cache used by the 'cached' strategy
+        :param version_cache: if given, caches the version of the collection
+            for a short while; otherwise, it is fetched whenever asked for
+        """
+        if count_strategy not in COUNT_STRATEGIES:
+            raise ValueError(f"Unknown count strategy: {count_strategy}")
         self.collection_id = collection_id
         self._geodb = geodb
+        self._bbox = bbox
+        self._time_range = time_range
+        self._properties = properties
+        self._conditions = conditions
+        self._count_strategy = count_strategy
+        self._exact_count_threshold = exact_count_threshold
+        self._count_cache = count_cache
+        self._version_cache = version_cache
 
     @cached_property
     def collection_info(self):
@@ -101,12 +276,92 @@ class GeoDBVectorSource(DataSource):
         return self._geodb.get_collection_info(name, db)
 
     def get_feature_count(self) -> int:
+        if self._get_where():
+            return self._count_filtered()
+        if self._count_strategy == "exact":
+            return self._count_exact()
+        if self._count_strategy == "cached" and self._count_cache:
+            return self._count_cache.get(
+                self.collection_id, self._count_exact, self._count_estimated
+            )
+        return self._count_estimated()
+
+    def _count_exact(self) -> int:
         (db, name) = self.collection_id
         LOG.debug("Retrieving count from geoDB...")
         count = self._geodb.count_collection_rows(name, database=db, exact_count=True)
         LOG.debug("...done.")
         return count
 
+    def _count_estimated(self) -> int:
+        (db, name) = self.collection_id
+        count = self._geodb.count_collection_rows(name, database=db, exact_count=False)
+        # the planner estimate is -1 or 0 for tables that have not been
+        # analysed yet; small tables are cheap to count anyway
+        if count < self._exact_count_threshold:
+            return self._count_exact()
+        return count
+
+    def _count_filtered(self) -> int:
+        (db, name) = self.collection_id
+        LOG.debug("Retrieving filtered count from geoDB...")
+        df = self._geodb.get_collection_pg(
+            name, select="count(*) as count", where=self._get_where(), database=db
+        )
+        LOG.debug("...done.")
+        return int(df["count"].iloc[0])
+
+    def _get_where(self) -> Optional[str]:
+        conditions = []
+        if self._bbox:
+            conditions.append(self._get_bbox_where(self._bbox))
+        if self._time_range and self.get_time_dim_name():
+            conditions += self._get_time_conditions(self._time_range)
+        for condition in self._conditions or ():
+            conditions.append(self._get_property_condition(*condition))
+        return " AND ".join(conditions) if conditions else None
+
+    def _get_time_conditions(self, time_range: TimeRange) -> List[str]:
+        time_dim_name = self.get_time_dim_name()
+        start, end = time_range
+        conditions = []
+        if start is not None:
+            conditions.append(f"{time_dim_name} >= '{start.isoformat()}'")
+        if end is not None:
+            conditions.append(f"{time_dim_name} < '{end.isoformat()}'")
+        return conditions
+
+    def _get_property_condition(self, name: str, process_id: str, value: Any) -> str:
+        self._ensure_property(name)
+        if value is None and process_id in ("eq", "neq"):
+            return f"{name} IS {'NOT ' if process_id == 'neq' else ''}NULL"
+        return f"{name} {SQL_COMPARISONS[process_id]} {_to_sql_literal(value)}"
+
+    def _get_columns(self) -> List[str]:
+        """
+        Returns the names of the columns to load: all columns of the
+        collection, or the selected properties together with the id, the
+        geometry and the time dimension.
+        """
+        columns = list(self.collection_info["properties"])
+        if self._properties is None:
+            return columns
+        for name in self._properties:
+            self._ensure_property(name)
+        required = ("id", "geometry", self.get_time_dim_name())
+        return [c for c in columns if c in required or c in self._properties]
+
+    def _get_select(self) -> str:
+        if self._properties is None:
+            return "*"
+        return ", ".join(self._get_columns())
+
+    def _ensure_property(self, name: str):
+        if name not in self.collection_info["properties"]:
+            raise ValueError(
+                f"Unknown property of collection {self.collection_id[1]}: {name}"
+            )
+
     def get_srid(self) -> int:
         (db, name) = self.collection_id
         return int(self._geodb.get_collection_srid(name, db))
@@ -131,17 +386,59 @@ class GeoDBVectorSource(DataSource):
         (db, name) = self.collection_id
         if feature_id:
             gdf = self._geodb.get_collection_pg(
-                name, where=f"id = {feature_id}", database=db
+                name, select=self._get_select(), where=f"id = {feature_id}", database=db
             )
         else:
             gdf = self._geodb.get_collection_pg(
-                name, limit=limit, offset=offset, database=db
+                name,
+                select=self._get_select(),
+                where=self._get_where(),
+                order="id",
+                limit=limit,
+                offset=offset,
+                database=db,
             )
+        features = self._to_features(gdf, with_stac_info)
+        LOG.debug("...done.")
+        return features
 
+    def load_computed_features(
+        self,
+        column_expressions: Sequence[Callable[[str], str]],
+        limit: Optional[int] = STAC_DEFAULT_ITEMS_LIMIT,
+        offset: int = 0,
+        with_stac_info: bool = True,
+    ) -> Optional[List[Feature]]:
+        numeric_columns, _ = self._get_property_columns(self.get_time_dim_name())
+        select = []
+        for column in self._get_columns():
+            if column in numeric_columns:
+                expression = column
+                for column_expression in column_expressions:
+                    expression = column_expression(expression)
+                select.append(f"{expression} AS {column}")
+            else:
+                select.append(column)
+        LOG.debug(f"Loading computed features of {self.collection_id} from geoDB...")
+        (db, name) = self.collection_id
+        gdf = self._geodb.get_collection_pg(
+            name,
+            select=", ".join(select),
+            where=self._get_where(),
+            order="id",
+            limit=limit,
+            offset=offset,
+            database=db,
+        )
+        features = self._to_features(gdf, with_stac_info)
+        LOG.debug("...done.")
+        return features
+
+    @staticmethod
+    def _to_features(gdf, with_stac_info: bool) -> List[Feature]:
         features = []
 
         for i, row in enumerate(gdf.iterrows()):
-            bbox = gdf.bounds.iloc[i]
             props = dict(row[1])
             geometry = props["geometry"]
             feature_id = str(props["id"])
@@ -151,6 +448,7 @@ class GeoDBVectorSource(DataSource):
             feature = Feature(id=feature_id, geometry=geometry, properties=props)
 
             if with_stac_info:
+                bbox = gdf.bounds.iloc[i]
                 feature["bbox"] = [
                     bbox["minx"],
                     bbox["miny"],
@@ -162,7 +460,6 @@ class GeoDBVectorSource(DataSource):
                 feature["type"] = "Feature"
 
             features.append(feature)
-        LOG.debug("...done.")
         return features
 
     def get_vector_dim(
@@ -184,17 +481,11 @@ class GeoDBVectorSource(DataSource):
 
     def get_time_dim(
         self, bbox: Optional[Tuple[float, float, float, float]] = None
-    ) -> Optional[List[datetime]]:
-        select = self._get_col_name(["date", "time", "timestamp", "datetime"])
+    ) -> Optional[pd.DatetimeIndex]:
+        select = self.get_time_dim_name()
         if not select:
             return None
-        if bbox:
-            gdf = self._fetch_from_geodb(select, bbox)
-        else:
-            (db, name) = self.collection_id
-            gdf = self._geodb.get_collection_pg(name, select=select, database=db)
-
-        return [dateutil.parser.parse(d) for d in gdf[select]]
+        return parse_datetimes(self._fetch_distinct(select, bbox))
 
     def get_time_dim_name(self) -> Optional[str]:
         return self._get_col_name(["date", "time", "timestamp", "datetime"])
@@ -202,16 +493,59 @@ class GeoDBVectorSource(DataSource):
     def get_vertical_dim(
         self, bbox: Optional[Tuple[float, float, float, float]] = None
     ) -> Optional[List[Any]]:
-        select = self._get_col_name(["z", "vertical"])
+        select = self._get_vertical_dim_name()
+        if not select:
+            return None
+        return self._fetch_distinct(select, bbox)
+
+    def has_time_dim(self) -> bool:
+        return self.get_time_dim_name() is not None
+
+    def has_vertical_dim(self) -> bool:
+        select = self._get_vertical_dim_name()
         if not select:
+            return False
+        (db, name) = self.collection_id
+        df = self._geodb.get_collection_pg(
+            name, select=select, where=f"{select} IS NOT NULL", limit=1, database=db
+        )
+        return len(df) > 0
+
+    def get_time_dim_extent(self) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        extent = self._fetch_extent(self.get_time_dim_name())
+        if not extent:
             return None
+        times = parse_datetimes(extent)
+        return times[0], times[1]
+
+    def get_vertical_dim_extent(self) -> Optional[Tuple[Any, Any]]:
+        return self._fetch_extent(self._get_vertical_dim_name())
+
+    def _get_vertical_dim_name(self) -> Optional[str]:
+        return self._get_col_name(["z", "vertical"])
+
+    def _fetch_distinct(
+        self, select: str, bbox: Optional[Tuple[float, float, float, float]]
+    ) -> Series:
         if bbox:
-            gdf = self._fetch_from_geodb(select, bbox)
+            df = self._fetch_from_geodb(select, bbox)
         else:
             (db, name) = self.collection_id
-            gdf = self._geodb.get_collection_pg(name, select=select, database=db)
+            df = self._geodb.get_collection_pg(
+                name, select=select, group=select, database=db
+            )
+        return df[select]
 
-        return gdf[select]
+    def _fetch_extent(self, column: Optional[str]) -> Optional[Tuple[Any, Any]]:
+        if not column:
+            return None
+        (db, name) = self.collection_id
+        df = self._geodb.get_collection_pg(
+            name, select=f"min({column}) as min, max({column}) as max", database=db
+        )
+        if len(df) == 0 or pd.isna(df["min"].iloc[0]):
+            return None
+        return df["min"].iloc[0], df["max"].iloc[0]
 
     def get_vector_cube_bbox(self) -> Tuple[float, float, float, float]:
         (db, name) = self.collection_id
@@ -260,6 +594,233 @@ class GeoDBVectorSource(DataSource):
         }
         return metadata
 
+    def get_last_modified(self) -> Optional[str]:
+        if "modified_at" not in self.collection_info["properties"]:
+            return None
+        extent = self._fetch_extent("modified_at")
+        return str(extent[1]) if extent else None
+
+    def get_version(self) -> Optional[str]:
+        if self._version_cache:
+            return self._version_cache.get(self.collection_id, self._fetch_version)
+        return self._fetch_version()
+
+    def _fetch_version(self) -> Optional[str]:
+        properties = self.collection_info["properties"]
+        if "created_at" not in properties or "modified_at" not in properties:
+            return None
+        (db, name) = self.collection_id
+        df = self._geodb.get_collection_pg(
+            name,
+            select="max(created_at) as created, max(modified_at) as modified,"
+            " count(*) as count",
+            database=db,
+        )
+        created, modified, count = (
+            df[c].iloc[0] for c in ("created", "modified", "count")
+        )
+        return f"{created}/{modified}/{count}"
+
+    def aggregate_temporal(
+        self,
+        reducer_id: str,
+        intervals: Sequence[Tuple[datetime.datetime, datetime.datetime]],
+        labels: Sequence[Any],
+    ) -> Optional[List[Feature]]:
+        time_dim_name = self.get_time_dim_name()
+        if reducer_id not in SQL_AGGREGATES or not time_dim_name:
+            return None
+        LOG.debug(f"Aggregating {self.collection_id} temporally in geoDB...")
+        numeric_columns, other_columns = self._get_property_columns(time_dim_name)
+        summaries = self._fetch_geometry_summaries(numeric_columns, other_columns)
+        geometries = list(summaries["geometry"])
+        codes = {geometry.wkt: code for code, geometry in enumerate(geometries)}
+        interval_count = len(intervals)
+        reduced = np.full(
+            (len(geometries) * interval_count, len(numeric_columns)), np.nan
+        )
+        order = sorted(range(interval_count), key=lambda i: intervals[i][0])
+        disjoint = all(
+            intervals[i][1] <= intervals[j][0] for i, j in zip(order, order[1:])
+        )
+        # disjoint intervals are aggregated in a single query; a row may
+        # belong to several overlapping intervals, though
+        batches = [order] if disjoint else [[i] for i in order]
+        for batch in batches:
+            df = self._fetch_aggregates(
+                SQL_AGGREGATES[reducer_id],
+                time_dim_name,
+                {i: intervals[i] for i in batch},
+                numeric_columns,
+            )
+            groups = [
+                codes[geometry.wkt] * interval_count + int(interval_index)
+                for geometry, interval_index in zip(
+                    df["geometry"], df["interval_index"]
+                )
+            ]
+            reduced[groups] = df[numeric_columns].to_numpy(dtype=np.float64)
+
+        present = summaries[
+            [f"present_{i}" for i in range(len(numeric_columns))]
+        ].to_numpy(dtype=bool)
+        # numeric properties without values are null, like the other
+        # properties the last feature has no value for
+        last_properties = [
+            dict(
+                {c: None for c in numeric_columns},
+                **{c: None if _is_null(row[c]) else row[c] for c in other_columns},
+            )
+            for _, row in summaries.iterrows()
+        ]
+        features = build_aggregated_features(
+            geometries,
+            numeric_columns,
+            reduced,
+            present,
+            last_properties,
+            time_dim_name,
+            labels,
+            get_empty_group_value(reducer_id),
+        )
+        LOG.debug("...done.")
+        return features
+
+    def _get_property_columns(
+        self, time_dim_name: Optional[str]
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Returns the names of the numeric property columns and of the other
+        property columns of the collection that are loaded, leaving out the
+        bookkeeping columns, the geometry and the time dimension.
+        """
+        numeric_columns = []
+        other_columns = []
+        columns = self._get_columns()
+        for c, info in self.collection_info["properties"].items():
+            if c in ("id", "geometry", time_dim_name, "created_at"):
+                continue
+            if c not in columns:
+                continue
+            if c not in NON_NUMERIC_PROPERTIES and info.get("type") in (
+                "integer",
+                "number",
+            ):
+                numeric_columns.append(c)
+            else:
+                other_columns.append(c)
+        return numeric_columns, other_columns
+
+    def _fetch_geometry_summaries(
+        self, numeric_columns: List[str], other_columns: List[str]
+    ) -> pd.DataFrame:
+        """
+        Fetches, for each distinct geometry of the features loaded, whether
+        its features have values of each numeric property, and the other
+        properties of its last feature, in the order the features are loaded
+        in. Geometries are ordered by their first feature.
+        """
+        select = ["geometry", "min(id) AS first_id"]
+        select += [
+            f"count({c}) > 0 AS present_{i}" for i, c in enumerate(numeric_columns)
+        ]
+        select += [
+            f"(array_agg({c} ORDER BY id DESC))[1] AS {c}" for c in other_columns
+        ]
+        (db, name) = self.collection_id
+        return self._geodb.get_collection_pg(
+            name,
+            select=", ".join(select),
+            where=self._get_where(),
+            group="geometry",
+            order="first_id",
+            database=db,
+        )
+
+    def _fetch_aggregates(
+        self,
+        aggregate: str,
+        time_dim_name: str,
+        intervals: Dict[int, Tuple[datetime.datetime, datetime.datetime]],
+        numeric_columns: List[str],
+    ) -> pd.DataFrame:
+        conditions = {
+            i: f"{time_dim_name} >= '{start.isoformat()}'"
+            f" AND {time_dim_name} < '{end.isoformat()}'"
+            for i, (start, end) in intervals.items()
+        }
+        interval_index = " ".join(f"WHEN {c} THEN {i}" for i, c in conditions.items())
+        select = ["geometry", f"CASE {interval_index} END AS interval_index"]
+        select += [f"{aggregate.format(c)} AS {c}" for c in numeric_columns]
+        where = " OR ".join(f"({c})" for c in conditions.values())
+        if self._get_where():
+            where = f"({where}) AND {self._get_where()}"
+        (db, name) = self.collection_id
+        return self._geodb.get_collection_pg(
+            name,
+            select=", ".join(select),
+            where=where,
+            group="geometry, interval_index",
+            database=db,
+        )
+
+    def get_property_statistics(self, bins: int = 10) -> Dict[str, Dict]:
+        columns = [
+            c
+            for c, info in self.collection_info["properties"].items()
+            if info.get("type") in ("integer", "number")
+            and c not in ("id", "created_at", "modified_at")
+        ]
+        if not columns:
+            return {}
+        LOG.debug(f"Computing statistics of {self.collection_id} in geoDB...")
+        (db, name) = self.collection_id
+        select = ", ".join(
+            [f"min({c}) as {c}_min, max({c}) as {c}_max" for c in columns]
+        )
+        extrema = self._geodb.get_collection_pg(name, select=select, database=db)
+        statistics = {}
+        for c in columns:
+            c_min = extrema[f"{c}_min"].iloc[0]
+            c_max = extrema[f"{c}_max"].iloc[0]
+            if pd.isna(c_min):
+                continue
+            statistics[c] = {
+                "min": c_min.item() if hasattr(c_min, "item") else c_min,
+                "max": c_max.item() if hasattr(c_max, "item") else c_max,
+                "histogram": self._fetch_histogram(c, c_min, c_max, bins),
+            }
+        LOG.debug("...done.")
+        return statistics
+
+    def _fetch_histogram(self, column: str, c_min: Any, c_max: Any, bins: int):
+        edges = np.linspace(float(c_min), float(c_max), bins + 1)
+        counts = np.zeros(bins, dtype=int)
+        (db, name) = self.collection_id
+        if c_min == c_max:
+            # all values fall into the first bin; the feature count would
+            # include nulls, and may be an estimate
+            df = self._geodb.get_collection_pg(
+                name,
+                select="count(*) as count",
+                where=f"{column} IS NOT NULL",
+                database=db,
+            )
+            counts[0] = int(df["count"].iloc[0])
+        else:
+            df = self._geodb.get_collection_pg(
+                name,
+                select=f"width_bucket({column}, {c_min}, {c_max}, {bins}) as bucket, "
+                f"count(*) as count",
+                where=f"{column} IS NOT NULL",
+                group="bucket",
+                database=db,
+            )
+            # width_bucket puts the maximum into an extra bucket
+            buckets = np.clip(df["bucket"].to_numpy(dtype=int), 1, bins) - 1
+            np.add.at(counts, buckets, df["count"].to_numpy(dtype=int))
+        return {"edges": edges.tolist(), "counts": counts.tolist()}
+
     def _transform_bbox(
         self,
         collection_id: Tuple[str, str],
@@ -287,24 +848,43 @@ class GeoDBVectorSource(DataSource):
         return None
 
     def _fetch_from_geodb(self, select: str, bbox: Tuple[float, float, float, float]):
+        (db, name) = self.collection_id
+        where = self._get_bbox_where(bbox)
+        return self._geodb.get_collection_pg(
+            name, select=select, where=where, group=select, database=db
+        )
+
+    def _get_bbox_where(self, bbox: Tuple[float, float, float, float]) -> str:
         (db, name) = self.collection_id
         srid = self._geodb.get_collection_srid(name, database=db)
-        where = (
+        return (
             f"ST_Intersects(geometry, ST_GeomFromText('POLYGON(("
-            f"{bbox[0]},{bbox[1]},"
-            f"{bbox[0]},{bbox[3]},"
-            f"{bbox[2]},{bbox[3]},"
-            f"{bbox[2]},{bbox[1]},"
-            f"{bbox[0]},{bbox[1]},"
+            f"{bbox[0]} {bbox[1]},"
+            f"{bbox[0]} {bbox[3]},"
+            f"{bbox[2]} {bbox[3]},"
+            f"{bbox[2]} {bbox[1]},"
+            f"{bbox[0]} {bbox[1]}"
             f"))',"
             f"{srid}))"
         )
-        return self._geodb.get_collection_pg(
-            name, select=select, where=where, group=select, database=db
-        )
 
     @staticmethod
     def _get_coords(feature: Series) -> Dict:
         geometry = feature["geometry"]
         feature_wkt = shapely.wkt.loads(geometry.wkt)
         return shapely.geometry.mapping(feature_wkt)
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _to_sql_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)) and np.isfinite(value):
+        return repr(value)
+    if isinstance(value, str):
+        escaped = value.replace("'", "''")
+        return f"'{escaped}'"
+    raise ValueError(f"Cannot compare properties with value {value!r}")
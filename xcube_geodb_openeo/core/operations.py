@@ -0,0 +1,937 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import abc
+import copy
+import datetime
+import operator
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+import pandas as pd
+import pytz
+import shapely.wkt
+from geojson import Feature
+from shapely.geometry import shape
+from xcube.constants import LOG
+
+from .tools import parse_datetimes
+from ..defaults import DEFAULT_AGGREGATION_CHUNK_ROWS
+
+NON_NUMERIC_PROPERTIES = ("created_at", "modified_at")
+
+# SQL expressions of the operators that elementwise math can be pushed down
+# for, given the SQL expressions of both operands
+SQL_OPERATORS = {
+    operator.add: "({} + ({}))",
+    operator.sub: "({} - ({}))",
+    operator.mul: "({} * ({}))",
+    operator.truediv: "({} / ({}))",
+    operator.pow: "power({}, {})",
+}
+
+# Reduces each column of a frame for all groups at once, given the group code
+# of each row; returns a frame indexed by group code
+GroupedReducer = Callable[[pd.DataFrame, np.ndarray], pd.DataFrame]
+# Reduces like a GroupedReducer, given the values and group codes in chunks
+# of rows, which are pulled one after another
+ChunkedReducer = Callable[[Iterable[Tuple[pd.DataFrame, np.ndarray]]], pd.DataFrame]
+
+
+class Operation(abc.ABC):
+    """
+    A node of the lazy evaluation plan of a VectorCube.
+    Processes do not compute new cubes; they append operations to the plan of
+    their input cube. The plan is evaluated once the features are pulled.
+    """
+
+    # True if the operation yields exactly one feature for each input feature,
+    # in which case limit and offset can be applied before evaluating it
+    preserves_count = True
+
+    @abc.abstractmethod
+    def apply(self, features: List[Feature]) -> List[Feature]:
+        pass
+
+    def push_down(self, datasource: Any) -> Optional[List[Feature]]:
+        """
+        Lets the datasource compute the result of the operation applied to
+        all of its features, if it is able to.
+        :param datasource: the datasource of an unmodified vector cube
+        :return: the resulting features, or None if the datasource cannot
+            compute them
+        """
+        return None
+
+
+class FeatureOperation(Operation, abc.ABC):
+    """
+    An operation that looks at one feature at a time. Consecutive feature
+    operations are fused and applied in a single pass over the features.
+    """
+
+    @abc.abstractmethod
+    def apply_feature(self, feature: Feature) -> Optional[Feature]:
+        """
+        Applies the operation to a feature. The feature is a private copy and
+        may be modified in place.
+        :param feature: the feature
+        :return: the resulting feature, or None if the feature is dropped
+        """
+        pass
+
+    def apply(self, features: List[Feature]) -> List[Feature]:
+        return _apply_stage(features, [self])
+
+
+class Projection(FeatureOperation):
+    """Keeps only the given properties of each feature."""
+
+    def __init__(self, properties: Sequence[str]):
+        self.properties = list(properties)
+
+    def apply_feature(self, feature: Feature) -> Optional[Feature]:
+        props = feature["properties"]
+        feature["properties"] = {p: props[p] for p in self.properties if p in props}
+        return feature
+
+
+class Filter(FeatureOperation):
+    """Drops all features for which the predicate returns False."""
+
+    preserves_count = False
+
+    def __init__(self, predicate: Callable[[Feature], bool]):
+        self.predicate = predicate
+
+    def apply_feature(self, feature: Feature) -> Optional[Feature]:
+        return feature if self.predicate(feature) else None
+
+
+class TemporalFilter(Operation):
+    """
+    Drops all features whose time does not lie within [start, end); either
+    bound may be None. The times of all features are parsed in a single
+    vectorized pass, and the features are selected by a boolean mask.
+    """
+
+    preserves_count = False
+
+    def __init__(
+        self,
+        start: Optional[pd.Timestamp],
+        end: Optional[pd.Timestamp],
+        time_dim_name: str,
+    ):
+        self.start = start
+        self.end = end
+        self.time_dim_name = time_dim_name
+
+    def apply(self, features: List[Feature]) -> List[Feature]:
+        if not features:
+            return []
+        times = parse_datetimes(
+            f["properties"].get(self.time_dim_name) for f in features
+        )
+        mask = ~times.isna()
+        if self.start is not None:
+            mask &= times >= self.start
+        if self.end is not None:
+            mask &= times < self.end
+        result = []
+        for i in np.nonzero(mask)[0]:
+            feature = copy.copy(features[i])
+            feature["properties"] = dict(features[i]["properties"])
+            result.append(feature)
+        return result
+
+
+class ColumnarOperation(Operation, abc.ABC):
+    """
+    An operation on whole property columns. Consecutive columnar operations
+    share one columnar view of the features, which is written back to the
+    features only once.
+    """
+
+    @abc.abstractmethod
+    def apply_columns(self, columns: "PropertyColumns") -> None:
+        """
+        Applies the operation to the property columns of the features, in
+        place.
+        """
+        pass
+
+    def apply(self, features: List[Feature]) -> List[Feature]:
+        return _apply_columnar_stage(features, [self])
+
+    def column_expression(self, expression: str) -> Optional[str]:
+        """
+        Returns an SQL expression computing the new value of a numeric
+        property from an SQL expression of its current value, or None if the
+        operation cannot be expressed in SQL.
+        """
+        return None
+
+
+class ElementwiseMath(ColumnarOperation):
+    """
+    Applies a binary operator to each numeric property and a scalar, or to a
+    scalar and each numeric property if reverse is True.
+    The operator is applied to whole columns, so it must accept NumPy arrays,
+    like the functions of the operator module or NumPy ufuncs do. Results
+    that are not finite, such as quotients by zero, become null, since they
+    cannot be represented in GeoJSON.
+    """
+
+    def __init__(
+        self,
+        operation: Callable,
+        value: Any,
+        time_dim_name: Optional[str],
+        reverse: bool = False,
+    ):
+        self.operation = operation
+        self.value = value
+        self.time_dim_name = time_dim_name
+        self.reverse = reverse
+
+    def apply_columns(self, columns: "PropertyColumns") -> None:
+        for name in columns.numeric_names(self.time_dim_name):
+            column = columns[name]
+            if self.operation is operator.pow and column.dtype.kind in "iub":
+                # integers cannot be raised to negative integer powers
+                column = column.astype(np.float64)
+            operands = (self.value, column) if self.reverse else (column, self.value)
+            with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+                result = np.asarray(self.operation(*operands))
+            columns[name] = result
+            if result.dtype.kind == "f":
+                not_a_number = ~np.isfinite(result)
+                if not_a_number.any():
+                    columns.set_null(name, not_a_number)
+
+    def column_expression(self, expression: str) -> Optional[str]:
+        if (
+            self.operation not in SQL_OPERATORS
+            or not _is_number(self.value)
+            or not np.isfinite(self.value)
+        ):
+            return None
+        if self.operation is operator.truediv:
+            if self.value == 0 or self.reverse:
+                # SQL raises an error instead of returning infinity
+                return None
+            # SQL divides integers without remainder
+            expression = f"{expression}::float8"
+        if self.operation is operator.pow:
+            # SQL raises an error for results that are complex or infinite
+            if self.reverse and self.value <= 0:
+                return None
+            if not self.reverse and (self.value < 0 or self.value != int(self.value)):
+                return None
+        value = self.value.item() if isinstance(self.value, np.generic) else self.value
+        operands = (
+            (repr(value), expression) if self.reverse else (expression, repr(value))
+        )
+        return SQL_OPERATORS[self.operation].format(*operands)
+
+
+class ColumnFunction(ColumnarOperation):
+    """
+    Applies a function to each numeric property. The function is called once
+    per column with a NumPy array, in which missing values are NaN, and
+    returns an array of the same length, a scalar, or None.
+
+    Missing values stay null. Results that are not finite, such as the square
+    root of a negative number or the logarithm of zero, become null as well,
+    since they cannot be represented in GeoJSON.
+    """
+
+    def __init__(self, function: Callable, time_dim_name: Optional[str]):
+        self.function = function
+        self.time_dim_name = time_dim_name
+
+    def apply_columns(self, columns: "PropertyColumns") -> None:
+        for name in columns.numeric_names(self.time_dim_name):
+            column = columns[name]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = self.function(column)
+            if result is None:
+                columns.set_null(name, np.ones(len(column), dtype=bool))
+                continue
+            result = np.broadcast_to(result, column.shape)
+            columns[name] = result
+            if result.dtype.kind == "f":
+                not_a_number = ~np.isfinite(result)
+                if not_a_number.any():
+                    columns.set_null(name, not_a_number)
+
+
+class CubeMath(ColumnarOperation):
+    """
+    Applies a binary operator to each numeric property and the respective
+    property of the matching feature in another cube.
+
+    The cubes are aligned by a hash join on the feature ids, or on geometry
+    and time if the features have no ids. Properties that are not numeric in
+    the other cube are left unchanged. Features without a match are handled
+    according to on_mismatch: "null" sets their numeric properties to null,
+    "keep" leaves them unchanged, and "error" raises a ValueError.
+    """
+
+    def __init__(
+        self,
+        other: Any,
+        operation: Callable,
+        time_dim_name: Optional[str],
+        on_mismatch: str = "null",
+    ):
+        if on_mismatch not in MISMATCH_POLICIES:
+            raise ValueError(
+                f"Unknown mismatch policy '{on_mismatch}',"
+                f" must be one of {MISMATCH_POLICIES}."
+            )
+        self.other = other
+        self.operation = operation
+        self.time_dim_name = time_dim_name
+        self.on_mismatch = on_mismatch
+
+    def apply_columns(self, columns: "PropertyColumns") -> None:
+        other_columns = PropertyColumns(
+            self.other.load_features(limit=None, offset=0, with_stac_info=False)
+        )
+        indexer = align(
+            join_keys(columns.features, self.time_dim_name),
+            join_keys(other_columns.features, self.time_dim_name),
+        )
+        unmatched = indexer < 0
+        mismatch_count = int(unmatched.sum())
+        if mismatch_count:
+            message = (
+                f"{mismatch_count} of {len(columns)} features have no"
+                f" matching feature in cube {self.other.id}"
+            )
+            if self.on_mismatch == "error":
+                raise ValueError(message + ".")
+            LOG.warning(f"{message}; applying policy '{self.on_mismatch}'.")
+        other_names = other_columns.numeric_names(self.time_dim_name)
+        for name in columns.numeric_names(self.time_dim_name):
+            if name in other_names:
+                other_column = other_columns[name].take(np.maximum(indexer, 0))
+            elif not len(other_columns):
+                other_column = np.full(len(columns), np.nan)
+            else:
+                continue
+            column = columns[name]
+            if self.operation is operator.pow and column.dtype.kind in "iub":
+                # integers cannot be raised to negative integer powers
+                column = column.astype(np.float64)
+            with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+                result = np.asarray(self.operation(column, other_column))
+            if mismatch_count and self.on_mismatch == "keep":
+                result = np.where(unmatched, columns[name], result)
+            columns[name] = result
+            if mismatch_count and self.on_mismatch == "null":
+                columns.set_null(name, unmatched)
+            if result.dtype.kind == "f":
+                # division by zero, or a null in the other cube
+                not_a_number = ~np.isfinite(result)
+                if not_a_number.any():
+                    columns.set_null(name, not_a_number)
+
+
+MISMATCH_POLICIES = ("null", "keep", "error")
+
+
+def join_keys(features: List[Feature], time_dim_name: Optional[str]) -> List[Any]:
+    """
+    Returns the keys to join features on: their ids, or, if not all of them
+    have one, their geometries and times.
+    """
+    ids = [f.get("id") for f in features]
+    if None not in ids:
+        return ids
+    return [
+        (str(f["geometry"]), str(f["properties"].get(time_dim_name))) for f in features
+    ]
+
+
+def align(keys: Sequence[Any], other_keys: Sequence[Any]) -> np.ndarray:
+    """
+    Joins two sequences of keys by hashing the second one.
+    :return: for each key, the position of the first equal key in other_keys,
+        or -1 if there is none
+    """
+    positions = {}
+    for i, key in enumerate(other_keys):
+        positions.setdefault(key, i)
+    return np.fromiter((positions.get(k, -1) for k in keys), np.int64, len(keys))
+
+
+class TemporalAggregation(Operation):
+    """
+    Reduces the numeric properties of all features sharing a geometry whose
+    time lies within an interval [start, end) into a single feature, for
+    each of the given intervals. The time of the resulting features is the
+    label of the interval, or its end if no labels are given.
+
+    Each feature is assigned to its interval by a single search in the sorted
+    interval starts; only overlapping intervals are matched one by one.
+    If a grouped reducer is given, the features are reduced in a vectorized
+    way: they are put into one columnar frame, and all numeric columns of all
+    (geometry, interval) groups are reduced in a single call. If a chunked
+    reducer is given instead, the features are put into frames of at most
+    chunk_rows rows one after another, so that the values of all features
+    are never held in a single frame. Otherwise, reduce is called for each
+    group and property.
+
+    If the id of a simple reducer, such as "mean", is given, the aggregation
+    of an unmodified vector cube is pushed down to its datasource, if the
+    datasource supports it.
+    """
+
+    preserves_count = False
+
+    def __init__(
+        self,
+        reduce: Callable[[List[Any]], Any],
+        intervals: Sequence[Tuple[datetime.datetime, datetime.datetime]],
+        time_dim_name: str,
+        reduce_grouped: Optional[GroupedReducer] = None,
+        labels: Optional[Sequence[Any]] = None,
+        reducer_id: Optional[str] = None,
+        reduce_chunks: Optional[ChunkedReducer] = None,
+        chunk_rows: int = DEFAULT_AGGREGATION_CHUNK_ROWS,
+    ):
+        if not intervals:
+            raise ValueError("At least one interval must be given.")
+        if labels is not None and len(labels) != len(intervals):
+            raise ValueError(
+                f"Number of labels ({len(labels)}) does not match"
+                f" number of intervals ({len(intervals)})."
+            )
+        self.reduce = reduce
+        self.intervals = list(intervals)
+        self.time_dim_name = time_dim_name
+        self.reduce_grouped = reduce_grouped
+        self.labels = list(labels) if labels is not None else None
+        self.reducer_id = reducer_id
+        self.reduce_chunks = reduce_chunks
+        self.chunk_rows = max(chunk_rows, 1)
+
+    def get_label(self, interval_index: int) -> Any:
+        if self.labels is not None:
+            return self.labels[interval_index]
+        return self.intervals[interval_index][1]
+
+    def apply(self, features: List[Feature]) -> List[Feature]:
+        if not features:
+            return []
+        if self.reduce_grouped is not None or self.reduce_chunks is not None:
+            return self._apply_vectorized(features)
+        return self._apply_loop(features)
+
+    def push_down(self, datasource: Any) -> Optional[List[Feature]]:
+        if self.reducer_id is None:
+            return None
+        return datasource.aggregate_temporal(
+            self.reducer_id,
+            self.intervals,
+            [self.get_label(i) for i in range(len(self.intervals))],
+        )
+
+    def assign_intervals(
+        self, times: pd.DatetimeIndex
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Assigns times to the intervals they lie in.
+        :param times: the times
+        :return: two arrays of equal length, holding the index of a time and
+            the index of an interval containing it, for each such pair
+        """
+        t = times.asi8
+        starts = parse_datetimes([start for start, _ in self.intervals]).asi8
+        ends = parse_datetimes([end for _, end in self.intervals]).asi8
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        valid_times = ~times.isna()
+        if np.all(ends[:-1] <= starts[1:]):
+            position = np.searchsorted(starts, t, side="right") - 1
+            in_interval = valid_times & (position >= 0)
+            in_interval[in_interval] = t[in_interval] < ends[position[in_interval]]
+            rows = np.nonzero(in_interval)[0]
+            return rows, order[position[rows]]
+        rows = []
+        interval_ids = []
+        for start, end, interval_id in zip(starts, ends, order):
+            matches = np.nonzero(valid_times & (t >= start) & (t < end))[0]
+            rows.append(matches)
+            interval_ids.append(np.full(len(matches), interval_id))
+        return np.concatenate(rows), np.concatenate(interval_ids)
+
+    def _apply_vectorized(self, features: List[Feature]) -> List[Feature]:
+        codes, geometries = _factorize_geometries(features)
+        geometry_count = len(geometries)
+        interval_count = len(self.intervals)
+        group_count = geometry_count * interval_count
+        columns, present = self._get_numeric_columns(features, codes, geometry_count)
+
+        times = parse_datetimes(
+            f["properties"].get(self.time_dim_name) for f in features
+        )
+        rows, interval_ids = self.assign_intervals(times)
+        group_codes = codes[rows] * interval_count + interval_ids
+        if not columns:
+            reduced = np.empty((group_count, 0))
+        elif self.reduce_chunks is not None:
+            chunks = (
+                (
+                    _get_values(
+                        features, rows[start : start + self.chunk_rows], columns
+                    ),
+                    group_codes[start : start + self.chunk_rows],
+                )
+                for start in range(0, len(rows), self.chunk_rows)
+            )
+            reduced = self.reduce_chunks(chunks)
+        else:
+            reduced = self.reduce_grouped(
+                _get_values(features, rows, columns), group_codes
+            )
+        if columns:
+            reduced = reduced.reindex(index=range(group_count), columns=columns)
+            reduced = reduced.to_numpy(dtype=np.float64, na_value=np.nan)
+        last_rows = pd.Series(np.arange(len(features))).groupby(codes).last()
+        return build_aggregated_features(
+            [shapely.wkt.loads(wkt) for wkt in geometries],
+            columns,
+            reduced,
+            present,
+            [features[last_rows[code]]["properties"] for code in range(geometry_count)],
+            self.time_dim_name,
+            [self.get_label(i) for i in range(interval_count)],
+            get_empty_group_value(self.reducer_id),
+        )
+
+    def _get_numeric_columns(
+        self, features: List[Feature], codes: np.ndarray, geometry_count: int
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Finds the numeric properties, chunk by chunk, as if all properties
+        were put into one frame: a property is numeric if each chunk it has
+        values in holds numbers only.
+        :return: the names of the numeric properties, and whether any
+            feature of a geometry has a value of a property
+        """
+        present = {}
+        numeric = set()
+        non_numeric = set()
+        for start in range(0, len(features), self.chunk_rows):
+            stop = start + self.chunk_rows
+            frame = pd.DataFrame.from_records(
+                [f["properties"] for f in features[start:stop]]
+            )
+            chunk_numeric = numeric_columns(frame, self.time_dim_name)
+            numeric.update(chunk_numeric)
+            not_null = frame.notna()
+            non_numeric.update(
+                c for c in frame.columns if c not in chunk_numeric and not_null[c].any()
+            )
+            # a geometry only gets the properties some of its features have
+            # values for
+            chunk_present = not_null.groupby(codes[start:stop]).any()
+            chunk_present = chunk_present.reindex(
+                range(geometry_count), fill_value=False
+            )
+            for column in frame.columns:
+                column_present = chunk_present[column].to_numpy(dtype=bool)
+                present[column] = present.get(column, False) | column_present
+        columns = [c for c in present if c in numeric and c not in non_numeric]
+        if not columns:
+            return columns, np.zeros((geometry_count, 0), dtype=bool)
+        return columns, np.stack([present[c] for c in columns], axis=1)
+
+    def _apply_loop(self, features: List[Feature]) -> List[Feature]:
+        utc = pytz.UTC
+        times = parse_datetimes(f["properties"][self.time_dim_name] for f in features)
+        intervals_of_feature = [[] for _ in features]
+        for i, interval_index in zip(*self.assign_intervals(times)):
+            intervals_of_feature[i].append(interval_index)
+
+        features_by_geometry = {}
+        for i, f in enumerate(features):
+            current_geometry = shape(f["geometry"]).wkt
+            if current_geometry not in features_by_geometry:
+                features_by_geometry[current_geometry] = []
+            features_by_geometry[current_geometry].append(i)
+
+        empty_value = get_empty_group_value(self.reducer_id)
+        result = []
+        for geometry, indices in features_by_geometry.items():
+            extractions = [{} for _ in self.intervals]
+            numeric_props = {}
+            for i in indices:
+                props = features[i]["properties"]
+                for prop in numeric_properties(props, self.time_dim_name, strict=True):
+                    numeric_props[prop] = True
+                    for interval_index in intervals_of_feature[i]:
+                        if prop not in extractions[interval_index]:
+                            extractions[interval_index][prop] = []
+                        extractions[interval_index][prop].append(props[prop])
+
+            for interval_index, extraction in enumerate(extractions):
+                new_properties = {
+                    "created_at": datetime.datetime.now(utc),
+                    self.time_dim_name: self.get_label(interval_index),
+                }
+                for prop in numeric_props.keys():
+                    values = extraction.get(prop)
+                    if not values:
+                        # reducers such as min fail on empty groups
+                        new_properties[prop] = empty_value
+                        continue
+                    value = self.reduce(values)
+                    if isinstance(value, float) and np.isnan(value):
+                        value = None
+                    new_properties[prop] = value
+                for prop, value in features[indices[-1]]["properties"].items():
+                    if prop not in new_properties:
+                        new_properties[prop] = value
+                result.append(
+                    Feature(None, shapely.wkt.loads(geometry), new_properties)
+                )
+        return result
+
+
+def build_aggregated_features(
+    geometries: Sequence[Any],
+    columns: Sequence[str],
+    reduced: np.ndarray,
+    present: np.ndarray,
+    last_properties: Sequence[Mapping[str, Any]],
+    time_dim_name: str,
+    labels: Sequence[Any],
+    empty_value: Any = None,
+) -> List[Feature]:
+    """
+    Creates the features resulting from a temporal aggregation, one for each
+    geometry and interval, in this order. The features of temporal
+    aggregations computed in memory and by datasources are created here
+    alike.
+    :param geometries: the distinct geometries
+    :param columns: the names of the numeric properties
+    :param reduced: the reduced values of each (geometry, interval) group
+        and numeric property, NaN for groups without values
+    :param present: whether any feature of a geometry has a value of a
+        numeric property; a geometry only gets the numeric properties its
+        features have values for
+    :param last_properties: for each geometry, the properties of its last
+        feature, from which the other properties are taken
+    :param time_dim_name: the name of the time dimension
+    :param labels: the time of the resulting features of each interval
+    :param empty_value: the value of groups without values
+    """
+    created_at = datetime.datetime.now(pytz.UTC)
+    interval_count = len(labels)
+    result = []
+    for code, geometry in enumerate(geometries):
+        for interval_index, label in enumerate(labels):
+            group = code * interval_count + interval_index
+            new_properties = {"created_at": created_at, time_dim_name: label}
+            for i, prop in enumerate(columns):
+                if present[code, i]:
+                    value = reduced[group, i]
+                    new_properties[prop] = (
+                        float(value) if not np.isnan(value) else empty_value
+                    )
+            for prop, value in last_properties[code].items():
+                if prop not in new_properties:
+                    # NaN cannot be represented in JSON
+                    is_nan = isinstance(value, float) and np.isnan(value)
+                    new_properties[prop] = None if is_nan else value
+            result.append(Feature(None, geometry, new_properties))
+    return result
+
+
+def get_empty_group_value(reducer_id: Optional[str]) -> Any:
+    """
+    Returns the result of reducing no values: null, as NaN cannot be
+    represented in JSON, or 0 for counts.
+    """
+    return 0 if reducer_id == "count" else None
+
+
+def _get_values(
+    features: List[Feature], rows: np.ndarray, columns: List[str]
+) -> pd.DataFrame:
+    """
+    Returns the values of numeric properties of some features, as float64
+    frame; missing values become NaN.
+    """
+    frame = pd.DataFrame.from_records([features[i]["properties"] for i in rows])
+    return frame.reindex(columns=columns).astype(np.float64)
+
+
+def _factorize_geometries(features: List[Feature]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Returns for each feature the code of its geometry, in order of first
+    appearance, and the WKT of each distinct geometry. The geometries are
+    first told apart by their cheap string representation; only one WKT is
+    computed per representation.
+    """
+    keys = pd.Series([str(f["geometry"]) for f in features])
+    key_codes, _ = pd.factorize(keys)
+    _, first_indices = np.unique(key_codes, return_index=True)
+    wkts = pd.Series([shape(features[i]["geometry"]).wkt for i in first_indices])
+    wkt_codes, geometries = pd.factorize(wkts)
+    return wkt_codes[key_codes], list(geometries)
+
+
+def numeric_properties(
+    properties: dict, time_dim_name: Optional[str], strict: bool = False
+) -> List[str]:
+    """
+    Returns the names of the properties that hold numbers, leaving out the
+    bookkeeping columns and the time dimension.
+    If strict, booleans and subclasses of int and float are not considered
+    numeric.
+    """
+    result = []
+    for p, v in properties.items():
+        if p in NON_NUMERIC_PROPERTIES or p == time_dim_name:
+            continue
+        if strict:
+            is_numeric = type(v) == float or type(v) == int
+        else:
+            is_numeric = isinstance(v, (float, int))
+        if is_numeric:
+            result.append(p)
+    return result
+
+
+def numeric_columns(frame: pd.DataFrame, time_dim_name: Optional[str]) -> List[str]:
+    """
+    Returns the names of the columns of a frame that hold numbers, leaving out
+    booleans, the bookkeeping columns and the time dimension.
+    """
+    return [
+        c
+        for c in frame.columns
+        if c not in NON_NUMERIC_PROPERTIES
+        and c != time_dim_name
+        and pd.api.types.is_numeric_dtype(frame[c].dtype)
+        and not pd.api.types.is_bool_dtype(frame[c].dtype)
+    ]
+
+
+class PropertyColumns:
+    """
+    A columnar view of the properties of a list of features.
+    Numeric columns are detected once and extracted as NumPy arrays on first
+    access; missing values (None) become NaN. Only columns that have been
+    assigned are written back, and missing values are left untouched.
+    """
+
+    def __init__(self, features: List[Feature]):
+        self._features = features
+        self._properties = [f["properties"] for f in features]
+        self._names = None
+        self._numeric_names = None
+        self._values_cache = {}
+        self._columns = {}
+        self._missing = {}
+        self._nulls = {}
+        self._modified = set()
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    @property
+    def names(self) -> List[str]:
+        if self._names is None:
+            names = {}
+            for props in self._properties:
+                for name in props:
+                    names[name] = True
+            self._names = list(names)
+        return self._names
+
+    def numeric_names(self, time_dim_name: Optional[str] = None) -> List[str]:
+        """
+        Returns the names of the columns that hold numbers, leaving out
+        booleans, the bookkeeping columns and the time dimension.
+        """
+        if self._numeric_names is None:
+            # only columns whose first value is a number are inspected fully
+            self._numeric_names = [
+                n
+                for n in self.names
+                if n not in NON_NUMERIC_PROPERTIES
+                and _is_number(self._first_value(n))
+                and pd.api.types.infer_dtype(self._values(n), skipna=True)
+                in NUMERIC_INFERRED_TYPES
+            ]
+        return [n for n in self._numeric_names if n != time_dim_name]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._columns:
+            values = self._values(name)
+            if None in values:
+                self._columns[name] = np.array(values, dtype=float)
+                self._missing[name] = np.isnan(self._columns[name])
+            else:
+                self._columns[name] = np.asarray(values)
+        return self._columns[name]
+
+    def __setitem__(self, name: str, column: np.ndarray) -> None:
+        self._columns[name] = column
+        self._modified.add(name)
+
+    def set_null(self, name: str, mask: np.ndarray) -> None:
+        """Sets the values of a column to null where mask is True."""
+        self[name] = np.where(mask, np.nan, self[name])
+        self._nulls[name] = self._nulls.get(name, False) | mask
+
+    @property
+    def features(self) -> List[Feature]:
+        return self._features
+
+    def write_back(self) -> List[Feature]:
+        """
+        Writes the assigned columns back to the features, and returns them.
+        """
+        for name in self._modified:
+            values = self._columns[name].tolist()
+            missing = self._missing.get(name)
+            if missing is None:
+                for props, value in zip(self._properties, values):
+                    props[name] = value
+            else:
+                for props, value, is_missing in zip(self._properties, values, missing):
+                    if not is_missing:
+                        props[name] = value
+            if name in self._nulls:
+                for i in np.nonzero(self._nulls[name])[0]:
+                    if name in self._properties[i]:
+                        self._properties[i][name] = None
+        return self._features
+
+    def _first_value(self, name: str) -> Any:
+        for props in self._properties:
+            value = props.get(name)
+            if value is not None:
+                return value
+        return None
+
+    def _values(self, name: str) -> List[Any]:
+        if name not in self._values_cache:
+            self._values_cache[name] = [props.get(name) for props in self._properties]
+        return self._values_cache[name]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(
+        value, (bool, np.bool_)
+    )
+
+
+# types reported by pandas.api.types.infer_dtype for numeric columns
+NUMERIC_INFERRED_TYPES = ("integer", "floating", "mixed-integer-float")
+
+
+def preserves_count(plan: Sequence[Operation]) -> bool:
+    return all(op.preserves_count for op in plan)
+
+
+def execute_plan(features: List[Feature], plan: Sequence[Operation]) -> List[Feature]:
+    """
+    Evaluates a plan on a list of features. Runs of feature operations are
+    fused into a single pass, which copies each feature only once; runs of
+    columnar operations share one columnar view. The input features are never
+    modified.
+    :param features: the features of the cube the plan is based on
+    :param plan: the operations to apply, in order
+    :return: the resulting features
+    """
+    result = features
+    stage = []
+    for operation in plan:
+        if stage and not _is_fusable(operation, stage[0]):
+            result = _apply_fused(result, stage)
+            stage = []
+        if isinstance(operation, (FeatureOperation, ColumnarOperation)):
+            stage.append(operation)
+        else:
+            result = operation.apply(result)
+    if stage:
+        result = _apply_fused(result, stage)
+    return result
+
+
+def _is_fusable(operation: Operation, other: Operation) -> bool:
+    for kind in (FeatureOperation, ColumnarOperation):
+        if isinstance(operation, kind) and isinstance(other, kind):
+            return True
+    return False
+
+
+def _apply_fused(features: List[Feature], stage: Sequence[Operation]) -> List[Feature]:
+    if isinstance(stage[0], ColumnarOperation):
+        return _apply_columnar_stage(features, stage)
+    return _apply_stage(features, stage)
+
+
+def _apply_stage(
+    features: List[Feature], stage: Sequence[FeatureOperation]
+) -> List[Feature]:
+    result = []
+    for feature in features:
+        current = copy.copy(feature)
+        current["properties"] = dict(feature["properties"])
+        for operation in stage:
+            current = operation.apply_feature(current)
+            if current is None:
+                break
+        if current is not None:
+            result.append(current)
+    return result
+
+
+def _apply_columnar_stage(
+    features: List[Feature], stage: Sequence[ColumnarOperation]
+) -> List[Feature]:
+    copies = []
+    for feature in features:
+        current = copy.copy(feature)
+        current["properties"] = dict(feature["properties"])
+        copies.append(current)
+    columns = PropertyColumns(copies)
+    for operation in stage:
+        operation.apply_columns(columns)
+    return columns.write_back()
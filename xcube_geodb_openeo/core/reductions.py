@@ -0,0 +1,291 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import os
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..defaults import DEFAULT_REDUCTION_MEMORY_BUDGET
+
+# Mergeable states of grouped reductions. A state is created from a chunk of
+# values and their group codes; the states of several chunks, partitions or
+# workers are combined into the state of all their values, from which the
+# result of each group is taken.
+
+
+class ReducerState(ABC):
+    """The mergeable state of reducing groups of values."""
+
+    @abstractmethod
+    def combine(self, other: "ReducerState") -> "ReducerState":
+        """Returns the state of the values of both states."""
+
+    def close(self):
+        """Releases the resources held by the state."""
+
+
+class GroupedMoments(ReducerState):
+    """
+    The number of values, the mean, the sum of squared deviations from the
+    mean (M2), the minimum and the maximum of each group and column. States
+    are combined with the pairwise update of Chan et al., which is
+    numerically stable like Welford's algorithm. The size of a state
+    depends on the number of groups only.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence,
+        size: np.ndarray,
+        count: np.ndarray,
+        mean: np.ndarray,
+        m2: np.ndarray,
+        minimum: np.ndarray,
+        maximum: np.ndarray,
+    ):
+        self.columns = list(columns)
+        self.size = size
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_values(cls, values: pd.DataFrame, codes: np.ndarray) -> "GroupedMoments":
+        """
+        Creates the state of a chunk of values.
+        :param values: the values, one column per property
+        :param codes: the non-negative group code of each row
+        """
+        matrix = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        codes = np.asarray(codes, dtype=np.int64)
+        group_count = int(codes.max()) + 1 if len(codes) else 0
+        valid = ~np.isnan(matrix)
+
+        def sum_by_group(weights: np.ndarray) -> np.ndarray:
+            return np.stack(
+                [
+                    np.bincount(codes, weights=weights[:, j], minlength=group_count)
+                    for j in range(weights.shape[1])
+                ],
+                axis=1,
+            ).reshape(group_count, weights.shape[1])
+
+        count = sum_by_group(valid.astype(np.float64))
+        sums = sum_by_group(np.where(valid, matrix, 0.0))
+        mean = np.divide(sums, count, out=np.zeros_like(sums), where=count > 0)
+        deviations = np.where(valid, matrix - mean[codes], 0.0)
+        m2 = sum_by_group(deviations * deviations)
+        minimum = np.full((group_count, matrix.shape[1]), np.inf)
+        np.minimum.at(minimum, codes, np.where(valid, matrix, np.inf))
+        maximum = np.full((group_count, matrix.shape[1]), -np.inf)
+        np.maximum.at(maximum, codes, np.where(valid, matrix, -np.inf))
+        size = np.bincount(codes, minlength=group_count)
+        return cls(values.columns, size, count, mean, m2, minimum, maximum)
+
+    @property
+    def group_count(self) -> int:
+        return len(self.size)
+
+    def combine(self, other: "GroupedMoments") -> "GroupedMoments":
+        group_count = max(self.group_count, other.group_count)
+        a = self._resize(group_count)
+        b = other._resize(group_count)
+        count = a.count + b.count
+        delta = b.mean - a.mean
+        weight = np.divide(b.count, count, out=np.zeros_like(count), where=count > 0)
+        mean = a.mean + delta * weight
+        m2 = a.m2 + b.m2 + delta * delta * a.count * weight
+        return GroupedMoments(
+            self.columns,
+            a.size + b.size,
+            count,
+            mean,
+            m2,
+            np.minimum(a.minimum, b.minimum),
+            np.maximum(a.maximum, b.maximum),
+        )
+
+    def get_count(self) -> pd.DataFrame:
+        return self._to_frame(self.count.astype(np.int64), empty=0)
+
+    def get_mean(self) -> pd.DataFrame:
+        return self._to_frame(self.mean)
+
+    def get_std(self) -> pd.DataFrame:
+        return self._to_frame(np.sqrt(np.divide(self.m2, np.maximum(self.count, 1))))
+
+    def get_min(self) -> pd.DataFrame:
+        return self._to_frame(self.minimum)
+
+    def get_max(self) -> pd.DataFrame:
+        return self._to_frame(self.maximum)
+
+    def _to_frame(self, results: np.ndarray, empty=np.nan) -> pd.DataFrame:
+        if empty is np.nan:
+            results = np.where(self.count > 0, results, np.nan)
+        groups = np.nonzero(self.size)[0]
+        return pd.DataFrame(results[groups], index=groups, columns=self.columns)
+
+    def _resize(self, group_count: int) -> "GroupedMoments":
+        missing = group_count - self.group_count
+        if missing == 0:
+            return self
+        column_count = len(self.columns)
+
+        def pad(array: np.ndarray, value: float) -> np.ndarray:
+            shape = (missing,) + array.shape[1:]
+            return np.concatenate([array, np.full(shape, value, dtype=array.dtype)])
+
+        return GroupedMoments(
+            self.columns,
+            pad(self.size, 0),
+            pad(self.count.reshape(-1, column_count), 0),
+            pad(self.mean.reshape(-1, column_count), 0),
+            pad(self.m2.reshape(-1, column_count), 0),
+            pad(self.minimum.reshape(-1, column_count), np.inf),
+            pad(self.maximum.reshape(-1, column_count), -np.inf),
+        )
+
+
+class GroupedValues(ReducerState):
+    """
+    All values of each group, from which exact quantiles, such as the
+    median, are computed. The values are kept in chunks sorted by group
+    code; once the chunks in memory exceed the memory budget, they are
+    spilled to memory-mapped files. Quantiles are computed for one range of
+    groups at a time, each range being read from all chunks, so that no
+    more than about the memory budget is loaded at once.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence,
+        memory_budget: int = DEFAULT_REDUCTION_MEMORY_BUDGET,
+        directory: Optional[str] = None,
+    ):
+        self.columns = list(columns)
+        self._memory_budget = memory_budget
+        self._directory = directory
+        self._chunks: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._directories: List[tempfile.TemporaryDirectory] = []
+
+    @classmethod
+    def from_values(
+        cls,
+        values: pd.DataFrame,
+        codes: np.ndarray,
+        memory_budget: int = DEFAULT_REDUCTION_MEMORY_BUDGET,
+        directory: Optional[str] = None,
+    ) -> "GroupedValues":
+        state = cls(values.columns, memory_budget, directory)
+        state.add(values, codes)
+        return state
+
+    @property
+    def row_count(self) -> int:
+        return sum(len(codes) for codes, _ in self._chunks)
+
+    @property
+    def group_count(self) -> int:
+        return max((int(c[-1]) + 1 for c, _ in self._chunks if len(c)), default=0)
+
+    def add(self, values: pd.DataFrame, codes: np.ndarray):
+        codes = np.asarray(codes, dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+        matrix = values.to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        self._chunks.append((codes[order], matrix))
+        self._maybe_spill()
+
+    def combine(self, other: "GroupedValues") -> "GroupedValues":
+        """
+        Returns the state of the values of both states. The other state
+        must not be used anymore.
+        """
+        self._chunks += other._chunks
+        # the spilled chunks of the other state are owned by this one now
+        self._directories += other._directories
+        other._chunks, other._directories = [], []
+        self._maybe_spill()
+        return self
+
+    def get_quantile(self, q: float) -> pd.DataFrame:
+        """
+        Computes the q-quantile of each group and column, interpolating
+        linearly between values.
+        """
+        parts = []
+        group_count = self.group_count
+        row_bytes = 8 * (len(self.columns) + 1)
+        rows_per_range = max(self._memory_budget // row_bytes, 1)
+        # ranges of about equal row counts, assuming evenly sized groups
+        range_count = max(-(-self.row_count // rows_per_range), 1)
+        bounds = np.linspace(0, group_count, range_count + 1).astype(np.int64)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            codes, values = [], []
+            for chunk_codes, chunk_values in self._chunks:
+                first, last = np.searchsorted(chunk_codes, [start, stop])
+                codes.append(np.asarray(chunk_codes[first:last]))
+                values.append(np.asarray(chunk_values[first:last]))
+            codes = np.concatenate(codes)
+            if len(codes) == 0:
+                continue
+            frame = pd.DataFrame(np.concatenate(values), columns=self.columns)
+            parts.append(frame.groupby(codes).quantile(q))
+        if not parts:
+            return pd.DataFrame(columns=self.columns, dtype=np.float64)
+        return pd.concat(parts)
+
+    def close(self):
+        """Removes the spilled chunks."""
+        self._chunks = []
+        for directory in self._directories:
+            directory.cleanup()
+        self._directories = []
+
+    def _maybe_spill(self):
+        in_memory = [
+            i
+            for i, (_, values) in enumerate(self._chunks)
+            if not isinstance(values, np.memmap)
+        ]
+        memory_size = sum(
+            self._chunks[i][0].nbytes + self._chunks[i][1].nbytes for i in in_memory
+        )
+        if memory_size <= self._memory_budget:
+            return
+        if not self._directories:
+            self._directories.append(
+                tempfile.TemporaryDirectory(prefix="reduction-", dir=self._directory)
+            )
+        directory = self._directories[0].name
+        for i in in_memory:
+            paths = [
+                os.path.join(directory, f"{uuid.uuid4().hex}.npy") for _ in range(2)
+            ]
+            for path, array in zip(paths, self._chunks[i]):
+                np.save(path, array)
+            self._chunks[i] = tuple(np.load(path, mmap_mode="r") for path in paths)
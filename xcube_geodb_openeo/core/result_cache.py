@@ -0,0 +1,199 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import collections
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, Mapping, Optional, OrderedDict, Set, Tuple
+
+from xcube.constants import LOG
+
+from ..defaults import DEFAULT_RESULT_CACHE_DISK_BUDGET
+from ..defaults import DEFAULT_RESULT_CACHE_MEMORY_BUDGET
+
+# the serialized result and its entity tag
+CachedResult = Tuple[bytes, str]
+
+_FILE_SUFFIX = ".result"
+
+
+class ResultCache:
+    """
+    Caches the serialized results of process graphs by key, see
+    compute_result_key. Results are kept in memory up to the memory budget;
+    results exceeding it are spilled to the given directory, if any, up to
+    the disk budget. The least recently used results are dropped first.
+
+    Each result records the versions of the collections it has been computed
+    from. Once a collection is seen with another version, all results
+    computed from it are dropped.
+    """
+
+    def __init__(
+        self,
+        memory_budget: int = DEFAULT_RESULT_CACHE_MEMORY_BUDGET,
+        directory: Optional[str] = None,
+        disk_budget: int = DEFAULT_RESULT_CACHE_DISK_BUDGET,
+    ):
+        self._memory_budget = memory_budget
+        self._directory = directory
+        self._disk_budget = disk_budget if directory else 0
+        self._memory: OrderedDict[str, CachedResult] = collections.OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[str, Tuple[int, str]] = collections.OrderedDict()
+        self._disk_size = 0
+        self._keys_by_collection: Dict[str, Set[str]] = {}
+        self._collections_by_key: Dict[str, Tuple[str, ...]] = {}
+        self._versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # the versions of results spilled by earlier runs are unknown
+            for file_name in os.listdir(directory):
+                if file_name.endswith(_FILE_SUFFIX):
+                    os.remove(os.path.join(directory, file_name))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """The bytes of results held in memory and on disk."""
+        return self._memory_size, self._disk_size
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+            if key not in self._disk:
+                return None
+            size, etag = self._disk.pop(key)
+            self._disk_size -= size
+            path = self._get_path(key)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.remove(path)
+            self._store(key, (data, etag))
+            return data, etag
+
+    def put(self, key: str, versions: Mapping[str, str], data: bytes) -> CachedResult:
+        """
+        Stores a result.
+        :param key: the key of the result
+        :param versions: the versions of the collections, by collection id,
+            the result has been computed from
+        :param data: the serialized result
+        :return: the result and its entity tag
+        """
+        result = data, f'"{hashlib.sha256(data).hexdigest()}"'
+        with self._lock:
+            self._check_versions(versions)
+            self._discard(key)
+            self._collections_by_key[key] = tuple(versions)
+            for collection_id in versions:
+                self._keys_by_collection.setdefault(collection_id, set()).add(key)
+            self._store(key, result)
+        return result
+
+    def check_versions(self, versions: Mapping[str, str]):
+        """
+        Drops the results computed from collections whose version differs
+        from the given one.
+        """
+        with self._lock:
+            self._check_versions(versions)
+
+    def invalidate(self, collection_id: str):
+        """Drops all results computed from a collection."""
+        with self._lock:
+            self._invalidate(collection_id)
+
+    def _check_versions(self, versions: Mapping[str, str]):
+        for collection_id, version in versions.items():
+            known_version = self._versions.get(collection_id)
+            if known_version is not None and known_version != version:
+                LOG.debug(f"Collection {collection_id} changed, dropping results")
+                self._invalidate(collection_id)
+            self._versions[collection_id] = version
+
+    def _invalidate(self, collection_id: str):
+        for key in self._keys_by_collection.pop(collection_id, set()):
+            self._discard(key)
+
+    def _store(self, key: str, result: CachedResult):
+        if len(result[0]) > self._memory_budget:
+            self._spill(key, result)
+            return
+        self._memory[key] = result
+        self._memory_size += len(result[0])
+        while self._memory_size > self._memory_budget:
+            spilled_key, spilled = self._memory.popitem(last=False)
+            self._memory_size -= len(spilled[0])
+            self._spill(spilled_key, spilled)
+
+    def _spill(self, key: str, result: CachedResult):
+        data, etag = result
+        if len(data) > self._disk_budget:
+            self._forget(key)
+            return
+        while self._disk_size + len(data) > self._disk_budget:
+            dropped_key, (size, _) = self._disk.popitem(last=False)
+            self._disk_size -= size
+            os.remove(self._get_path(dropped_key))
+            self._forget(dropped_key)
+        with open(self._get_path(key), "wb") as f:
+            f.write(data)
+        self._disk[key] = len(data), etag
+        self._disk_size += len(data)
+
+    def _discard(self, key: str):
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key)[0])
+        if key in self._disk:
+            self._disk_size -= self._disk.pop(key)[0]
+            os.remove(self._get_path(key))
+        self._forget(key)
+
+    def _forget(self, key: str):
+        for collection_id in self._collections_by_key.pop(key, ()):
+            self._keys_by_collection.get(collection_id, set()).discard(key)
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self._directory, key + _FILE_SUFFIX)
+
+
+def compute_result_key(
+    normalized_graph: str,
+    collection_ids: Iterable[str],
+    versions: Mapping[str, str],
+) -> str:
+    """
+    Computes the key of the result of a process graph.
+    :param normalized_graph: the canonical representation of the graph
+    :param collection_ids: the ids of all collections the user may access
+    :param versions: the versions of the collections the graph loads, by
+        collection id
+    :return: the key, a hex digest
+    """
+    key = json.dumps(
+        [normalized_graph, sorted(collection_ids), sorted(versions.items())],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
@@ -0,0 +1,204 @@
+# The MIT License (MIT)
+# Copyright (c) 2021/2022 by the xcube team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from xcube.constants import LOG
+
+from .vectorcube import VectorCube
+from .vectorcube_provider import VectorCubeProvider
+from ..defaults import DEFAULT_SUMMARY_REFRESH_INTERVAL
+
+
+class CollectionSummaryStore:
+    """
+    Keeps precomputed summaries of collections in a directory, one JSON file
+    per collection. A summary comprises the extents, the time range, the
+    number of features, the geometry types, the collection metadata, and
+    minimum, maximum and histogram of each numeric property.
+
+    Summaries are recomputed only if the collection has been modified since
+    they were computed; whether this is the case is checked at most once per
+    refresh interval. Requests schedule refreshes, which run one after another
+    on a background thread, so that they never wait for a summary.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        refresh_interval: float = DEFAULT_SUMMARY_REFRESH_INTERVAL,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._refresh_interval = refresh_interval
+        self._summaries = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last_full_refresh = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="summary-refresh"
+        )
+
+    def get(self, collection_id: str) -> Optional[Dict]:
+        """
+        Returns the stored summary of a collection, or None if none has been
+        computed yet.
+        """
+        with self._lock:
+            if collection_id in self._summaries:
+                return self._summaries[collection_id]
+            path = self._get_path(collection_id)
+            if not os.path.exists(path):
+                return None
+            with open(path) as f:
+                summary = json.load(f)
+            self._summaries[collection_id] = summary
+            return summary
+
+    def put(self, summary: Dict) -> None:
+        # keep the same representation in memory as on disk
+        summary = json.loads(json.dumps(summary, default=str))
+        with self._lock:
+            path = self._get_path(summary["id"])
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(summary, f)
+            os.replace(tmp_path, path)
+            self._summaries[summary["id"]] = summary
+
+    def schedule_refresh(self, vector_cube: VectorCube) -> None:
+        """
+        Refreshes the summary of a vector cube in the background, unless a
+        refresh of the collection is pending already.
+        :param vector_cube: the vector cube, which must not have a plan
+        """
+        with self._lock:
+            if vector_cube.id in self._pending:
+                return
+            self._pending.add(vector_cube.id)
+        self._executor.submit(self._refresh_in_background, vector_cube)
+
+    def schedule_refresh_all(self, cube_provider: VectorCubeProvider) -> bool:
+        """
+        Refreshes the summaries of all collections known to the cube
+        provider in the background, at most once per refresh interval.
+        :return: whether a refresh has been scheduled
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._last_full_refresh is not None
+                and now - self._last_full_refresh < self._refresh_interval
+            ):
+                return False
+            self._last_full_refresh = now
+        self._executor.submit(self._refresh_all_in_background, cube_provider)
+        return True
+
+    def refresh(
+        self, vector_cube: VectorCube, check: bool = False, force: bool = False
+    ) -> Dict:
+        """
+        Returns the summary of a vector cube, computing it first if it is
+        missing or outdated.
+        :param vector_cube: the vector cube, which must not have a plan
+        :param check: if True, the modification time of the collection is
+            checked even if the refresh interval has not passed yet
+        :param force: if True, the summary is recomputed in any case
+        :return: the summary
+        """
+        summary = self.get(vector_cube.id)
+        if summary and not force:
+            age = time.time() - summary["checked_at"]
+            if not check and age < self._refresh_interval:
+                return summary
+            last_modified = vector_cube.get_last_modified()
+            if last_modified and last_modified == summary["last_modified"]:
+                summary = dict(summary, checked_at=time.time())
+                self.put(summary)
+                return self.get(vector_cube.id)
+        LOG.debug(f"Computing summary of collection {vector_cube.id}...")
+        self.put(compute_summary(vector_cube))
+        LOG.debug("...done.")
+        return self.get(vector_cube.id)
+
+    def _refresh_in_background(self, vector_cube: VectorCube) -> None:
+        try:
+            self.refresh(vector_cube)
+        except Exception as e:
+            LOG.warning(f"Failed to refresh summary of {vector_cube.id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(vector_cube.id)
+
+    def _refresh_all_in_background(self, cube_provider: VectorCubeProvider) -> None:
+        try:
+            refresh_summaries(cube_provider, self)
+        except Exception as e:
+            LOG.warning(f"Failed to refresh summaries: {e}")
+
+    def _get_path(self, collection_id: str) -> str:
+        file_name = re.sub(r"[^\w.~-]", "_", collection_id) + ".json"
+        return os.path.join(self._directory, file_name)
+
+
+def compute_summary(vector_cube: VectorCube) -> Dict:
+    bbox = vector_cube.get_bbox()
+    time_extent = vector_cube.get_time_dim_extent()
+    now = time.time()
+    return {
+        "id": vector_cube.id,
+        "last_modified": vector_cube.get_last_modified(),
+        "computed_at": now,
+        "checked_at": now,
+        "feature_count": vector_cube.feature_count,
+        "srid": vector_cube.srid,
+        "bbox": list(bbox) if bbox else None,
+        "geometry_types": vector_cube.get_geometry_types(),
+        "time_extent": [t.isoformat() for t in time_extent] if time_extent else None,
+        "has_vertical_dim": vector_cube.has_vertical_dim(),
+        "metadata": vector_cube.get_metadata(full=True),
+        "statistics": vector_cube.get_property_statistics(),
+    }
+
+
+def refresh_summaries(
+    cube_provider: VectorCubeProvider, store: CollectionSummaryStore
+) -> List[str]:
+    """
+    Refreshes the summaries of all collections known to the cube provider.
+    Only collections modified since their summary was computed are processed
+    again.
+    :return: the ids of the collections whose summaries have been refreshed
+    """
+    refreshed = []
+    for collection_id in cube_provider.get_collection_keys():
+        vector_cube = cube_provider.get_vector_cube(collection_id)
+        previous = store.get(vector_cube.id)
+        summary = store.refresh(vector_cube, check=True)
+        if not previous or summary["computed_at"] != previous["computed_at"]:
+            refreshed.append(vector_cube.id)
+    return refreshed
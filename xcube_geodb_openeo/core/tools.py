@@ -19,9 +19,15 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 import collections
-from typing import Optional, TypeVar
+import threading
+import time
+from concurrent.futures import Executor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, TypeVar, Iterable, Any, Callable, Dict, List, Tuple
 from typing import OrderedDict, Hashable
 
+import pandas as pd
+from xcube.constants import LOG
 from xcube_geodb.core.geodb import GeoDBClient
 
 
@@ -38,31 +44,205 @@ def create_geodb_client(api_config: dict, access_token: str) -> GeoDBClient:
     )
 
 
+def parse_datetimes(values: Iterable[Any]) -> pd.DatetimeIndex:
+    """
+    Parses time values (strings, datetimes or timestamps) in a single
+    vectorized pass. Values without time zone are considered to be UTC.
+    :param values: the time values
+    :return: the times as datetime64[ns, UTC] index
+    """
+    if not isinstance(values, (pd.Series, pd.Index)):
+        values = list(values)
+    try:
+        times = pd.to_datetime(values, utc=True)
+    except ValueError:
+        # values do not share a single format, so parse them one by one;
+        # format="mixed" would need pandas 2
+        times = [_to_utc_timestamp(value) for value in values]
+    return pd.DatetimeIndex(times).astype("datetime64[ns, UTC]")
+
+
+def _to_utc_timestamp(value: Any) -> pd.Timestamp:
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
 T = TypeVar("T")
 
 
 class Cache:
+    """
+    A least recently used cache of at most capacity items, which may be used
+    by several threads. Items created by get_or_create are created only
+    once, even if several threads ask for them at the same time.
+    """
+
     def __init__(self, capacity: int):
         self.capacity = capacity
         self._cache: OrderedDict[Hashable, T] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._creating: Dict[Hashable, threading.Lock] = {}
 
     def get(self, key: Hashable) -> Optional[T]:
-        if key not in self._cache:
-            return None
-        self._cache.move_to_end(key)
-        return self._cache[key]
+        with self._lock:
+            return self._get(key, None)
 
     def insert(self, key: Hashable, item: T) -> None:
-        if len(self._cache) == self.capacity:
-            self._cache.popitem(last=False)
-        self._cache[key] = item
-        self._cache.move_to_end(key)
+        with self._lock:
+            self._cache[key] = item
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+
+    def get_or_create(self, key: Hashable, create: Callable[[], T]) -> T:
+        """
+        Returns the cached item, creating and inserting it first if it is
+        missing. Threads asking for an item that is being created wait for
+        it rather than creating it again.
+        """
+        with self._lock:
+            item = self._get(key, _MISSING)
+            if item is not _MISSING:
+                return item
+            key_lock = self._creating.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                item = self._get(key, _MISSING)
+            if item is _MISSING:
+                try:
+                    item = create()
+                    self.insert(key, item)
+                finally:
+                    with self._lock:
+                        self._creating.pop(key, None)
+        return item
 
     def clear(self) -> None:
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
 
     def get_keys(self):
-        return list(self._cache.keys())
+        with self._lock:
+            return list(self._cache.keys())
+
+    def get_items(self) -> List[T]:
+        with self._lock:
+            return list(self._cache.values())
 
     def __len__(self) -> int:
         return len(self._cache)
+
+    def _get(self, key: Hashable, default: Any) -> Any:
+        item = self._cache.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+        self._cache.move_to_end(key)
+        return item
+
+
+_MISSING = object()
+
+
+class VersionCache:
+    """
+    Caches the versions of collections for max_age seconds, so that checking
+    whether cached results are still valid does not query the database on
+    every request. Threads asking for a version that is being fetched wait
+    for it rather than fetching it again.
+    """
+
+    def __init__(self, max_age: float):
+        """
+        :param max_age: seconds after which versions are fetched again;
+            results computed from a collection may be served for up to this
+            long after the collection has been modified
+        """
+        self._max_age = max_age
+        self._versions: Dict[Hashable, Tuple[Optional[str], float]] = {}
+        self._fetching: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, fetch: Callable[[], Optional[str]]) -> Optional[str]:
+        """
+        Returns the cached version for the key, fetching it if it is missing
+        or outdated.
+        :param key: the key of the version, typically the collection id
+        :param fetch: fetches the current version
+        :return: the version, or None if unknown
+        """
+        with self._lock:
+            entry = self._get_current(key)
+            if entry is not None:
+                return entry[0]
+            key_lock = self._fetching.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._get_current(key)
+            if entry is not None:
+                return entry[0]
+            version = fetch()
+            with self._lock:
+                self._versions[key] = (version, time.monotonic())
+        return version
+
+    def _get_current(self, key: Hashable) -> Optional[Tuple[Optional[str], float]]:
+        entry = self._versions.get(key)
+        if entry is None or time.monotonic() - entry[1] > self._max_age:
+            return None
+        return entry
+
+
+class CountCache:
+    """
+    Caches exact feature counts. Counts older than max_age seconds are
+    refreshed in the background, while the outdated count is still served.
+    As long as no exact count is known, an estimate is returned.
+    """
+
+    def __init__(self, max_age: float, executor: Optional[Executor] = None):
+        """
+        :param max_age: seconds after which counts are refreshed
+        :param executor: runs the refreshes; by default, a single thread
+            owned by the cache
+        """
+        self._max_age = max_age
+        self._counts: Dict[Hashable, Tuple[int, float]] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="count-refresh"
+        )
+
+    def get(
+        self, key: Hashable, count: Callable[[], int], estimate: Callable[[], int]
+    ) -> int:
+        """
+        Returns the cached count for the key, scheduling a refresh if needed.
+        :param key: the key of the count, typically the collection id
+        :param count: computes the exact count
+        :param estimate: computes an estimated count, used as long as there
+            is no cached count
+        :return: the cached count, or the estimate
+        """
+        with self._lock:
+            entry = self._counts.get(key)
+            outdated = entry is None or time.monotonic() - entry[1] > self._max_age
+            if outdated and key not in self._pending:
+                self._pending.add(key)
+                self._executor.submit(self._refresh, key, count)
+        if entry is not None:
+            return entry[0]
+        return estimate()
+
+    def _refresh(self, key: Hashable, count: Callable[[], int]) -> None:
+        try:
+            value = count()
+            with self._lock:
+                self._counts[key] = (value, time.monotonic())
+        except Exception as e:
+            LOG.warning(f"Failed to count features of {key}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
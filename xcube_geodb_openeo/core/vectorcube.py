@@ -19,11 +19,11 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 import copy
-from datetime import datetime
 from functools import cached_property
-from typing import Any, Optional, Tuple, Dict
+from typing import Any, Callable, Optional, Tuple, Dict
 from typing import List
 
+import pandas as pd
 from geojson import FeatureCollection
 from geojson.geometry import Geometry
 from shapely.geometry import Polygon
@@ -32,6 +32,10 @@ from shapely.geometry import shape
 import uuid
 
 from xcube_geodb_openeo.core.geodb_datasource import DataSource, Feature
+from xcube_geodb_openeo.core.operations import ColumnarOperation
+from xcube_geodb_openeo.core.operations import Operation
+from xcube_geodb_openeo.core.operations import execute_plan
+from xcube_geodb_openeo.core.operations import preserves_count
 from xcube_geodb_openeo.core.tools import Cache
 from xcube_geodb_openeo.defaults import STAC_DEFAULT_ITEMS_LIMIT
 
@@ -58,6 +62,11 @@ class VectorCube:
     However, detecting this from a table is hard, therefore we don't do it.
 
     The actual values within this VectorCube are provided by a dask Dataframe.
+
+    VectorCubes are evaluated lazily: processes derive new cubes by appending
+    operations to the plan of their input (see with_operation). The plan is
+    only evaluated when features are pulled from the cube, in a single pass
+    over the features of the underlying cube.
     """
 
     def __init__(self, collection_id: Tuple[str, str],
@@ -74,8 +83,10 @@ class VectorCube:
         self._geometry_types = None
         self._vector_dim = []
         self._vertical_dim = []
-        self._time_dim = []
         self._time_dim_name = None
+        self._probe_cache = {}
+        self._base = None
+        self._plan = []
 
     @cached_property
     def id(self) -> str:
@@ -87,8 +98,36 @@ class VectorCube:
 
     @cached_property
     def feature_count(self) -> int:
+        if self._plan and not preserves_count(self._plan):
+            return len(self.load_features(limit=None, with_stac_info=False))
         return self._datasource.get_feature_count()
 
+    @property
+    def plan(self) -> List[Operation]:
+        return list(self._plan)
+
+    def with_operation(self, operation: Operation) -> 'VectorCube':
+        """
+        Derives a new vector cube that applies the given operation to the
+        features of this cube. Nothing is computed until the features of the
+        derived cube are loaded.
+        The derived cube shares the dimension and metadata caches with this
+        cube, and loads its features from the cube without plan it is based on.
+        :param operation: the operation to append to the plan
+        :return: the derived vector cube
+        """
+        derived = VectorCube((self._database, self._id), self._datasource)
+        derived._base = self._base if self._base else self
+        derived._plan = self._plan + [operation]
+        derived._vector_dim_cache = self._vector_dim_cache
+        derived._vertical_dim_cache = self._vertical_dim_cache
+        derived._time_dim_cache = self._time_dim_cache
+        derived._time_dim_name = self._time_dim_name
+        derived._probe_cache = self._probe_cache
+        derived._bbox = self._bbox
+        derived._geometry_types = self._geometry_types
+        return derived
+
     def get_vector_dim(
             self, bbox: Optional[Tuple[float, float, float, float]] = None) \
             -> List[Geometry]:
@@ -112,13 +151,9 @@ class VectorCube:
         vector dimension
         """
         global_key = 'GLOBAL'
-        if bbox and bbox in self._vector_dim_cache.get_keys():
-            return self._vector_dim_cache.get(bbox)
-        if not bbox and global_key in self._vector_dim_cache.get_keys():
-            return self._vector_dim_cache.get(global_key)
-        vector_dim = self._datasource.get_vector_dim(bbox)
-        self._vector_dim_cache.insert(bbox if bbox else global_key, vector_dim)
-        return vector_dim
+        return self._vector_dim_cache.get_or_create(
+            bbox if bbox else global_key,
+            lambda: self._datasource.get_vector_dim(bbox))
 
     def get_vertical_dim(
             self,
@@ -131,35 +166,65 @@ class VectorCube:
         :return: list of dimension values, typically a list of float values.
         """
         global_key = 'GLOBAL'
-        if bbox and bbox in self._vertical_dim_cache.get_keys():
-            return self._vertical_dim_cache.get(bbox)
-        if not bbox and global_key in self._vertical_dim_cache.get_keys():
-            return self._vertical_dim_cache.get(global_key)
-        v_dim = self._datasource.get_vertical_dim(bbox)
-        self._vertical_dim_cache.insert(bbox if bbox else global_key, v_dim)
-        return v_dim
+        return self._vertical_dim_cache.get_or_create(
+            bbox if bbox else global_key,
+            lambda: self._datasource.get_vertical_dim(bbox))
 
     def get_time_dim(
             self, bbox: Optional[Tuple[float, float, float, float]] = None) \
-            -> List[datetime]:
+            -> Optional[pd.DatetimeIndex]:
         """
-        Returns the time dimension of the vector cube as an explicit list of
-        datetime objects. If the vector cube does not have a time dimension,
-        an empty list is returned.
+        Returns the time dimension of the vector cube as an explicit array of
+        datetime64[ns, UTC] values. The values are parsed only once, when the
+        dimension is read from the datasource. If the vector cube does not
+        have a time dimension, None is returned.
         """
         global_key = 'GLOBAL'
-        if bbox and bbox in self._time_dim_cache.get_keys():
-            return self._time_dim_cache.get(bbox)
-        if not bbox and global_key in self._time_dim_cache.get_keys():
-            return self._time_dim_cache.get(global_key)
-        time_dim = self._datasource.get_time_dim(bbox)
-        self._time_dim_cache.insert(bbox if bbox else global_key, time_dim)
-        return time_dim
+        return self._time_dim_cache.get_or_create(
+            bbox if bbox else global_key,
+            lambda: self._datasource.get_time_dim(bbox))
+
+    def has_time_dim(self) -> bool:
+        """
+        Checks if the vector cube has a time dimension, without reading its
+        values.
+        """
+        return self._get_probe('has_time_dim', self._datasource.has_time_dim)
+
+    def has_vertical_dim(self) -> bool:
+        """
+        Checks if the vector cube has a vertical dimension, without reading
+        its values.
+        """
+        return self._get_probe('has_vertical_dim',
+                               self._datasource.has_vertical_dim)
+
+    def get_time_dim_extent(self) \
+            -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        Returns the earliest and latest value of the time dimension, or None
+        if the vector cube does not have a time dimension.
+        """
+        return self._get_probe('time_dim_extent',
+                               self._datasource.get_time_dim_extent)
+
+    def get_vertical_dim_extent(self) -> Optional[Tuple[Any, Any]]:
+        """
+        Returns the minimum and maximum value of the vertical dimension, or
+        None if the vector cube does not have a vertical dimension.
+        """
+        return self._get_probe('vertical_dim_extent',
+                               self._datasource.get_vertical_dim_extent)
+
+    def _get_probe(self, key: str, probe: Callable[[], Any]) -> Any:
+        if key not in self._probe_cache:
+            self._probe_cache[key] = probe()
+        return self._probe_cache[key]
 
     def get_time_dim_name(self):
         if not self._time_dim_name:
-            self._time_dim = self._datasource.get_time_dim_name()
-        return self._time_dim
+            self._time_dim_name = self._datasource.get_time_dim_name()
+        return self._time_dim_name
 
     def get_features_by_geometry(self, limit: int = STAC_DEFAULT_ITEMS_LIMIT,
                                  offset: int = 0) \
@@ -174,24 +239,81 @@ class VectorCube:
         return features_by_geometry
 
     def get_feature(self, feature_id: str) -> Feature:
-        for key in self._feature_cache.get_keys():
-            for feature in self._feature_cache.get(key):
+        if self._plan:
+            return self._get_feature_index()[feature_id]
+        for features in self._feature_cache.get_items():
+            if not isinstance(features, list):
+                # the feature index
+                continue
+            for feature in features:
                 if feature['id'] == feature_id:
                     return feature
-        feature = self._datasource.load_features(feature_id=feature_id)[0]
-        self._feature_cache.insert(feature_id, [feature])
-        return feature
+        return self._feature_cache.get_or_create(
+            feature_id,
+            lambda: self._datasource.load_features(feature_id=feature_id))[0]
 
     def load_features(self, limit: Optional[int] = STAC_DEFAULT_ITEMS_LIMIT,
                       offset: int = 0,
                       with_stac_info: bool = True) -> List[Feature]:
-        key = (limit, offset)
-        if key in self._feature_cache.get_keys():
-            return self._feature_cache.get(key)
-        features = self._datasource.load_features(limit, offset,
-                                                  None, with_stac_info)
-        self._feature_cache.insert(key, features)
-        return features
+        if self._plan:
+            return self._feature_cache.get_or_create(
+                (limit, offset),
+                lambda: self._evaluate_plan(limit, offset, with_stac_info))
+        return self._feature_cache.get_or_create(
+            (limit, offset),
+            lambda: self._datasource.load_features(limit, offset, None,
+                                                   with_stac_info))
+
+    def _evaluate_plan(self, limit: Optional[int], offset: int,
+                       with_stac_info: bool) -> List[Feature]:
+        if preserves_count(self._plan):
+            return execute_plan(
+                *self._load_base_features(limit, offset, with_stac_info))
+        if limit is None and offset == 0:
+            # called by load_features for the key of all features
+            features = self._evaluate_all(with_stac_info)
+        else:
+            features = self._feature_cache.get_or_create(
+                (None, 0), lambda: self._evaluate_all(with_stac_info))
+        return features[offset:offset + limit] if limit else features[offset:]
+
+    def _evaluate_all(self, with_stac_info: bool) -> List[Feature]:
+        # the first operation may be computed by the datasource, so that the
+        # features of the base cube need not be loaded
+        pushed_down = self._plan[0].push_down(self._datasource)
+        if pushed_down is not None:
+            return execute_plan(pushed_down, self._plan[1:])
+        return execute_plan(*self._load_base_features(None, 0, with_stac_info))
+
+    def _load_base_features(self, limit: Optional[int], offset: int,
+                            with_stac_info: bool) \
+            -> Tuple[List[Feature], List[Operation]]:
+        """
+        Loads the features the plan is applied to, and returns them together
+        with the operations left to apply. Leading columnar operations that
+        can be expressed in SQL are computed by the datasource while loading,
+        so that no intermediate features are created for them.
+        """
+        pushed_down = 0
+        for operation in self._plan:
+            if not isinstance(operation, ColumnarOperation) \
+                    or operation.column_expression('x') is None:
+                break
+            pushed_down += 1
+        if pushed_down:
+            features = self._datasource.load_computed_features(
+                [op.column_expression for op in self._plan[:pushed_down]],
+                limit, offset, with_stac_info)
+            if features is not None:
+                return features, self._plan[pushed_down:]
+        return (self._base.load_features(limit, offset, with_stac_info),
+                self._plan)
+
+    def _get_feature_index(self) -> Dict[str, Feature]:
+        return self._feature_cache.get_or_create(
+            'INDEX',
+            lambda: {f['id']: f for f in
+                     self.load_features(limit=None, with_stac_info=False)})
 
     def get_bbox(self) -> Optional[Tuple[float, float, float, float]]:
         if self._bbox:
@@ -208,9 +330,17 @@ class VectorCube:
     def get_metadata(self, full: bool = False) -> Dict:
         return self._datasource.get_metadata(full)
 
+    def get_last_modified(self) -> Optional[str]:
+        return self._datasource.get_last_modified()
+
+    def get_version(self) -> Optional[str]:
+        return self._datasource.get_version()
+
+    def get_property_statistics(self, bins: int = 10) -> Dict[str, Dict]:
+        return self._datasource.get_property_statistics(bins)
+
     def to_geojson(self) -> FeatureCollection:
-        return FeatureCollection(self.load_features(
-            self.feature_count, 0, False))
+        return FeatureCollection(self.load_features(None, 0, False))
 
 
 class StaticVectorCubeFactory(DataSource):
@@ -276,7 +406,7 @@ class StaticVectorCubeFactory(DataSource):
     def get_time_dim(
             self,
             bbox: Optional[Tuple[float, float, float, float]] = None) \
-            -> Optional[List[datetime]]:
+            -> Optional[pd.DatetimeIndex]:
         return self.time_dim
 
     def get_time_dim_name(self) -> Optional[str]:
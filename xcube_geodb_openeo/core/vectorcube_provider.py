@@ -20,13 +20,26 @@
 # DEALINGS IN THE SOFTWARE.
 
 import abc
-from typing import Tuple, Optional, List, Mapping, Any
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, List, Mapping, Any, Sequence
 
 from xcube_geodb.core.geodb import GeoDBClient
 
 from .geodb_datasource import GeoDBVectorSource
+from .geodb_datasource import PropertyCondition
+from .geodb_datasource import TimeRange
+from .tools import CountCache
+from .tools import VersionCache
 from .tools import create_geodb_client
 from .vectorcube import VectorCube
+from ..defaults import (
+    DEFAULT_COUNT_CACHE_MAX_AGE,
+    DEFAULT_COUNT_STRATEGY,
+    DEFAULT_EXACT_COUNT_THRESHOLD,
+    DEFAULT_VERSION_CACHE_MAX_AGE,
+)
 
 
 class VectorCubeProvider(abc.ABC):
@@ -39,6 +52,9 @@ class VectorCubeProvider(abc.ABC):
         self,
         collection_id: Tuple[str, str],
         bbox: Optional[Tuple[float, float, float, float]] = None,
+        time_range: Optional[TimeRange] = None,
+        properties: Optional[Sequence[str]] = None,
+        conditions: Optional[Sequence[PropertyCondition]] = None,
     ) -> VectorCube:
         pass
 
@@ -48,6 +64,19 @@ class GeoDBProvider(VectorCubeProvider):
         self.config = config
         self._geodb = None
         self._access_token = access_token
+        # counts depend on the collections the user may read, so they are
+        # cached per provider, i.e. per user
+        self._count_cache = CountCache(
+            config["geodb_openeo"].get(
+                "count_cache_max_age", DEFAULT_COUNT_CACHE_MAX_AGE
+            ),
+            get_count_refresh_executor(),
+        )
+        self._version_cache = VersionCache(
+            config["geodb_openeo"].get(
+                "version_cache_max_age", DEFAULT_VERSION_CACHE_MAX_AGE
+            )
+        )
 
     @property
     def geodb(self) -> GeoDBClient:
@@ -75,5 +104,56 @@ class GeoDBProvider(VectorCubeProvider):
         self,
         collection_id: Tuple[str, str],
         bbox: Optional[Tuple[float, float, float, float]] = None,
+        time_range: Optional[TimeRange] = None,
+        properties: Optional[Sequence[str]] = None,
+        conditions: Optional[Sequence[PropertyCondition]] = None,
     ) -> VectorCube:
-        return VectorCube(collection_id, GeoDBVectorSource(collection_id, self.geodb))
+        api_config = self.config["geodb_openeo"]
+        datasource = GeoDBVectorSource(
+            collection_id,
+            self.geodb,
+            bbox=bbox,
+            time_range=time_range,
+            properties=properties,
+            conditions=conditions,
+            count_strategy=api_config.get("count_strategy", DEFAULT_COUNT_STRATEGY),
+            exact_count_threshold=api_config.get(
+                "exact_count_threshold", DEFAULT_EXACT_COUNT_THRESHOLD
+            ),
+            count_cache=self._count_cache,
+            version_cache=self._version_cache,
+        )
+        return VectorCube(collection_id, datasource)
+
+
+def create_cube_provider(
+    config: Mapping[str, Any], access_token: str
+) -> VectorCubeProvider:
+    """
+    Creates an instance of the vector cube provider class configured as
+    vectorcube_provider_class for a user.
+    """
+    cube_provider_class = config["geodb_openeo"]["vectorcube_provider_class"]
+    cube_provider_module = cube_provider_class[: cube_provider_class.rindex(".")]
+    class_name = cube_provider_class[cube_provider_class.rindex(".") + 1 :]
+    module = importlib.import_module(cube_provider_module)
+    cls = getattr(module, class_name)
+    return cls(config, access_token)
+
+
+_COUNT_REFRESH_EXECUTOR_SINGLETON = None
+_COUNT_REFRESH_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_count_refresh_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread singleton refreshing the cached counts of all users.
+    """
+    global _COUNT_REFRESH_EXECUTOR_SINGLETON
+    if _COUNT_REFRESH_EXECUTOR_SINGLETON is None:
+        with _COUNT_REFRESH_EXECUTOR_LOCK:
+            if _COUNT_REFRESH_EXECUTOR_SINGLETON is None:
+                _COUNT_REFRESH_EXECUTOR_SINGLETON = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="count-refresh"
+                )
+    return _COUNT_REFRESH_EXECUTOR_SINGLETON
@@ -38,4 +38,37 @@ STAC_MIN_ITEMS_LIMIT = 1
 STAC_MAX_ITEMS_LIMIT = 1000
 
 DEFAULT_VC_CACHE_SIZE = 150
+# Seconds after which stored collection summaries are checked for changes
+DEFAULT_SUMMARY_REFRESH_INTERVAL = 600
+
+# How feature counts are obtained: 'exact', 'estimate' or 'cached'
+COUNT_STRATEGIES = ['exact', 'estimate', 'cached']
+DEFAULT_COUNT_STRATEGY = 'exact'
+# Estimated counts below this threshold are replaced by exact counts
+DEFAULT_EXACT_COUNT_THRESHOLD = 10000
+# Seconds after which cached exact counts are refreshed
+DEFAULT_COUNT_CACHE_MAX_AGE = 300
+# Seconds for which collection versions, which decide whether cached results
+# are still valid, are reused before asking the database again
+DEFAULT_VERSION_CACHE_MAX_AGE = 10
+# Number of threads shared by all requests for executing process graph nodes
+DEFAULT_NODE_POOL_SIZE = 8
+# Maximum number of nodes of a single process graph executed in parallel
+DEFAULT_MAX_PARALLEL_NODES = 4
+# Number of compiled callbacks kept for reuse by later requests
+DEFAULT_CALLBACK_CACHE_SIZE = 256
+# Bytes of process graph results kept in memory, and on disk if a directory
+# is configured, for reuse by identical requests
+DEFAULT_RESULT_CACHE_MEMORY_BUDGET = 64 * 1024 * 1024
+DEFAULT_RESULT_CACHE_DISK_BUDGET = 1024 * 1024 * 1024
+# Number of worker processes running batch jobs, i.e. of jobs running at once
+DEFAULT_MAX_RUNNING_JOBS = 2
+# Minimum number of rows of a partition reduced by a worker process
+DEFAULT_MIN_PARTITION_ROWS = 100000
+# Bytes of values kept in memory by exact reductions such as the median,
+# beyond which they are spilled to temporary files
+DEFAULT_REDUCTION_MEMORY_BUDGET = 256 * 1024 * 1024
+# Number of features whose values are put into a single frame when they are
+# aggregated chunk by chunk
+DEFAULT_AGGREGATION_CHUNK_ROWS = 1000000
 MAX_NUMBER_OF_GEOMETRIES_DISPLAYED = 20
@@ -19,10 +19,13 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+from xcube.util.jsonschema import JsonIntegerSchema
 from xcube.util.jsonschema import JsonNumberSchema
 from xcube.util.jsonschema import JsonObjectSchema
 from xcube.util.jsonschema import JsonStringSchema
 
+from ..defaults import COUNT_STRATEGIES
+
 OPENEO_CONFIG_SCHEMA = JsonObjectSchema(
     properties=dict(
         geodb_openeo=JsonObjectSchema(
@@ -32,6 +35,22 @@ OPENEO_CONFIG_SCHEMA = JsonObjectSchema(
                 auth_domain=JsonStringSchema(),
                 kc_client_id=JsonStringSchema(),
                 kc_internal_client_id=JsonStringSchema(),
+                summary_store_dir=JsonStringSchema(),
+                summary_refresh_interval=JsonNumberSchema(),
+                count_strategy=JsonStringSchema(enum=COUNT_STRATEGIES),
+                exact_count_threshold=JsonNumberSchema(),
+                count_cache_max_age=JsonNumberSchema(),
+                version_cache_max_age=JsonIntegerSchema(minimum=0),
+                node_pool_size=JsonIntegerSchema(minimum=1),
+                max_parallel_nodes=JsonIntegerSchema(minimum=1),
+                result_cache_memory_budget=JsonIntegerSchema(minimum=0),
+                result_cache_dir=JsonStringSchema(),
+                result_cache_disk_budget=JsonIntegerSchema(minimum=0),
+                jobs_dir=JsonStringSchema(),
+                max_running_jobs=JsonIntegerSchema(minimum=1),
+                worker_pool_size=JsonIntegerSchema(minimum=0),
+                min_partition_rows=JsonIntegerSchema(minimum=1),
+                aggregation_chunk_rows=JsonIntegerSchema(minimum=1),
             )
         )
     ),